@@ -15,6 +15,9 @@ import json
 import sys
 from pathlib import Path
 
+from wiki_extract.extract.page_meta import load_page_titles, page_meta_path_for
+from wiki_extract.util.page_store import open_page_store
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(
@@ -24,7 +27,7 @@ def main() -> None:
         '--output-dir',
         type=Path,
         default=Path('out'),
-        help='out と page_meta.json / pages/ / character_candidates.csv の親。既定: out',
+        help='out と page_meta.json / pages/（または pages.dat）/ character_candidates.csv の親。既定: out',
     )
     parser.add_argument(
         '--csv',
@@ -35,23 +38,24 @@ def main() -> None:
     args = parser.parse_args()
 
     out = args.output_dir.resolve()
-    meta_path = out / 'page_meta.json'
-    pages_dir = out / 'pages'
+    meta_path = page_meta_path_for(out)
     csv_path = out / 'character_candidates.csv'
 
     if not meta_path.is_file():
         print(f'Error: {meta_path} が見つかりません', file=sys.stderr)
         sys.exit(1)
-    if not pages_dir.is_dir():
-        print(f'Error: {pages_dir} が見つかりません', file=sys.stderr)
-        sys.exit(1)
     if not csv_path.is_file():
         print(f'Error: {csv_path} が見つかりません', file=sys.stderr)
         sys.exit(1)
 
     with open(meta_path, encoding='utf-8') as f:
         meta = json.load(f)
-    main_id_to_title = meta['main_id_to_title']
+    main_id_to_title = load_page_titles(out, meta)
+    try:
+        store = open_page_store(out, meta.get('page_store'))
+    except FileNotFoundError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
 
     # CSV に出現するページ名の集合（1列目。ヘッダー除く）
     pages_in_csv: set[str] = set()
@@ -62,13 +66,12 @@ def main() -> None:
             if row:
                 pages_in_csv.add(row[0].strip())
 
-    # out/pages/*.txt のうち、CSV に1件もないページ
+    # 出力済みページ（pages/*.txt または pages.dat）のうち、CSV に1件もないページ
     missing: list[tuple[str, str]] = []
-    for path in sorted(pages_dir.glob('*.txt'), key=lambda p: (not p.stem.isdigit(), p.stem)):
-        if not path.stem.isdigit():
-            continue
-        page_id = path.stem
-        page_title = main_id_to_title.get(page_id, page_id)
+    with store:
+        page_ids = sorted(str(pid) for pid in store.ids())
+    for page_id in page_ids:
+        page_title = main_id_to_title.get(int(page_id), page_id)
         page_display = page_title.replace('_', ' ')
         if page_display not in pages_in_csv:
             missing.append((page_id, page_display))
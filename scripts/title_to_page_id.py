@@ -4,7 +4,7 @@
 
 使い方:
   python scripts/title_to_page_id.py "封神演義の登場人物一覧"
-  # 出力: page_id と pages/{id}.txt のパス
+  # 出力: page_id と pages/{id}.txt のパス（packed なら pages.dat@開始位置+長さ）
   python scripts/title_to_page_id.py "封神演義" --search   # 部分一致で一覧（page_id, タイトル, パス）
 """
 
@@ -13,6 +13,22 @@ import json
 import sys
 from pathlib import Path
 
+from wiki_extract.extract.page_meta import load_page_titles, page_meta_path_for
+from wiki_extract.util.page_store import PAGES_DIR_NAME, open_page_store
+
+
+def _page_locations(out: Path, meta: dict, page_ids: list[int]) -> dict[int, str]:
+    """
+    page_id → 格納場所の表示。packed ならストアの位置（未出力は '-'）、
+    files（またはストアが開けない）なら従来どおり pages/{id}.txt のパス。
+    """
+    try:
+        store = open_page_store(out, meta.get('page_store'))
+    except FileNotFoundError:
+        return {pid: str(out / PAGES_DIR_NAME / f'{pid}.txt') for pid in page_ids}
+    with store:
+        return {pid: store.location(pid) if pid in store else '-' for pid in page_ids}
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(
@@ -29,7 +45,7 @@ def main() -> None:
         '--output-dir',
         type=Path,
         default=Path('out'),
-        help='page_meta.json と pages/ があるディレクトリ。既定: out',
+        help='page_meta.json と pages/（または pages.dat）があるディレクトリ。既定: out',
     )
     parser.add_argument(
         '--search',
@@ -39,7 +55,7 @@ def main() -> None:
     args = parser.parse_args()
 
     out = args.output_dir.resolve()
-    meta_path = out / 'page_meta.json'
+    meta_path = page_meta_path_for(out)
 
     if not meta_path.is_file():
         print(f'Error: {meta_path} が見つかりません', file=sys.stderr)
@@ -47,7 +63,7 @@ def main() -> None:
 
     with open(meta_path, encoding='utf-8') as f:
         meta = json.load(f)
-    main_id_to_title = meta['main_id_to_title']
+    main_id_to_title = load_page_titles(out, meta)
 
     if args.search:
         query = (args.title or '').strip()
@@ -62,11 +78,10 @@ def main() -> None:
         if not matches:
             print(f'"{query}" に一致するページはありません', file=sys.stderr)
             sys.exit(1)
-        pages_dir = out / 'pages'
+        locations = _page_locations(out, meta, [pid for pid, _title in matches])
         for pid, title in sorted(matches, key=lambda x: (x[1], x[0])):
             display = title.replace('_', ' ')
-            path = pages_dir / f'{pid}.txt'
-            print(f'{pid}\t{display}\t{path}')
+            print(f'{pid}\t{display}\t{locations[pid]}')
         print(f'# {len(matches)} 件', file=sys.stderr)
         return
 
@@ -78,15 +93,15 @@ def main() -> None:
 
     # 完全一致: タイトルはアンダースコア／スペースの表記揺れあり
     norm_arg = title_arg.replace(' ', '_')
-    found: list[tuple[str, str]] = []
+    found: list[tuple[int, str]] = []
     for pid, title in main_id_to_title.items():
         if title == title_arg or title == norm_arg:
             found.append((pid, title))
         elif title.replace('_', ' ') == title_arg.replace('_', ' '):
             found.append((pid, title))
     # 重複 page_id を除く（同じページの別表記）
-    seen: set[str] = set()
-    unique: list[tuple[str, str]] = []
+    seen: set[int] = set()
+    unique: list[tuple[int, str]] = []
     for pid, title in found:
         if pid not in seen:
             seen.add(pid)
@@ -98,10 +113,9 @@ def main() -> None:
         print('  --search で部分一致を試してください', file=sys.stderr)
         sys.exit(1)
 
-    pages_dir = out / 'pages'
-    for pid, title in found:
-        path = pages_dir / f'{pid}.txt'
-        print(f'{pid}\t{path}')
+    locations = _page_locations(out, meta, [pid for pid, _title in found])
+    for pid, _title in found:
+        print(f'{pid}\t{locations[pid]}')
 
 
 if __name__ == '__main__':
@@ -2,3 +2,96 @@
 共通 fixture。tmp_path は pytest 標準を利用。
 環境変数・sys.argv の退避・復元は各テストで monkeypatch を使用する。
 """
+
+import bz2
+import hashlib
+
+import pytest
+
+_XML_HEADER = (
+    '<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" xml:lang="ja">\n'
+    '  <siteinfo><sitename>Wikipedia</sitename></siteinfo>\n'
+)
+_XML_FOOTER = '</mediawiki>\n'
+
+
+def _page_xml(page_id: int, ns: int, text: str, revision_id: int | None = None, sha1: str | None = None) -> str:
+    """
+    1ページ分の <page> 要素。text は XML エスケープ済みの文字列を渡す。
+    revision_id の既定は page_id * 100、sha1 の既定は text の SHA-1（16 進）。
+    """
+    if revision_id is None:
+        revision_id = page_id * 100
+    if sha1 is None:
+        sha1 = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    if text:
+        text_xml = f'<text bytes="{len(text)}" xml:space="preserve">{text}</text>'
+    else:
+        text_xml = '<text bytes="0" />'
+    return (
+        f'  <page>\n    <title>P{page_id}</title>\n    <ns>{ns}</ns>\n    <id>{page_id}</id>\n'
+        f'    <revision>\n      <id>{revision_id}</id>\n'
+        f'      <contributor><username>U</username><id>7</id></contributor>\n'
+        f'      {text_xml}\n      <sha1>{sha1}</sha1>\n    </revision>\n  </page>\n'
+    )
+
+
+@pytest.fixture
+def write_xml_dump():
+    """
+    (page_id, ns, text) または (page_id, ns, text, revision_id, sha1) のリストから
+    pages-articles.xml（.bz2 なら圧縮）を書き出す関数。
+    """
+    def _write(path, pages):
+        data = (_XML_HEADER + ''.join(_page_xml(*p) for p in pages) + _XML_FOOTER).encode('utf-8')
+        path.write_bytes(bz2.compress(data) if path.name.endswith('.bz2') else data)
+        return path
+    return _write
+
+
+@pytest.fixture
+def write_multistream_dump():
+    """
+    ヘッダ・ページ群・フッタを別々の bz2 ストリームとして連結した multistream ダンプと索引を
+    directory に書き出し、(xml_path, index_path) を返す関数。
+    """
+    def _write(directory, pages, per_block=2):
+        xml_path = directory / 'jawiki-pages-articles-multistream.xml.bz2'
+        index_path = directory / 'jawiki-pages-articles-multistream-index.txt.bz2'
+        data = bytearray(bz2.compress(_XML_HEADER.encode('utf-8')))
+        index_lines = []
+        for i in range(0, len(pages), per_block):
+            offset = len(data)
+            block = pages[i:i + per_block]
+            data += bz2.compress(''.join(_page_xml(*p) for p in block).encode('utf-8'))
+            index_lines += [f'{offset}:{p[0]}:P{p[0]}' for p in block]
+        data += bz2.compress(_XML_FOOTER.encode('utf-8'))
+        xml_path.write_bytes(bytes(data))
+        index_path.write_bytes(bz2.compress(('\n'.join(index_lines) + '\n').encode('utf-8')))
+        return xml_path, index_path
+    return _write
+
+
+@pytest.fixture
+def write_sql_dump():
+    """
+    mysqldump 形式の小さな SQL ダンプ（.gz なら圧縮）を書き出す関数。
+    columns は (列名, 型) のリスト、rows は SQL リテラル表記の文字列タプルのリスト。
+    """
+    import gzip
+
+    def _write(path, table, columns, rows, rows_per_insert=2):
+        lines = [
+            '-- MySQL dump 10.19',
+            '-- Host: localhost    Database: jawiki',
+            f'CREATE TABLE `{table}` (',
+        ]
+        lines += [f'  `{name}` {dtype},' for name, dtype in columns]
+        lines += [f'  PRIMARY KEY (`{columns[0][0]}`)', ') ENGINE=InnoDB;']
+        for i in range(0, len(rows), rows_per_insert):
+            values = ','.join('(' + ','.join(r) + ')' for r in rows[i:i + rows_per_insert])
+            lines.append(f'INSERT INTO `{table}` VALUES {values};')
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        path.write_bytes(gzip.compress(data) if path.name.endswith('.gz') else data)
+        return path
+    return _write
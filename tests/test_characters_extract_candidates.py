@@ -2,10 +2,62 @@
 extract_character_candidates の strip 系・extract 系のテスト。
 """
 
+import random
+
 import pytest
 
 from wiki_extract.characters import extract_character_candidates as ecc
 
+# clean_wiki_content の入出力（strip_* を順に当てていたときの結果。閉じ括弧 }} が残るのも当時のまま）
+CLEAN_CORPUS = [
+    ('虎杖 悠仁（いたどり ゆうじ）', '虎杖 悠仁'),
+    ('[[志村ケン太]]（声 - [[山田太郎]]）', '志村ケン太（声 - 山田太郎）'),
+    ("'''{{Ruby|灰原|はいばら}} 哀'''（声 - {{仮リンク|林原めぐみ|en|Megumi}}）", '灰原 哀（声 - 林原めぐみ）'),
+    ('七海 建人<ref>{{Cite book|title=x}}</ref>（ななみ けんと）', '七海 建人'),
+    ('アーサー{{efn|注記{{R|a}}}}（{{lang-en|Arthur}}）', 'アーサー'),
+    ('太郎<!-- c -->', '太郎'),
+    ('{{small|（声 - 某）}}花子', '（声 - 某）}}花子'),
+    ('[[ジョン・スミス|ジョン]]{{要出典|date=2020年1月}}', 'ジョン'),
+    ('{{読み仮名|蒼井 空|あおい そら}}', '蒼井 空'),
+    ('{{読み|ぬ〜べ〜|ぬーべー}}x', 'ぬーべー}}x'),
+    ('コナン（{{small|英：}}Conan）', 'コナン（英：}}Conan）'),
+    ('{{ill2|アリス|en|Alice|label=アリス}}', 'アリス'),
+    ('{{Visible anchor|花子}}', '花子'),
+    ('<span style="color:red">赤</span>', '赤'),
+    ('{{lang|en|Bob}}（ボブ）', 'Bob'),
+    ('{{JIS90フォント|葛}}葉', '葛}}葉'),
+    ('{{Cite web|url=x}}太郎', '{{Cite web|url=x}}太郎'),
+    ('{{読み仮名|太郎}}x', '太郎}}xx'),
+]
+
+# 差分テスト用の部品（処理表にあるテンプレート名・無い名前、閉じ方の崩れた括弧、タグなど）
+_FUZZ_TEMPLATE_NAMES = [
+    'efn', 'Efn2', 'sfn', 'refnest', '仮リンク', '読み仮名', '読み仮名_ruby不使用', 'Ruby', 'ruby', 'vanc', '要出典',
+    '要出典 ', '要出典範囲', 'lang-en', 'lang-zh-tw', 'lang', 'Lang ', 'llang', 'en', 'R', 'nobold', 'SYC', 'KIA',
+    'Full', 'Vanchor', 'small', 'Small', 'flagicon', '軌跡人物', '読み', 'color', 'Font color', 'weight', 'fontsize',
+    'abbr', 'JIS90フォント', '補助漢字フォント', '#tag:ref', '#tag ', 'enlink', 'ill2', 'anchors', 'visible anchor',
+    'Visible anchor ', 'cite', 'foo', 'efn-la', 'lang-',
+]
+_FUZZ_ATOMS = [
+    '太郎', '花子', ' ', '|', '||', '=', '=表示', 'label=ラ', '}', '}}', '{', '{{', "'''", "''", '[[', '[[a|b]]',
+    '[[x]]', ']]', '<ref>出典</ref>', '<ref name="a" />', '<ref name="a>b">x</ref>', '<!-- c -->',
+    '<span lang="en">x</span>', '<span style="a">中</span>', '<SPAN>y</span>', '<br>', '（', '）', '(a)', '声 - 某',
+    'x', '\n', '<', '>', '&amp;', 'ab|cd',
+]
+
+
+def _fuzz_token(rng: random.Random, depth: int = 0) -> str:
+    r = rng.random()
+    if r < 0.3 and depth < 3:
+        parts = [rng.choice(_FUZZ_TEMPLATE_NAMES)]
+        for _ in range(rng.randint(0, 3)):
+            parts.append(''.join(_fuzz_token(rng, depth + 1) for _ in range(rng.randint(0, 2))))
+        return '{{' + '|'.join(parts) + rng.choice(['}}', '}}', '}}}', '}', ''])
+    if r < 0.38 and depth < 3:
+        content = ''.join(_fuzz_token(rng, depth + 1) for _ in range(rng.randint(0, 2)))
+        return '[[' + content + rng.choice([']]', ']]', '|x]]', ''])
+    return rng.choice(_FUZZ_ATOMS)
+
 
 def test_strip_efn():
     """{{efn|...}} を除去。"""
@@ -49,6 +101,59 @@ def test_clean_wiki_content_strips_templates():
     assert len(got) < len(s) or 'efn' not in got
 
 
+@pytest.mark.parametrize('text, expected', CLEAN_CORPUS)
+def test_clean_wiki_content_golden(text, expected):
+    """1 回の走査で除いても、読めずに strip_* を順に当てても、当時と同じ結果になる。"""
+    assert ecc.clean_wiki_content(text) == expected
+    fast = ecc._strip_markup_fast(text)
+    assert fast is None or fast == ecc._strip_markup_chain(text).strip()
+
+
+def test_strip_markup_fast_falls_back():
+    """処理表に無いテンプレート・ネスト・閉じないリンクやタグは読まずに None を返す。"""
+    assert ecc._strip_markup_fast('{{Ruby|灰原|はいばら}}') == '灰原'
+    for text in ('{{Cite web|url=x}}太郎', '{{small|{{Ruby|a|b}}}}', '[[太郎', '太郎<ref>注', '{太郎}', '<br>太郎'):
+        assert ecc._strip_markup_fast(text) is None
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_strip_markup_fast_matches_chain_fuzz(seed):
+    """崩れたマークアップを含む行でも、1 回の走査で読めた行は _strip_markup_chain と同じ結果になる。"""
+    rng = random.Random(seed)
+    fast_count = 0
+    for _ in range(2000):
+        text = ''.join(_fuzz_token(rng) for _ in range(rng.randint(1, 6)))
+        fast = ecc._strip_markup_fast(text)
+        if fast is None:
+            continue
+        fast_count += 1
+        assert fast == ecc._strip_markup_chain(text).strip(), text
+    assert fast_count > 200
+
+
+def test_markup_steps_order_assumed_by_fast_path():
+    """_strip_markup_fast が段番号の比較だけでは表せずに前提にしている _MARKUP_STEPS の並び。"""
+    step = ecc._STEP
+    handlers = [
+        *ecc._TEMPLATE_HANDLERS_CI.values(), *ecc._TEMPLATE_HANDLERS_CI_SPACED.values(),
+        *ecc._TEMPLATE_HANDLERS_EXACT.values(), *ecc._TEMPLATE_HANDLERS_EXACT_SPACED.values(),
+    ]
+    template_steps = [s for s, _, _ in handlers] + [
+        step[ecc.strip_lang_xx], ecc._FONT_STEP, ecc._HASH_TAG_STEP, step[ecc.strip_hojo_kanji_font],
+    ]
+    # efn / sfn / refnest は中身ごと最初に消える
+    assert ecc._MARKUP_STEPS[:3] == (ecc.strip_efn, ecc.strip_sfn, ecc.strip_refnest)
+    # 仮リンクだけがリンクより前、ほかのテンプレートはリンクを表示に置き換えた後
+    assert step[ecc.strip_kari_link] < step[ecc.strip_wiki_links]
+    assert all(s > step[ecc.strip_wiki_links] for s in template_steps if s != step[ecc.strip_kari_link])
+    # 「フォント|」はそれより前の段のテンプレートには負け、後ろの段には勝つ。補助漢字フォントはその直後
+    assert step[ecc.strip_hojo_kanji_font] == ecc._FONT_STEP + 1
+    # ref・コメント・span はテンプレートをすべて除いた後、span lang は span より前
+    tag_steps = [step[f] for f in (ecc.strip_ref, ecc.strip_html_comments, ecc.strip_span_lang_html, ecc.strip_span)]
+    assert min(tag_steps) > max(template_steps)
+    assert tag_steps == sorted(tag_steps) and tag_steps[-1] == len(ecc._MARKUP_STEPS) - 1
+
+
 def test_extract_from_wiki_dt_lines():
     """; 行から名前行を抽出。"""
     text = """; 虎杖 悠仁
@@ -57,3 +162,62 @@ def test_extract_from_wiki_dt_lines():
     got = ecc.extract_from_wiki(text)
     assert len(got) >= 1
     assert any('虎杖' in g or '伏黒' in g for g in got)
+
+
+def test_extract_from_wiki_line_cache(monkeypatch):
+    """同じ ; 行は 2 回目から clean_wiki_content を通さずに同じ名前を返す。無効にすると毎回計算する。"""
+    calls = []
+    original = ecc._clean_wiki_content
+    monkeypatch.setattr(ecc, '_clean_wiki_content', lambda s: calls.append(s) or original(s))
+    text = '; [[虎杖 悠仁]]、伏黒 恵\n:* 五条 悟 - 教師\n'
+    try:
+        ecc.set_line_cache_enabled(True)
+        assert ecc.extract_from_wiki(text) == ['虎杖 悠仁', '伏黒 恵', '五条 悟']
+        assert ecc.extract_from_wiki(text) == ['虎杖 悠仁', '伏黒 恵', '五条 悟']
+        assert len(calls) == 2
+        assert ecc.line_cache_summary() == '行→名前 ヒット率 50.0% (2/4), 保持 2件'
+        ecc.set_line_cache_enabled(False)
+        ecc.extract_from_wiki(text)
+        ecc.extract_from_wiki(text)
+        assert len(calls) == 6
+    finally:
+        ecc.set_line_cache_enabled(True)
+
+
+def test_line_cache_file_reused_across_runs(tmp_path, monkeypatch):
+    """--line-cache-file に保存した結果は次の実行で読み込まれ、ルールの版が違えば読まない。"""
+    path = tmp_path / 'line_cache.json'
+    text = '; [[虎杖 悠仁]]、伏黒 恵\n'
+    try:
+        ecc.set_line_cache_enabled(True)
+        assert ecc.extract_from_wiki(text) == ['虎杖 悠仁', '伏黒 恵']
+        ecc.save_line_cache(path)
+        ecc.set_line_cache_enabled(True)
+        assert ecc.load_line_cache(path) == 1
+        monkeypatch.setattr(ecc, '_clean_wiki_content', lambda s: pytest.fail('キャッシュから返すはず'))
+        assert ecc.extract_from_wiki(text) == ['虎杖 悠仁', '伏黒 恵']
+        monkeypatch.setattr(ecc, 'line_cache_rules_version', lambda: 'changed')
+        ecc.set_line_cache_enabled(True)
+        assert ecc.load_line_cache(path) == 0
+    finally:
+        ecc.set_line_cache_enabled(True)
+
+
+@pytest.mark.parametrize('layout', ['files', 'packed'])
+def test_main_reads_page_store(tmp_path, monkeypatch, layout):
+    """main は page_meta.json の page_store に従い pages/ でも pages.dat でも同じ CSV を出す。"""
+    import json
+    import sys
+
+    from wiki_extract.util.page_store import open_page_writer
+
+    writer = open_page_writer(tmp_path, layout)
+    writer.put(10, '== 登場人物 ==\n; 虎杖 悠仁\n; 伏黒 恵\n')
+    writer.put(3, '; 五条 悟\n')
+    writer.close()
+    meta = {'main_id_to_title': {'10': '作品A', '3': '作品Bの登場人物'}, 'toujo_page_ids': [3], 'page_store': layout}
+    (tmp_path / 'page_meta.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['prog', '--input-dir', str(tmp_path), '--exclude-list', str(tmp_path / 'none.json')])
+    ecc.main()
+    rows = (tmp_path / 'character_candidates.csv').read_text(encoding='utf-8').splitlines()
+    assert rows == ['ページ名,名前', '作品Bの登場人物,五条 悟', '作品A,虎杖 悠仁', '作品A,伏黒 恵']
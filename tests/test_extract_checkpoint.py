@@ -0,0 +1,51 @@
+"""
+checkpoint のテスト。保存・読込の往復、ダンプ不一致時の無効化、ブロック位置の検索。
+"""
+
+from wiki_extract.extract import checkpoint
+
+
+def test_checkpoint_path_for(tmp_path):
+    """出力ディレクトリ直下の .extract_pages_progress。"""
+    assert checkpoint.checkpoint_path_for(tmp_path) == tmp_path / '.extract_pages_progress'
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """保存した内容をそのまま読める（target_ids と seed_page_ids の page_id は set）。"""
+    path = tmp_path / '.extract_pages_progress'
+    dump = {'name': 'x.xml.bz2', 'size': 10, 'mtime_ns': 1}
+    checkpoint.save_checkpoint(
+        path, dump=dump, last_page_id=42, offset=100, written=3, with_section=1, target_ids={5, 1},
+        seed_page_ids={'架空の人物': {5}, '架空の動物': set()}, targets_only=True,
+    )
+    state = checkpoint.load_checkpoint(path, dump)
+    assert state['last_page_id'] == 42
+    assert state['offset'] == 100
+    assert state['written'] == 3
+    assert state['with_section'] == 1
+    assert state['target_ids'] == {1, 5}
+    assert state['seed_page_ids'] == {'架空の人物': {5}, '架空の動物': set()}
+    assert state['targets_only'] is True
+    assert not (tmp_path / '.extract_pages_progress.tmp').exists()
+
+
+def test_load_rejects_other_dump_or_broken(tmp_path):
+    """ダンプが違う・壊れている・無い場合は None。"""
+    path = tmp_path / '.extract_pages_progress'
+    assert checkpoint.load_checkpoint(path, {}) is None
+    dump = {'name': 'x.xml', 'size': 10, 'mtime_ns': 1}
+    checkpoint.save_checkpoint(
+        path, dump=dump, last_page_id=1, offset=None, written=1, with_section=0, target_ids=set(), seed_page_ids={}
+    )
+    assert checkpoint.load_checkpoint(path, dict(dump, size=11)) is None
+    path.write_text('{broken', encoding='utf-8')
+    assert checkpoint.load_checkpoint(path, dump) is None
+
+
+def test_block_offset_for():
+    """page_id を含むブロックの開始位置。先頭ブロックより前は None。"""
+    block_index = [(10, 600), (20, 900), (35, 1500)]
+    assert checkpoint.block_offset_for(block_index, 5) is None
+    assert checkpoint.block_offset_for(block_index, 10) == 600
+    assert checkpoint.block_offset_for(block_index, 34) == 900
+    assert checkpoint.block_offset_for(block_index, 99) == 1500
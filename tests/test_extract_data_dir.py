@@ -89,3 +89,23 @@ def test_require_dumps_invalid_categorylinks_raises(tmp_path):
     (tmp_path / 'pages-articles.xml').touch()
     with pytest.raises(FileNotFoundError, match='categorylinks 用 SQL ダンプ'):
         data_dir.require_dumps(tmp_path)
+
+
+def test_find_multistream_index(tmp_path):
+    """multistream の .xml.bz2 に対応する -index.txt.bz2 があれば返す。"""
+    xml = tmp_path / 'jawiki-latest-pages-articles-multistream.xml.bz2'
+    xml.touch()
+    assert data_dir.find_multistream_index(xml) is None
+    index = tmp_path / 'jawiki-latest-pages-articles-multistream-index.txt.bz2'
+    index.touch()
+    assert data_dir.find_multistream_index(xml) == index
+    assert data_dir.find_multistream_index(tmp_path / 'jawiki-pages-articles.xml') is None
+
+
+def test_find_pages_articles_prefers_multistream_pair(tmp_path):
+    """multistream の .xml.bz2 と索引が揃っていれば解凍済み .xml より優先。"""
+    (tmp_path / 'jawiki-pages-articles.xml').touch()
+    (tmp_path / 'jawiki-pages-articles-multistream.xml.bz2').touch()
+    (tmp_path / 'jawiki-pages-articles-multistream-index.txt.bz2').touch()
+    got = data_dir.find_pages_articles(tmp_path)
+    assert got.name == 'jawiki-pages-articles-multistream.xml.bz2'
@@ -0,0 +1,82 @@
+"""
+decompress のテスト。各展開方法で同じ内容が読めること、途中で閉じても止まらないこと。
+"""
+
+import bz2
+import gzip
+
+import pytest
+
+from wiki_extract.extract import decompress
+
+DATA = ''.join(f'{i}行目 あいうえお\n' for i in range(50000)).encode('utf-8')
+
+
+@pytest.fixture(params=['.bz2', '.gz', ''])
+def dump_file(request, tmp_path):
+    suffix = request.param
+    path = tmp_path / f'dump.sql{suffix}'
+    if suffix == '.bz2':
+        path.write_bytes(bz2.compress(DATA))
+    elif suffix == '.gz':
+        path.write_bytes(gzip.compress(DATA))
+    else:
+        path.write_bytes(DATA)
+    return path
+
+
+@pytest.mark.parametrize('method', ['auto', 'thread', 'inline'])
+def test_open_dump_binary(dump_file, method, monkeypatch):
+    """rb: 展開結果は元データと一致。"""
+    monkeypatch.setattr(decompress, 'CHUNK_SIZE', 4096)
+    with decompress.open_dump(dump_file, 'rb', method=method) as f:
+        assert f.read() == DATA
+
+
+def test_open_dump_subprocess(dump_file):
+    """外部コマンドがあれば subprocess でも一致。"""
+    if dump_file.name.endswith(('.bz2', '.gz')) and decompress.find_decompress_tool(dump_file) is None:
+        pytest.skip('展開コマンドがありません')
+    with decompress.open_dump(dump_file, 'rb', method='subprocess') as f:
+        assert f.read() == DATA
+
+
+@pytest.mark.parametrize('method', ['auto', 'thread'])
+def test_open_dump_text_lines(dump_file, method):
+    """rt: 行単位で読める。"""
+    with decompress.open_dump(dump_file, 'rt', method=method) as f:
+        lines = list(f)
+    assert len(lines) == 50000
+    assert lines[1] == '1行目 あいうえお\n'
+
+
+@pytest.mark.parametrize('method', ['subprocess', 'thread'])
+def test_open_dump_close_early(tmp_path, monkeypatch, method):
+    """読み切る前に閉じても、キュー待ちの展開スレッド・プロセスで止まらない。"""
+    path = tmp_path / 'dump.sql.bz2'
+    path.write_bytes(bz2.compress(DATA * 4))
+    if method == 'subprocess' and decompress.find_decompress_tool(path) is None:
+        pytest.skip('展開コマンドがありません')
+    monkeypatch.setattr(decompress, 'CHUNK_SIZE', 1024)
+    monkeypatch.setattr(decompress, 'QUEUE_CHUNKS', 2)
+    f = decompress.open_dump(path, 'rb', method=method)
+    assert f.read(10) == DATA[:10]
+    f.close()
+
+
+@pytest.mark.parametrize('method', ['subprocess', 'thread'])
+def test_open_dump_corrupt_raises(tmp_path, method):
+    """壊れた圧縮ファイルは読み手側で例外になる。"""
+    path = tmp_path / 'dump.sql.gz'
+    path.write_bytes(gzip.compress(DATA)[:-100] + b'x' * 100)
+    if method == 'subprocess' and decompress.find_decompress_tool(path) is None:
+        pytest.skip('展開コマンドがありません')
+    with pytest.raises((OSError, EOFError)):
+        with decompress.open_dump(path, 'rb', method=method) as f:
+            f.read()
+
+
+def test_open_dump_invalid_method(dump_file):
+    """未知の展開方法は ValueError。"""
+    with pytest.raises(ValueError):
+        decompress.open_dump(dump_file, 'rb', method='zstd')
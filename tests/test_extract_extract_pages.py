@@ -0,0 +1,416 @@
+"""
+extract_pages.main のテスト。SQL 段は monkeypatch で差し替え、XML は tmp_path の小さなダンプを使う。
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+from wiki_extract.extract import extract_pages
+from wiki_extract.extract.sql_tables import SqlTables
+from wiki_extract.util import page_store
+from wiki_extract.util.page_store import iter_pages, open_page_store
+from wiki_extract.util.title_map import load_title_map
+
+SECTION_TEXT = '== 概要 ==\n本文\n== 登場人物 ==\n; 太郎\n== 脚注 ==\n'
+TOUJO_TEXT = '; 花子\n; 次郎\n'
+
+PAGES = [
+    (1, 0, '本文のみ'),
+    (2, 0, SECTION_TEXT),
+    (3, 1, SECTION_TEXT),
+    (4, 0, '登場人物は本文中のみ'),
+    (5, 0, '架空の人物のページ'),
+    (6, 0, TOUJO_TEXT),
+    (7, 0, SECTION_TEXT),
+]
+
+MAIN_ID_TO_TITLE = {1: 'A', 2: 'B', 4: 'D', 5: 'E', 6: 'F作品の登場人物', 7: 'G'}
+SEED_PAGE_IDS = {'架空の人物': {5}, '架空の探偵': {4, 5}}
+
+
+@pytest.fixture
+def dumps(tmp_path, monkeypatch, write_xml_dump):
+    """SQL 段を差し替え、pages-articles.xml を置いた data_dir を返す。"""
+    data = tmp_path / 'data'
+    data.mkdir()
+    xml_path = write_xml_dump(data / 'jawiki-pages-articles.xml', PAGES)
+    monkeypatch.setattr(extract_pages, 'require_dumps', lambda d: (d / 'cl.sql.gz', d / 'page.sql.gz', xml_path))
+    monkeypatch.setattr(extract_pages, 'find_dump_optional', lambda d, s: None)
+
+    def _run_sql_tables(*args, seeds, **kwargs):
+        return SqlTables(dict(MAIN_ID_TO_TITLE), {}, {6}, {seed: set(SEED_PAGE_IDS[seed]) for seed in seeds})
+
+    monkeypatch.setattr(extract_pages, 'run_sql_tables', _run_sql_tables)
+    return data
+
+
+def _run(monkeypatch, data, out, *extra):
+    monkeypatch.setattr(sys, 'argv', ['prog', '--data-dir', str(data), '--output-dir', str(out), *extra])
+    extract_pages.main()
+
+
+def _read_pages(out):
+    return {p.name: p.read_text(encoding='utf-8') for p in sorted((out / 'pages').glob('*.txt'))}
+
+
+def test_main_writes_target_and_section_pages(tmp_path, monkeypatch, dumps):
+    """対象 ID と登場人物セクションありのページを pages/ に書き出し、page_meta.json を出力する。"""
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out)
+    assert sorted(_read_pages(out)) == ['2.txt', '5.txt', '6.txt', '7.txt']
+    assert _read_pages(out)['2.txt'] == SECTION_TEXT
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    assert meta['pages'] == [
+        {'id': 2, 'title': 'B', 'kind': 'section'},
+        {'id': 5, 'title': 'E', 'kind': 'fictional', 'seeds': ['架空の人物']},
+        {'id': 6, 'title': 'F作品の登場人物', 'kind': 'toujo'},
+        {'id': 7, 'title': 'G', 'kind': 'section'},
+    ]
+    assert 'main_id_to_title' not in meta
+    assert not (out / 'page_titles.bin').exists()
+
+
+def test_main_seed_categories(tmp_path, monkeypatch, dumps):
+    """--seed-category を複数指定すると、どれかの配下のページを対象にし、各ページに属する seed を入れる。"""
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out, '--seed-category', '架空の人物', '--seed-category', '架空の探偵')
+    assert sorted(_read_pages(out)) == ['2.txt', '4.txt', '5.txt', '6.txt', '7.txt']
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    pages = {p['id']: p for p in meta['pages']}
+    assert pages[4] == {'id': 4, 'title': 'D', 'kind': 'fictional', 'seeds': ['架空の探偵']}
+    assert pages[5]['seeds'] == ['架空の人物', '架空の探偵']
+    assert 'seeds' not in pages[2]
+
+
+def test_main_full_title_map(tmp_path, monkeypatch, dumps):
+    """--full-title-map は全メインページのタイトルを page_meta.json と page_titles.bin に残す。"""
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out, '--full-title-map')
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    assert meta['main_id_to_title'] == {str(k): v for k, v in MAIN_ID_TO_TITLE.items()}
+    assert load_title_map(out / 'page_titles.bin') == MAIN_ID_TO_TITLE
+
+
+def test_main_workers_same_output(tmp_path, monkeypatch, dumps):
+    """--workers 2 でも出力は --workers 1 と同じ。"""
+    out1 = tmp_path / 'out1'
+    out2 = tmp_path / 'out2'
+    _run(monkeypatch, dumps, out1)
+    _run(monkeypatch, dumps, out2, '--workers', '2')
+    assert _read_pages(out1) == _read_pages(out2)
+
+
+@pytest.mark.parametrize('workers, decompress_workers, expected', [
+    (None, None, 8),
+    ('1', None, 8),
+    ('3', None, 5),
+    ('8', None, 1),
+    ('3', '2', 2),
+])
+def test_decompress_workers_split_budget(monkeypatch, workers, decompress_workers, expected):
+    """multistream の展開ワーカーは --decompress-workers、無ければ CPU コア数から判定ワーカーの分を引いた数。"""
+    monkeypatch.setattr(extract_pages.os, 'cpu_count', lambda: 8)
+    argv = ['prog']
+    if workers:
+        argv += ['--workers', workers]
+    if decompress_workers:
+        argv += ['--decompress-workers', decompress_workers]
+    monkeypatch.setattr(sys, 'argv', argv)
+    assert extract_pages._decompress_workers(extract_pages.parse_args()) == expected
+
+
+@pytest.mark.parametrize('reader', ['bytes', 'expat'])
+def test_main_xml_reader_same_output(tmp_path, monkeypatch, dumps, reader):
+    """--xml-reader bytes / expat でも出力は etree と同じ。"""
+    out1 = tmp_path / 'out1'
+    out2 = tmp_path / 'out2'
+    _run(monkeypatch, dumps, out1)
+    _run(monkeypatch, dumps, out2, '--xml-reader', reader, '--workers', '2')
+    assert _read_pages(out1) == _read_pages(out2)
+
+
+class _Interrupted(Exception):
+    pass
+
+
+@pytest.mark.parametrize('dump', ['xml', 'bz2', 'multistream'])
+def test_main_resume_after_interruption(tmp_path, monkeypatch, dumps, write_xml_dump, write_multistream_dump, dump):
+    """
+    途中で落ちても --resume で SQL 段を省略して続きから書き出し、最終結果は通常実行と同じ。
+    multistream はブロック、非圧縮の .xml はページのバイト位置から読み、単一ストリームの .bz2 は先頭から読み直す。
+    """
+    if dump != 'xml':
+        if dump == 'multistream':
+            xml_path, _index = write_multistream_dump(dumps, PAGES)
+        else:
+            xml_path = write_xml_dump(dumps / 'jawiki-pages-articles.xml.bz2', PAGES)
+        monkeypatch.setattr(extract_pages, 'require_dumps', lambda d: (d / 'cl.sql.gz', d / 'page.sql.gz', xml_path))
+    expected_out = tmp_path / 'expected'
+    _run(monkeypatch, dumps, expected_out)
+
+    out = tmp_path / 'out'
+    orig_select = extract_pages.iter_selected_pages
+
+    def _fail_after_two(*args, **kwargs):
+        for i, item in enumerate(orig_select(*args, **kwargs)):
+            if i == 2:
+                raise _Interrupted()
+            yield item
+
+    monkeypatch.setattr(extract_pages, 'iter_selected_pages', _fail_after_two)
+    with pytest.raises(_Interrupted):
+        _run(monkeypatch, dumps, out, '--checkpoint-interval', '0.000001')
+    checkpoint_path = out / '.extract_pages_progress'
+    state = json.loads(checkpoint_path.read_text(encoding='utf-8'))
+    assert state['last_page_id'] == 5
+    assert state['written'] == 2
+    assert (state['offset'] is not None) == (dump != 'bz2')
+
+    # 再開時は SQL 段を呼ばない。書き出し済みページは判定にも回らない
+    monkeypatch.setattr(extract_pages, 'iter_selected_pages', orig_select)
+    monkeypatch.setattr(extract_pages, 'run_sql_tables', lambda *a, **kw: pytest.fail('run_sql_tables called'))
+    seen: list[int] = []
+
+    def _record(pages, *args, **kwargs):
+        def _pages():
+            for p in pages:
+                seen.append(p[0])
+                yield p
+        return orig_select(_pages(), *args, **kwargs)
+
+    monkeypatch.setattr(extract_pages, 'iter_selected_pages', _record)
+    orig_open = extract_pages._open_pages
+    start_offsets: list[int] = []
+
+    def _open_pages(*args):
+        start_offsets.append(args[-1] if len(args) > 4 else 0)
+        return orig_open(*args)
+
+    monkeypatch.setattr(extract_pages, '_open_pages', _open_pages)
+    _run(monkeypatch, dumps, out, '--resume')
+    assert min(seen) > 5
+    assert (start_offsets[0] > 0) == (dump != 'bz2')
+    assert _read_pages(out) == _read_pages(expected_out)
+    assert not checkpoint_path.exists()
+    # 中断前に書き出したページのリビジョンも引き継がれる
+    assert (out / 'page_revisions.json').read_text(encoding='utf-8') == \
+        (expected_out / 'page_revisions.json').read_text(encoding='utf-8')
+    assert json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))['added'] == [2, 5, 6, 7]
+    assert (out / 'page_meta.json').read_text(encoding='utf-8') == \
+        (expected_out / 'page_meta.json').read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize('multistream', [False, True])
+def test_main_targets_only(tmp_path, monkeypatch, dumps, write_multistream_dump, multistream):
+    """--targets-only は登場人物セクションを探さず、対象 ID のページだけを書き出す。"""
+    if multistream:
+        xml_path, _index = write_multistream_dump(dumps, PAGES)
+        monkeypatch.setattr(extract_pages, 'require_dumps', lambda d: (d / 'cl.sql.gz', d / 'page.sql.gz', xml_path))
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out, '--targets-only')
+    assert sorted(_read_pages(out)) == ['5.txt', '6.txt']
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    assert [p['kind'] for p in meta['pages']] == ['fictional', 'toujo']
+
+
+@pytest.mark.parametrize('multistream', [False, True])
+def test_main_ids_and_titles(tmp_path, monkeypatch, dumps, write_multistream_dump, multistream):
+    """--ids / --titles は SQL 段を読まず、指定ページだけを既存の出力に書き足す。"""
+    if multistream:
+        # タイトルは multistream の索引（P{page_id}）で引く
+        xml_path, _index = write_multistream_dump(dumps, PAGES)
+        monkeypatch.setattr(extract_pages, 'require_dumps', lambda d: (d / 'cl.sql.gz', d / 'page.sql.gz', xml_path))
+        title_5, title_7 = 'P5', 'P7'
+    else:
+        monkeypatch.setattr(
+            extract_pages, 'run_page', lambda *a, **kw: (dict(MAIN_ID_TO_TITLE), {}, {6})
+        )
+        title_5, title_7 = 'E', 'G'
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out, '--targets-only')
+    monkeypatch.setattr(extract_pages, 'run_sql_tables', lambda *a, **kw: pytest.fail('run_sql_tables called'))
+    _run(monkeypatch, dumps, out, '--ids', '1', '5', '404', '--titles', title_7)
+    assert sorted(_read_pages(out)) == ['1.txt', '5.txt', '6.txt', '7.txt']
+    assert _read_pages(out)['7.txt'] == SECTION_TEXT
+    manifest = json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))
+    assert manifest == {'added': [1, 7], 'changed': [], 'removed': [], 'unchanged': [5]}
+    revisions = json.loads((out / 'page_revisions.json').read_text(encoding='utf-8'))
+    assert sorted(revisions['pages']) == ['1', '5', '6', '7']
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    pages = {p['id']: p for p in meta['pages']}
+    assert sorted(pages) == [1, 5, 6, 7]
+    assert pages[1]['kind'] == pages[7]['kind'] == 'requested'
+    # 既存ページは種別と seeds を残し、タイトルだけ引き直す
+    assert pages[5] == {'id': 5, 'title': title_5, 'kind': 'fictional', 'seeds': ['架空の人物']}
+    assert pages[7]['title'] == title_7
+
+
+def test_main_incremental_manifest(tmp_path, monkeypatch, dumps, write_xml_dump):
+    """2 回目はリビジョンが一致するページを書き直さず、追加・変更・削除を pages_manifest.json に出す。"""
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out)
+    manifest = json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))
+    assert manifest == {'added': [2, 5, 6, 7], 'changed': [], 'removed': [], 'unchanged': []}
+    revisions = json.loads((out / 'page_revisions.json').read_text(encoding='utf-8'))
+    assert sorted(revisions['pages']) == ['2', '5', '6', '7']
+    assert revisions['pages']['5'][0] == 500
+
+    # 2 は本文更新、7 は登場人物セクションが消え、8 が新規。5・6 はそのまま
+    os.utime(out / 'pages' / '5.txt', ns=(0, 0))
+    new_pages = [p for p in PAGES if p[0] not in (2, 7)] + [
+        (2, 0, SECTION_TEXT + '追記', 201, 'changed'),
+        (7, 0, '本文のみ'),
+        (8, 0, SECTION_TEXT),
+    ]
+    write_xml_dump(dumps / 'jawiki-pages-articles.xml', sorted(new_pages))
+    _run(monkeypatch, dumps, out)
+    manifest = json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))
+    assert manifest == {'added': [8], 'changed': [2], 'removed': [7], 'unchanged': [5, 6]}
+    assert sorted(_read_pages(out)) == ['2.txt', '5.txt', '6.txt', '8.txt']
+    assert _read_pages(out)['2.txt'] == SECTION_TEXT + '追記'
+    assert (out / 'pages' / '5.txt').stat().st_mtime_ns == 0
+    assert not (out / '.page_revisions.partial').exists()
+
+    # --full は一致するページも書き直すが、差分判定は同じ
+    _run(monkeypatch, dumps, out, '--full')
+    assert (out / 'pages' / '5.txt').stat().st_mtime_ns != 0
+    manifest = json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))
+    assert manifest == {'added': [], 'changed': [], 'removed': [], 'unchanged': [2, 5, 6, 8]}
+
+
+def test_main_packed_store(tmp_path, monkeypatch, dumps, write_xml_dump):
+    """
+    --page-store packed は pages/ と同じ内容を pages.dat / pages.idx に書き、差分実行では変更分だけ追記する。
+    古い本文の割合が COMPACT_DEAD_RATIO 以上になれば実行の最後に詰め直す。
+    """
+    out_files = tmp_path / 'files'
+    out = tmp_path / 'packed'
+    _run(monkeypatch, dumps, out_files)
+    _run(monkeypatch, dumps, out, '--page-store', 'packed')
+    assert not (out / 'pages').exists()
+    meta = json.loads((out / 'page_meta.json').read_text(encoding='utf-8'))
+    assert meta['page_store'] == 'packed'
+    with open_page_store(out, 'packed') as store:
+        assert {f'{pid}.txt': text for pid, text in iter_pages(store)} == _read_pages(out_files)
+
+    size = (out / 'pages.dat').stat().st_size
+    new_pages = [p for p in PAGES if p[0] != 7] + [(7, 0, SECTION_TEXT + '追記', 701, 'changed')]
+    write_xml_dump(dumps / 'jawiki-pages-articles.xml', new_pages)
+    ratio = page_store.COMPACT_DEAD_RATIO
+    monkeypatch.setattr(page_store, 'COMPACT_DEAD_RATIO', 1.0)
+    _run(monkeypatch, dumps, out, '--page-store', 'packed')
+    assert (out / 'pages.dat').stat().st_size == size + len((SECTION_TEXT + '追記').encode('utf-8'))
+    with open_page_store(out, 'packed') as store:
+        assert store.get(7) == SECTION_TEXT + '追記'
+        assert store.ids() == [2, 5, 6, 7]
+    monkeypatch.setattr(page_store, 'COMPACT_DEAD_RATIO', ratio)
+    _run(monkeypatch, dumps, out, '--page-store', 'packed')
+    with open_page_store(out, 'packed') as store:
+        assert store.get(7) == SECTION_TEXT + '追記'
+        assert (out / 'pages.dat').stat().st_size == sum(len(store.get(pid).encode('utf-8')) for pid in store.ids())
+
+    # --full は作り直す（古い本文が残らない）
+    _run(monkeypatch, dumps, out, '--page-store', 'packed', '--full')
+    with open_page_store(out, 'packed') as store:
+        assert (out / 'pages.dat').stat().st_size == sum(len(store.get(pid).encode('utf-8')) for pid in store.ids())
+
+
+def test_main_store_sections(tmp_path, monkeypatch, dumps):
+    """--store sections は対象 ID 以外を登場人物セクションだけで保存し、位置を page_sections.json に出す。"""
+    out_full = tmp_path / 'full'
+    out = tmp_path / 'sections'
+    _run(monkeypatch, dumps, out_full)
+    _run(monkeypatch, dumps, out, '--store', 'sections')
+    full = _read_pages(out_full)
+    pages = _read_pages(out)
+    assert sorted(pages) == sorted(full)
+    assert pages['5.txt'] == full['5.txt'] and pages['6.txt'] == full['6.txt'] == TOUJO_TEXT
+    start, end = SECTION_TEXT.index('; 太郎'), SECTION_TEXT.index('\n== 脚注')
+    assert pages['2.txt'] == pages['7.txt'] == SECTION_TEXT[start:end]
+    sections = json.loads((out / 'page_sections.json').read_text(encoding='utf-8'))
+    assert sections['sections'] == {'2': [start, end], '7': [start, end]}
+
+    # 同じ出力先で --store full に戻すと保存形が変わるページは changed として書き直す
+    _run(monkeypatch, dumps, out)
+    assert _read_pages(out) == full
+    manifest = json.loads((out / 'pages_manifest.json').read_text(encoding='utf-8'))
+    assert manifest['changed'] == [2, 7] and manifest['unchanged'] == [5, 6]
+    assert json.loads((out / 'page_sections.json').read_text(encoding='utf-8'))['sections'] == {}
+
+
+def test_main_section_offsets(tmp_path, monkeypatch, dumps):
+    """全文を保存した登場人物セクションありページは、判定時のセクション位置を page_sections.json の offsets に出す。"""
+    from wiki_extract.characters import extract_character_candidates as ecc
+    from wiki_extract.extract.revisions import load_section_offsets, sections_path_for
+
+    out = tmp_path / 'out'
+    _run(monkeypatch, dumps, out)
+    offsets = load_section_offsets(sections_path_for(out))
+    assert sorted(offsets) == [2, 7]
+    pages = _read_pages(out)
+    assert pages['2.txt'][offsets[2][0]:offsets[2][1]] == '; 太郎'
+
+    # extract-character-candidates は登場人物セクションありページのセクションを探し直さない
+    orig_extract = ecc.extract_toujo_section
+
+    def _extract(text):
+        assert text != SECTION_TEXT
+        return orig_extract(text)
+
+    monkeypatch.setattr(ecc, 'extract_toujo_section', _extract)
+    monkeypatch.setattr(sys, 'argv', ['prog', '--input-dir', str(out), '--exclude-list', str(tmp_path / 'none.json')])
+    ecc.main()
+    assert '太郎' in (out / 'character_candidates.csv').read_text(encoding='utf-8')
+
+
+def test_store_sections_same_candidates(tmp_path, monkeypatch, dumps):
+    """--store sections の出力からも extract-character-candidates は同じ候補を出す。"""
+    from wiki_extract.characters import extract_character_candidates as ecc
+
+    results = []
+    for store in ('full', 'sections'):
+        out = tmp_path / store
+        _run(monkeypatch, dumps, out, '--store', store)
+        monkeypatch.setattr(sys, 'argv', ['prog', '--input-dir', str(out), '--exclude-list', str(tmp_path / 'none.json')])
+        ecc.main()
+        results.append((out / 'character_candidates.csv').read_text(encoding='utf-8'))
+    assert results[0] == results[1]
+    assert '太郎' in results[0]
+
+
+@pytest.mark.parametrize('workers, cache', [('1', 'memory'), ('2', 'memory'), ('1', 'off'), ('1', 'file')])
+def test_main_emit_candidates_matches_two_stage(tmp_path, monkeypatch, request, dumps, workers, cache):
+    """
+    --emit-candidates は pages/ を書かずに、2 段で実行したときと同じ候補 CSV を出す。
+    --no-line-cache でも、--line-cache-file を読み書きしても同じ。
+    """
+    from wiki_extract.characters import extract_character_candidates as ecc
+
+    exclude = tmp_path / 'exclude.json'
+    exclude.write_text(json.dumps({'exact': ['花子']}, ensure_ascii=False), encoding='utf-8')
+    two_stage = tmp_path / 'two_stage'
+    _run(monkeypatch, dumps, two_stage)
+    monkeypatch.setattr(sys, 'argv', ['prog', '--input-dir', str(two_stage), '--exclude-list', str(exclude)])
+    ecc.main()
+
+    fused = tmp_path / 'fused'
+    request.addfinalizer(lambda: ecc.set_line_cache_enabled(True))
+    cache_file = tmp_path / 'line_cache.json'
+    cache_args = {
+        'memory': [],
+        'off': ['--no-line-cache'],
+        'file': ['--line-cache-file', str(cache_file)],
+    }[cache]
+    for _ in range(2 if cache == 'file' else 1):
+        _run(monkeypatch, dumps, fused, '--emit-candidates', '--exclude-list', str(exclude), '--workers', workers,
+             *cache_args)
+    assert cache_file.is_file() == (cache == 'file')
+    assert not (fused / 'pages').exists()
+    assert not (fused / 'pages_manifest.json').exists()
+    for name in ('character_candidates.csv', 'character_candidates_excluded.csv'):
+        assert (fused / name).read_text(encoding='utf-8') == (two_stage / name).read_text(encoding='utf-8')
+    assert (fused / 'page_meta.json').read_text(encoding='utf-8') == \
+        (two_stage / 'page_meta.json').read_text(encoding='utf-8')
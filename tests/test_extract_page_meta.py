@@ -0,0 +1,88 @@
+"""
+page_meta のテスト。書き出したページだけの page_meta.json と古い形式の読み込み。
+"""
+
+import json
+
+from wiki_extract.extract import page_meta
+from wiki_extract.util.title_map import PAGE_TITLES_NAME, save_title_map
+
+
+def _read(path):
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def test_write_and_load(tmp_path):
+    """pages は page_id 昇順で、タイトルと種別から対応表と登場人物専用ページの集合を読める。"""
+    path = page_meta.page_meta_path_for(tmp_path)
+    target_ids = {5, 6}
+    toujo_page_ids = {6}
+    titles = {2: 'B', 5: 'E', 6: 'F作品の登場人物'}
+    page_meta.write_page_meta(
+        path,
+        [(pid, titles.get(pid), page_meta.page_kind(pid, target_ids, toujo_page_ids)) for pid in (6, 2, 5, 9)],
+        page_store='files',
+    )
+    meta = _read(path)
+    assert meta['pages'] == [
+        {'id': 2, 'title': 'B', 'kind': 'section'},
+        {'id': 5, 'title': 'E', 'kind': 'fictional'},
+        {'id': 6, 'title': 'F作品の登場人物', 'kind': 'toujo'},
+        {'id': 9, 'title': None, 'kind': 'section'},
+    ]
+    assert 'main_id_to_title' not in meta
+    assert page_meta.load_page_titles(tmp_path, meta) == titles
+    assert page_meta.load_toujo_page_ids(meta) == {6}
+
+
+def test_full_title_map(tmp_path):
+    """main_id_to_title を渡すと全件が入り、page_titles.bin があればそれを優先して読む。"""
+    path = page_meta.page_meta_path_for(tmp_path)
+    page_meta.write_page_meta(path, [(1, 'a', 'fictional')], page_store='packed', main_id_to_title={1: 'a', 3: 'c'})
+    meta = _read(path)
+    assert meta['main_id_to_title'] == {'1': 'a', '3': 'c'}
+    assert meta['page_store'] == 'packed'
+    save_title_map(tmp_path / PAGE_TITLES_NAME, {1: 'a', 3: 'c'})
+    assert page_meta.load_page_titles(tmp_path, meta) == {1: 'a', 3: 'c'}
+
+
+def test_load_old_format(tmp_path):
+    """version の無い古い形式は main_id_to_title（int キーに変換）と toujo_page_ids を使う。"""
+    meta = {'main_id_to_title': {'1': 'a', '2': 'b'}, 'toujo_page_ids': [2]}
+    assert page_meta.load_page_titles(tmp_path, meta) == {1: 'a', 2: 'b'}
+    assert page_meta.load_toujo_page_ids(meta) == {2}
+
+
+def test_seeds(tmp_path):
+    """seed_page_ids を渡すと、seed カテゴリ配下のページに属する seed を seeds として入れる。"""
+    path = page_meta.page_meta_path_for(tmp_path)
+    page_meta.write_page_meta(
+        path,
+        [(1, 'a', 'fictional'), (2, 'b', 'fictional'), (3, 'c', 'section')],
+        page_store='files',
+        seed_page_ids={'架空の人物': {1, 2}, '架空の動物': {2, 9}},
+    )
+    assert _read(path)['pages'] == [
+        {'id': 1, 'title': 'a', 'kind': 'fictional', 'seeds': ['架空の人物']},
+        {'id': 2, 'title': 'b', 'kind': 'fictional', 'seeds': ['架空の人物', '架空の動物']},
+        {'id': 3, 'title': 'c', 'kind': 'section'},
+    ]
+
+
+def test_update_page_meta(tmp_path):
+    """既存のページは種別・seeds を残してタイトルだけ更新し、新しいページを加える。"""
+    path = page_meta.page_meta_path_for(tmp_path)
+    page_meta.write_page_meta(
+        path,
+        [(1, 'a', 'fictional'), (2, 'b', 'section')],
+        page_store='packed',
+        seed_page_ids={'架空の人物': {1}},
+    )
+    page_meta.update_page_meta(path, [(1, 'a2', 'requested'), (3, 'c', 'requested')], page_store='files')
+    meta = _read(path)
+    assert meta['page_store'] == 'packed'
+    assert meta['pages'] == [
+        {'id': 1, 'title': 'a2', 'kind': 'fictional', 'seeds': ['架空の人物']},
+        {'id': 2, 'title': 'b', 'kind': 'section'},
+        {'id': 3, 'title': 'c', 'kind': 'requested'},
+    ]
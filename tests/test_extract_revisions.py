@@ -0,0 +1,85 @@
+"""
+revisions のテスト。差分判定・実行中記録の読み戻し・マニフェスト。
+"""
+
+from wiki_extract.extract import revisions
+
+
+def test_classify_page():
+    """前回に無ければ added、リビジョン ID・sha1・保存形が一致すれば unchanged、それ以外は changed。"""
+    previous = {1: (10, 'a', None), 2: (20, 'b', None), 3: (0, '', None), 4: (40, 'd', (5, 9))}
+    assert revisions.classify_page(previous, 9, 90, 'x') == 'added'
+    assert revisions.classify_page(previous, 1, 10, 'a') == 'unchanged'
+    assert revisions.classify_page(previous, 2, 21, 'b') == 'changed'
+    assert revisions.classify_page(previous, 2, 20, 'c') == 'changed'
+    assert revisions.classify_page(previous, 3, 0, '') == 'changed'
+    assert revisions.classify_page(previous, 4, 40, 'd', (5, 9)) == 'unchanged'
+    assert revisions.classify_page(previous, 4, 40, 'd') == 'changed'
+    assert revisions.classify_page(previous, 1, 10, 'a', (0, 3)) == 'changed'
+
+
+def test_write_and_load_revisions(tmp_path):
+    """write_revisions / write_sections で書いたものを読める。壊れたファイルは空。"""
+    path = tmp_path / 'page_revisions.json'
+    entries = {2: (20, 'b', 'added', (3, 8)), 1: (10, 'a', 'unchanged', None)}
+    revisions.write_revisions(path, entries)
+    assert revisions.load_revisions(path) == {1: (10, 'a', None), 2: (20, 'b', (3, 8))}
+    sections_path = tmp_path / 'page_sections.json'
+    revisions.write_sections(sections_path, entries)
+    assert revisions.load_sections(sections_path) == {2: (3, 8)}
+    assert revisions.load_section_offsets(sections_path) == {}
+    revisions.write_sections(sections_path, entries, {1: (5, 9), 4: (0, 1)})
+    assert revisions.load_sections(sections_path) == {2: (3, 8)}
+    assert revisions.load_section_offsets(sections_path) == {1: (5, 9)}
+    path.write_text('{', encoding='utf-8')
+    assert revisions.load_revisions(path) == {}
+    assert revisions.load_revisions(tmp_path / 'missing.json') == {}
+
+
+def test_journal_resume_keeps_entries_up_to_page_id(tmp_path):
+    """resume_page_id 以下の記録だけ引き継ぎ、書き込み途中の行は捨てる。"""
+    path = tmp_path / '.page_revisions.partial'
+    journal = revisions.RevisionJournal(path)
+    journal.record(1, 10, 'a', 'added')
+    journal.record(3, 30, 'c', 'changed', (4, 12))
+    journal.record(5, 50, 'e', 'unchanged')
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('7\t70\tg')
+    resumed = revisions.RevisionJournal(path, resume_page_id=4)
+    assert resumed.entries == {1: (10, 'a', 'added', None), 3: (30, 'c', 'changed', (4, 12))}
+    resumed.record(6, 60, 'f', 'added')
+    resumed.close()
+    reread = revisions.RevisionJournal(path, resume_page_id=9)
+    reread.close()
+    assert reread.entries == {
+        1: (10, 'a', 'added', None), 3: (30, 'c', 'changed', (4, 12)), 6: (60, 'f', 'added', None),
+    }
+
+
+def test_journal_offsets(tmp_path):
+    """全文を保存したページのセクション位置も記録・読み戻す。offset の列が無い古い行も読める。"""
+    path = tmp_path / '.page_revisions.partial'
+    journal = revisions.RevisionJournal(path)
+    journal.record(1, 10, 'a', 'added', offset=(2, 7))
+    journal.record(2, 20, 'b', 'added')
+    journal.record(3, 30, 'c', 'added', offset=(0, 4))
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('4\t40\td\tadded\t\n')
+    resumed = revisions.RevisionJournal(path, resume_page_id=4)
+    resumed.close()
+    assert resumed.offsets == {1: (2, 7), 3: (0, 4)}
+    assert resumed.entries[4] == (40, 'd', 'added', None)
+    resumed = revisions.RevisionJournal(path, resume_page_id=2)
+    resumed.close()
+    assert resumed.offsets == {1: (2, 7)}
+
+
+def test_build_manifest():
+    """状態ごとの page_id と、前回だけにある removed を昇順で返す。"""
+    entries = {3: (30, 'c', 'changed', None), 1: (10, 'a', 'unchanged', None), 4: (40, 'd', 'added', None)}
+    previous = {1: (10, 'a', None), 2: (20, 'b', None), 3: (29, 'c', None)}
+    assert revisions.build_manifest(entries, previous) == {
+        'added': [4], 'changed': [3], 'removed': [2], 'unchanged': [1],
+    }
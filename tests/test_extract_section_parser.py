@@ -2,10 +2,52 @@
 section_parser のテスト。登場人物セクション抽出とキャラ名パース。
 """
 
+import mwparserfromhell
 import pytest
 
 from wiki_extract.extract import section_parser as sp
 
+# 軽量スキャナと mwparserfromhell を突き合わせる見出し/用語のサンプル
+NAME_CORPUS = [
+    '虎杖 悠仁（いたどり ゆうじ）',
+    '[[志村ケン太]]',
+    'おこりや長介（[[いかりや長介]]）',
+    '[[太郎|たろう]]（声 - [[花子]]）',
+    '[[a|]]',
+    '[[Category:架空の人物]]',
+    '[[ 空白 ]]入り',
+    '主要人物<ref name="a" />',
+    '七海 建人<ref>{{Cite book|title=x}}</ref>（ななみ けんと）',
+    '[[太郎]]<ref>[[出典]]</ref>',
+    "'''強調'''",
+    '{{Ruby|漢字|かんじ}}',
+    '太郎<!-- コメント -->',
+    '&amp;太郎',
+    '[[a]]]',
+    '[[[a]]',
+    '[http://example.com 外部]',
+    '* リスト風',
+    '=見出し風=',
+    '<span>花子</span>',
+    'a__NOTOC__b',
+    '[[w:ja:a|b]]',
+    '',
+]
+
+# 見出しの取り出し方を突き合わせる登場人物セクションのサンプル
+SECTION_CORPUS = [
+    '=== 太郎 ===\n; 花子\n==== 次郎 ====\n本文\n== 脚注 ==\n',
+    '=== 太郎<ref name="a"/> ===\n=== [[五郎|ごろう]] ===\n',
+    '=== a === x\n=== b ===\n',
+    '=== a ===<!-- c -->\n',
+    '<nowiki>\n=== a ===\n</nowiki>\n=== b ===',
+    '{{a|\n=== x ===}}\n',
+    '{{\n=== x ===\n}}\n',
+    '<ref name="x\n=== t ===\n">\n',
+    '\r=== q ===\n=== r ===\r\n',
+    '= y =\n=== z ===\n',
+]
+
 
 def test_extract_toujo_section_none():
     """「登場人物」が含まれないと None。"""
@@ -60,6 +102,50 @@ a
     assert '補足' not in got
 
 
+@pytest.mark.parametrize('text', [
+    '== 概要 ==\nx\n== 登場人物 ==\n; 太郎\n=== 主要 ===\n; 花子\n== 脚注 ==\n',
+    '== 登場人物 ==\n; 太郎\n',
+    '== 登場人物 ==\n',
+    '== 登場人物 ==',
+    '== 登場人物 ==\n; 太郎\n=== 役名に関する補足 ===\n補足',
+    '=== 登場人物 ===\na\n== 主な登場人物 ==\nb\n=== 脇役 ===\nc',
+    '登場人物は本文中のみ',
+    '== 登場人物 ==\n=== 主な登場人物 ===\n; 太郎\n== 脚注 ==',
+    '== 登場人物 ==\r\n; 太郎\r\n== 脚注 ==\r\n',
+    '== 登場人物 ==\n\n== 脚注 ==\n',
+    '== 登場人物 ==\n== 脚注 ==\n',
+    '== 登場人物 == \n; 太郎\n==\n== 脚注 ==',
+])
+def test_toujo_section_span_matches_extract(text):
+    """toujo_section_span の範囲を切り出すと extract_toujo_section と一致する。"""
+    span = sp.toujo_section_span(text)
+    expected = sp.extract_toujo_section(text)
+    assert (None if span is None else text[span[0]:span[1]]) == expected
+
+
+def test_iter_headings():
+    """見出し行を (レベル, タイトル, 行頭, 行末) で返す。改行をまたいだり、見出しでない行にはマッチしない。"""
+    text = '前文\n== 概要 ==\n本文 == x ==\n=== 登場人物 ===  \n==\n\n== 脚注 ==\r\n'
+    got = list(sp.iter_headings(text))
+    assert [(h.level, h.title) for h in got] == [(2, '概要'), (3, '登場人物'), (2, '脚注')]
+    assert [text[h.start:h.end] for h in got] == ['== 概要 ==', '=== 登場人物 ===  ', '== 脚注 ==\r']
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('== 概要 ==\nx\n== 登場人物 ==\n; 太郎\n=== 主要 ===\n; 花子\n== 脚注 ==\n', '; 太郎\n=== 主要 ===\n; 花子'),
+    ('== 登場人物 ==\n; 太郎\n', '; 太郎\n'),
+    ('== 登場人物 ==\n', ''),
+    ('== 登場人物 ==', None),
+    ('== 登場人物 ==\n== 脚注 ==\n', None),
+    ('== 登場人物 ==\n\n== 脚注 ==\n', ''),
+    ('=== 登場人物 ===\na\n== 主な登場人物 ==\nb\n=== 脇役 ===\nc', 'b\n=== 脇役 ===\nc'),
+])
+def test_toujo_section_span(text, expected):
+    """行単位で読んでいたときと同じ範囲（セクション内の「登場人物」見出しからは数え直し、空行だけでも空文字）。"""
+    span = sp.toujo_section_span(text)
+    assert (None if span is None else text[span[0]:span[1]]) == expected
+
+
 def test_normalize_title():
     """#アンカー除去、空白をアンダースコアに。"""
     assert sp._normalize_title('Foo Bar') == 'Foo_Bar'
@@ -90,6 +176,56 @@ def test_headings_with_dt_in_body():
     assert '単独' not in got
 
 
+def test_section_outline():
+    """見出しの木・; 行・太字だけの行を 1 回で集める。; 行は開いている上位の見出しにも印を付ける。"""
+    section = """=== 主要人物 ===
+==== 太郎 ====
+; 太郎（たろう）
+==== 花子 ====
+本文
+=== 脇役 ===
+'''次郎'''
+== 脚注 ==
+; 注
+"""
+    outline = sp.section_outline(section)
+    assert outline.headings == [
+        sp.OutlineHeading(3, '主要人物', True),
+        sp.OutlineHeading(4, '太郎', True),
+        sp.OutlineHeading(4, '花子', False),
+        sp.OutlineHeading(3, '脇役', False),
+        sp.OutlineHeading(2, '脚注', False),
+    ]
+    assert outline.dt_terms == ['太郎（たろう）', '注']
+    assert outline.bold_names == ['次郎']
+
+
+@pytest.mark.parametrize('text', NAME_CORPUS)
+def test_name_parts_scanner_matches_mwparserfromhell(text):
+    """軽量スキャナで読めた見出し/用語は mwparserfromhell と同じ平文・リンク先になる。"""
+    scanned = sp._scan_name_parts(text)
+    if scanned is None:
+        return
+    plain, titles = sp._parse_name_parts(text)
+    assert (scanned[0].strip(), scanned[1]) == (plain.strip(), titles)
+
+
+def test_name_parts_scanner_coverage():
+    """平文・リンク・ref だけの見出しはスキャナで読み、テンプレートや強調などは mwparserfromhell に回す。"""
+    assert sp._scan_name_parts('おこりや長介（[[いかりや長介]]）') == ('おこりや長介（いかりや長介）', ['いかりや長介'])
+    assert sp._scan_name_parts('七海 建人<ref>{{Cite book|title=x}}</ref>（ななみ けんと）') == ('七海 建人（ななみ けんと）', [])
+    for text in ("'''強調'''", '{{Ruby|漢字|かんじ}}', '太郎<!-- コメント -->', '&amp;太郎', '* リスト風', '[[a]]]'):
+        assert sp._scan_name_parts(text) is None
+
+
+@pytest.mark.parametrize('text', SECTION_CORPUS)
+def test_section_headings_match_mwparserfromhell(text):
+    """セクションの見出しの列は、行で読めるときもそうでないときも mwparserfromhell と同じ。"""
+    parsed = mwparserfromhell.parse(text)
+    expected = [(h.level, str(h.title).strip()) for h in parsed.filter_headings()]
+    assert sp._section_headings(text, sp.section_outline(text)) == expected
+
+
 def test_strip_ref_tags():
     """<ref>...</ref> を除去。"""
     wikitext = '太郎<ref>出典</ref>です。'
@@ -0,0 +1,46 @@
+"""
+sql_cache のテスト。保存・読込の往復、壊れたキャッシュ、ダンプ差し替えでのキー変化。
+"""
+
+import os
+
+from wiki_extract.extract import sql_cache
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    """辞書（空・多バイト文字を含む）と集合を保存して同じ内容で読み戻す。"""
+    maps = {'main': {3: '作品A', 1: "It's_a_title", 10: ''}, 'empty': {}}
+    sets = {'toujo': {2, 5, -1}, 'none': set()}
+    path = tmp_path / 'c' / 'page-x.bin'
+    sql_cache.save_tables(path, maps=maps, sets=sets)
+    assert sql_cache.load_tables(path) == (maps, sets)
+    assert not path.with_name(path.name + '.tmp').exists()
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    """無いファイル・切り詰めたファイル・マジック違いは None。"""
+    path = tmp_path / 'page-x.bin'
+    assert sql_cache.load_tables(path) is None
+    sql_cache.save_tables(path, maps={'main': {1: 'あ'}}, sets={'s': {1}})
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    assert sql_cache.load_tables(path) is None
+    path.write_bytes(b'XXXXXX' + data[6:])
+    assert sql_cache.load_tables(path) is None
+
+
+def test_cache_path_changes_with_dump(tmp_path):
+    """ダンプの内容・更新時刻やパラメータが変わるとキャッシュのパスも変わる。"""
+    dump = tmp_path / 'jawiki-page.sql.gz'
+    dump.write_bytes(b'abc')
+    first = sql_cache.cache_path(tmp_path, 'page', [dump])
+    assert sql_cache.cache_path(tmp_path, 'page', [dump]) == first
+    assert first.name.startswith('page-')
+    assert sql_cache.cache_path(tmp_path, 'page', [dump], {'seed': 'x'}) != first
+    assert sql_cache.cache_path(tmp_path, 'page', [dump, None]) != first
+    st = dump.stat()
+    os.utime(dump, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert sql_cache.cache_path(tmp_path, 'page', [dump]) != first
+    dump.write_bytes(b'abd')
+    os.utime(dump, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert sql_cache.cache_path(tmp_path, 'page', [dump]) != first
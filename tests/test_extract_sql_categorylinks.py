@@ -7,19 +7,6 @@ import pytest
 from wiki_extract.extract import sql_categorylinks as sqlcl
 
 
-def test_normalize_title():
-    """空白・全角をアンダースコア、NFKC。"""
-    assert sqlcl._normalize_title('Foo Bar') == 'Foo_Bar'
-    assert sqlcl._normalize_title(None) == ''
-    assert sqlcl._normalize_title('  a  ') == 'a'
-
-
-def test_canonical_title():
-    """比較用: 制御文字除去、空白・アンダースコア除去。"""
-    assert sqlcl._canonical_title('Foo_Bar') == 'FooBar'
-    assert sqlcl._canonical_title(None) == ''
-
-
 def test_is_garbage_linktarget_title():
     """ゴミとみなすタイトルは True。"""
     assert sqlcl._is_garbage_linktarget_title('') is True
@@ -29,25 +16,50 @@ def test_is_garbage_linktarget_title():
     assert sqlcl._is_garbage_linktarget_title('正常なカテゴリ') is False
 
 
-def test_build_category_set():
-    """seed 配下の全カテゴリ名を固定点で求める。"""
+def test_build_category_sets():
+    """seed 配下の全カテゴリ名と、それぞれが属する seed のビットマスク。"""
     subcat_rows = [(2, '架空の人物'), (3, 'サブ')]  # cl_from, 親カテゴリ名
     category_page_id_to_title = {2: 'サブ', 3: 'サブサブ'}
-    got = sqlcl._build_category_set(subcat_rows, category_page_id_to_title, '架空の人物')
-    assert len(got) >= 1
-    # seed と子カテゴリが含まれる（正規化でアンダースコアになる場合あり）
-    assert 'サブ' in got
-    assert 'サブサブ' in got
+    got, _stats = sqlcl._build_category_sets(subcat_rows, category_page_id_to_title, ['架空の人物'])
+    assert got == {'架空の人物': 1, 'サブ': 1, 'サブサブ': 1}
+
+
+def test_build_category_sets_multi_seed():
+    """複数の seed は 1 回の走査で求め、重なるカテゴリは両方のビットを持つ。None の seed はたどらない。"""
+    subcat_rows = [(2, '架空の人物'), (3, 'サブ'), (4, '架空の動物'), (3, '架空の動物')]
+    category_page_id_to_title = {2: 'サブ', 3: 'サブサブ', 4: '動物サブ'}
+    got, stats = sqlcl._build_category_sets(
+        subcat_rows, category_page_id_to_title, ['架空の人物', '架空の動物', None]
+    )
+    assert got == {'架空の人物': 1, 'サブ': 1, 'サブサブ': 3, '架空の動物': 2, '動物サブ': 2}
+    assert [s.nodes if s else None for s in stats] == [3, 3, None]
 
 
-def test_build_category_page_id_set():
+def test_build_category_page_id_sets():
     """seed_page_id 配下の全カテゴリ page_id。"""
     subcat_rows_by_lt = [(2, 1), (3, 1)]  # cl_from, parent lt_id
     lt_id_to_page_id = {1: 100}  # seed の page_id が 100
-    got = sqlcl._build_category_page_id_set(subcat_rows_by_lt, lt_id_to_page_id, 100)
-    assert 100 in got
-    assert 2 in got
-    assert 3 in got
+    got, _stats = sqlcl._build_category_page_id_sets(subcat_rows_by_lt, lt_id_to_page_id, [100], ['架空の人物'])
+    assert got == {100: 1, 2: 1, 3: 1}
+
+
+def test_build_category_sets_cycle_stats():
+    """循環があっても止まり、深さ・カテゴリ数・戻る辺を数える。"""
+    # 架空の人物 → A → B → C → A（循環）、B → B（自己ループ）、別系統の D は含まない
+    category_page_id_to_title = {1: 'A', 2: 'B', 3: 'C', 4: 'D'}
+    subcat_rows = [(1, '架空の人物'), (2, 'A'), (3, 'B'), (1, 'C'), (2, 'B'), (4, 'E')]
+    got, stats = sqlcl._build_category_sets(subcat_rows, category_page_id_to_title, ['架空の人物'])
+    assert set(got) == {'架空の人物', 'A', 'B', 'C'}
+    assert stats == [sqlcl.ClosureStats('架空の人物', nodes=4, depth=3, edges=5, back_edges=2)]
+
+
+def test_build_category_page_id_sets_stats():
+    """page_id 版も同じ統計を返す。"""
+    subcat_rows_by_lt = [(2, 1), (3, 2), (100, 3)]  # 100 → 2 → 3 → 100
+    lt_id_to_page_id = {1: 100, 2: 2, 3: 3}
+    got, stats = sqlcl._build_category_page_id_sets(subcat_rows_by_lt, lt_id_to_page_id, [100], ['架空の人物'])
+    assert set(got) == {100, 2, 3}
+    assert (stats[0].nodes, stats[0].depth, stats[0].back_edges) == (3, 2, 1)
 
 
 def test_resolve_seed_page_id_exact():
@@ -61,3 +73,117 @@ def test_resolve_seed_page_id_no_match():
     """一致が無ければ None。"""
     category_page_id_to_title = {10: '他のカテゴリ'}
     assert sqlcl._resolve_seed_page_id('架空の人物', category_page_id_to_title) is None
+
+
+CATEGORY_TITLES = {100: '架空の人物', 101: '架空の探偵', 102: '架空の名探偵', 103: '実在の人物'}
+
+CL_TO_COLUMNS = [
+    ('cl_from', 'int(8) unsigned NOT NULL DEFAULT 0'),
+    ('cl_to', "varbinary(255) NOT NULL DEFAULT ''"),
+    ('cl_sortkey', "varbinary(230) NOT NULL DEFAULT ''"),
+    ('cl_type', "enum('page','subcat','file') NOT NULL DEFAULT 'page'"),
+]
+
+CL_TO_ROWS = [
+    ('101', "'架空の人物'", "'a),(b'", "'subcat'"),
+    ('102', "'架空の探偵'", "''", "'subcat'"),
+    ('1', "'架空の名探偵'", "'x\\'y'", "'page'"),
+    ('2', "'架空の人物'", "''", "'page'"),
+    ('3', "'実在の人物'", "''", "'page'"),
+    ('4', "'架空の人物'", "''", "'file'"),
+]
+
+CL_TARGET_COLUMNS = [
+    ('cl_from', 'int(8) unsigned NOT NULL DEFAULT 0'),
+    ('cl_sortkey', "varbinary(230) NOT NULL DEFAULT ''"),
+    ('cl_type', "enum('page','subcat','file') NOT NULL DEFAULT 'page'"),
+    ('cl_target_id', 'bigint(20) unsigned NOT NULL'),
+]
+
+CL_TARGET_ROWS = [
+    ('101', "''", "'subcat'", '10'),
+    ('102', "'k\\n'", "'subcat'", '11'),
+    ('1', "''", "'page'", '12'),
+    ('2', "''", "'page'", '10'),
+    ('3', "''", "'page'", '13'),
+]
+
+LINKTARGET_COLUMNS = [
+    ('lt_id', 'bigint(20) unsigned NOT NULL'),
+    ('lt_namespace', 'int(11) NOT NULL'),
+    ('lt_title', 'varbinary(255) NOT NULL'),
+]
+
+LINKTARGET_ROWS = [
+    ('10', '14', "'架空の人物'"),
+    ('11', '14', "'架空の探偵'"),
+    ('12', '14', "'架空の名探偵'"),
+    ('13', '14', "'実在の人物'"),
+    ('14', '0', "'架空の人物'"),
+]
+
+
+def test_run_categorylinks_cl_to(tmp_path, write_sql_dump):
+    """cl_to 形式: サブカテゴリをたどって「架空の人物」配下の page だけを返す。"""
+    path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TO_COLUMNS, CL_TO_ROWS)
+    assert sqlcl.run_categorylinks(path, CATEGORY_TITLES, log_progress_fn=False) == {'架空の人物': {1, 2}}
+
+
+def test_run_categorylinks_linktarget(tmp_path, write_sql_dump):
+    """1.45+ 形式: linktarget で cl_target_id を解決して同じ結果。"""
+    path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+    lt_path = write_sql_dump(tmp_path / 'linktarget.sql.gz', 'linktarget', LINKTARGET_COLUMNS, LINKTARGET_ROWS)
+    got = sqlcl.run_categorylinks(path, CATEGORY_TITLES, linktarget_path=lt_path, log_progress_fn=False)
+    assert got == {'架空の人物': {1, 2}}
+
+
+@pytest.mark.parametrize('fmt', ['cl_to', 'linktarget'])
+def test_run_categorylinks_seeds(tmp_path, write_sql_dump, fmt):
+    """複数の seed は seed ごとの配下の page を返す。重複した seed は 1 つにまとめる。"""
+    seeds = ['架空の人物', '架空の探偵', '架空の人物', '実在の人物']
+    if fmt == 'cl_to':
+        path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TO_COLUMNS, CL_TO_ROWS)
+        lt_path = None
+    else:
+        path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+        lt_path = write_sql_dump(tmp_path / 'linktarget.sql.gz', 'linktarget', LINKTARGET_COLUMNS, LINKTARGET_ROWS)
+    got = sqlcl.run_categorylinks(
+        path, CATEGORY_TITLES, seeds=seeds, linktarget_path=lt_path, log_progress_fn=False
+    )
+    assert got == {'架空の人物': {1, 2}, '架空の探偵': {1}, '実在の人物': {3}}
+
+
+@pytest.mark.parametrize('seeds, expected', [
+    (['実在の人物', '架空の人物'], {'実在の人物': {3}, '架空の人物': {1, 2}}),
+    (['架空の探偵', '架空の人物'], {'架空の探偵': {1}, '架空の人物': {1, 2}}),
+    (['実在の人物'], {'実在の人物': {3}}),
+])
+def test_run_categorylinks_missing_fictional_linktarget(tmp_path, write_sql_dump, seeds, expected):
+    """linktarget に架空の人物の行が無いときの推定は、seed の並び順によらず架空の人物にだけ当てる。"""
+    path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+    rows = [row for row in LINKTARGET_ROWS if row[0] != '10']
+    lt_path = write_sql_dump(tmp_path / 'linktarget.sql.gz', 'linktarget', LINKTARGET_COLUMNS, rows)
+    got = sqlcl.run_categorylinks(path, CATEGORY_TITLES, seeds=seeds, linktarget_path=lt_path, log_progress_fn=False)
+    assert got == expected
+
+
+def test_run_categorylinks_requires_linktarget(tmp_path, write_sql_dump):
+    """cl_to が無く linktarget も無ければ FileNotFoundError。"""
+    path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+    with pytest.raises(FileNotFoundError):
+        sqlcl.run_categorylinks(path, CATEGORY_TITLES, log_progress_fn=False)
+
+
+def test_run_categorylinks_reads_dump_once(tmp_path, write_sql_dump, monkeypatch):
+    """categorylinks ダンプは 1 回だけ開く。"""
+    path = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TO_COLUMNS, CL_TO_ROWS)
+    opened = []
+    reader = sqlcl.SqlDumpReader
+
+    def _open(p, **kw):
+        opened.append(p)
+        return reader(p, **kw)
+
+    monkeypatch.setattr(sqlcl, 'SqlDumpReader', _open)
+    assert sqlcl.run_categorylinks(path, CATEGORY_TITLES, log_progress_fn=False) == {'架空の人物': {1, 2}}
+    assert opened == [path]
@@ -0,0 +1,113 @@
+"""
+sql_dump のテスト。列の射影・述語・エスケープ・高速経路と正確な経路の一致。
+"""
+
+import random
+
+import pytest
+
+from wiki_extract.extract import sql_dump
+
+COLUMNS = [
+    ('page_id', 'int(10) unsigned NOT NULL'),
+    ('page_namespace', 'int(11) NOT NULL'),
+    ('page_title', "varbinary(255) NOT NULL DEFAULT ''"),
+    ('page_extra', 'varbinary(255) DEFAULT NULL'),
+]
+
+
+def _quote(s):
+    """文字列を mysqldump 形式の文字列リテラルにする。"""
+    escaped = s.replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n').replace('\0', '\\0')
+    return f"'{escaped}'"
+
+
+def test_rows_projection_and_where(tmp_path, write_sql_dump):
+    """指定した列だけを指定順で返し、述語に合う行だけを残す。NULL は None。"""
+    rows = [
+        ('1', '0', "'作品A'", 'NULL'),
+        ('2', '14', "'架空の人物'", "'x'"),
+        ('3', '1', "'ノート'", 'NULL'),
+        ('4', '0', "'It\\'s_a),(title'", "'NULL'"),
+    ]
+    path = write_sql_dump(tmp_path / 'page.sql.gz', 'page', COLUMNS, rows)
+    with sql_dump.SqlDumpReader(path) as dump:
+        assert dump.columns == ['page_id', 'page_namespace', 'page_title', 'page_extra']
+        got = list(dump.rows(['page_title', 'page_id', 'page_extra'], where={'page_namespace': {'0', '14'}.__contains__}))
+    assert got == [('作品A', '1', None), ('架空の人物', '2', 'x'), ("It's_a),(title", '4', 'NULL')]
+
+
+def test_rows_single_column_and_positions(tmp_path, write_sql_dump):
+    """列は位置でも指定でき、1 列だけでもタプルで返す。"""
+    path = write_sql_dump(tmp_path / 'page.sql', 'page', COLUMNS, [('1', '0', "'a'", 'NULL')])
+    with sql_dump.SqlDumpReader(path) as dump:
+        assert list(dump.rows([2])) == [('a',)]
+
+
+def test_rows_unknown_column_and_second_pass(tmp_path, write_sql_dump):
+    """無い列名は KeyError、行は 1 回しか読めない。"""
+    path = write_sql_dump(tmp_path / 'page.sql', 'page', COLUMNS, [('1', '0', "'a'", 'NULL')])
+    with sql_dump.SqlDumpReader(path) as dump:
+        with pytest.raises(KeyError):
+            dump.rows(['cl_to'])
+    with sql_dump.SqlDumpReader(path) as dump:
+        list(dump.rows(['page_id']))
+        with pytest.raises(RuntimeError):
+            list(dump.rows(['page_id']))
+
+
+def test_rows_skips_tuples_with_wrong_column_count(tmp_path, write_sql_dump):
+    """列数の合わないタプルは読み飛ばして数える。"""
+    rows = [('1', '0', "'a'", 'NULL'), ('2', '0', "'b'"), ('3', '0', "'c'", 'NULL')]
+    path = write_sql_dump(tmp_path / 'page.sql', 'page', COLUMNS, rows, rows_per_insert=3)
+    with sql_dump.SqlDumpReader(path) as dump:
+        assert list(dump.rows(['page_id'])) == [('1',), ('3',)]
+        assert dump.skipped == 1
+
+
+@pytest.mark.parametrize('fast', [True, False])
+def test_rows_random_strings_roundtrip(tmp_path, write_sql_dump, monkeypatch, fast):
+    """区切り・引用符・エスケープを含む文字列も元どおりに返す（高速経路でも正確な経路でも同じ）。"""
+    if not fast:
+        monkeypatch.setattr(sql_dump, '_split_line_fast', lambda *args: None)
+    rng = random.Random(12)
+    alphabet = ['a', 'あ', ',', "'", '\\', '(', ')', '),(', '\n', '\0', '"', ' ', 'NULL', '_binary ']
+    expected = []
+    rows = []
+    for page_id in range(1, 300):
+        title = ''.join(rng.choice(alphabet) for _ in range(rng.randrange(0, 8)))
+        extra = None if rng.random() < 0.2 else ''.join(rng.choice(alphabet) for _ in range(3))
+        ns = rng.choice(['0', '1', '14'])
+        rows.append((str(page_id), ns, _quote(title), 'NULL' if extra is None else _quote(extra)))
+        if ns != '1':
+            expected.append((str(page_id), title, extra))
+    path = write_sql_dump(tmp_path / 'page.sql.gz', 'page', COLUMNS, rows, rows_per_insert=7)
+    with sql_dump.SqlDumpReader(path, decompress='inline') as dump:
+        got = list(dump.rows(['page_id', 'page_title', 'page_extra'], where={'page_namespace': {'0', '14'}.__contains__}))
+    assert got == expected
+
+
+def test_rows_where_skips_rows_before_csv(tmp_path, write_sql_dump, monkeypatch):
+    """述語の列が最初の文字列より前なら、合わない行は csv に渡さずに捨てる（後ろの列の述語は分けてから評価）。"""
+    parsed = []
+    reader = sql_dump.csv.reader
+    monkeypatch.setattr(sql_dump.csv, 'reader', lambda pieces, **kw: reader(parsed.extend(pieces) or pieces, **kw))
+    rows = [(str(i), str(i % 10), f"'t{i}'", 'NULL' if i % 3 else "'x'") for i in range(1, 101)]
+    path = write_sql_dump(tmp_path / 'page.sql', 'page', COLUMNS, rows, rows_per_insert=50)
+    with sql_dump.SqlDumpReader(path) as dump:
+        got = list(dump.rows(['page_id', 'page_extra'], where={'page_namespace': '4'.__eq__}))
+    assert got == [(str(i), None if i % 3 else 'x') for i in range(4, 101, 10)]
+    assert len(parsed) == 10
+    parsed.clear()
+    with sql_dump.SqlDumpReader(path) as dump:
+        got = list(dump.rows(['page_id'], where={'page_extra': {'x'}.__contains__, 'page_namespace': {'0', '3'}.__contains__}))
+    assert got == [(str(i),) for i in range(1, 101) if i % 3 == 0 and i % 10 in (0, 3)]
+    assert len(parsed) == 100
+
+
+def test_rows_where_separator_inside_string(tmp_path, write_sql_dump):
+    """文字列の中の '),(' で切れた断片を行と取り違えず、正確な経路で読み直す。"""
+    rows = [('1', '1', "'a),(9,14,b'", 'NULL'), ('2', '14', "'c'", 'NULL')]
+    path = write_sql_dump(tmp_path / 'page.sql', 'page', COLUMNS, rows)
+    with sql_dump.SqlDumpReader(path) as dump:
+        assert list(dump.rows(['page_id', 'page_title'], where={'page_namespace': '14'.__eq__})) == [('2', 'c')]
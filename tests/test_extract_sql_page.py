@@ -1,5 +1,5 @@
 """
-sql_page のテスト。_normalize_page_title と TOUJO_PATTERN。
+sql_page のテスト。TOUJO_PATTERN と run_page。
 """
 
 import pytest
@@ -7,13 +7,6 @@ import pytest
 from wiki_extract.extract import sql_page
 
 
-def test_normalize_page_title():
-    """NFKC 正規化、空白・全角スペースをアンダースコアに。"""
-    assert sql_page._normalize_page_title('Foo Bar') == 'Foo_Bar'
-    assert sql_page._normalize_page_title('') == ''
-    assert sql_page._normalize_page_title('  a  b  ') == 'a_b'
-
-
 def test_toujo_pattern_match():
     """「○○の登場人物」「○○の登場人物一覧」にマッチ。"""
     assert sql_page.TOUJO_PATTERN.match('呪術廻戦の登場人物') is not None
@@ -25,3 +18,43 @@ def test_toujo_pattern_no_match():
     """「登場人物」だけや他形式はマッチしない。"""
     assert sql_page.TOUJO_PATTERN.match('登場人物') is None
     assert sql_page.TOUJO_PATTERN.match('あらすじ') is None
+
+
+PAGE_COLUMNS = [
+    ('page_id', 'int(10) unsigned NOT NULL AUTO_INCREMENT'),
+    ('page_namespace', 'int(11) NOT NULL DEFAULT 0'),
+    ('page_title', "varbinary(255) NOT NULL DEFAULT ''"),
+    ('page_is_redirect', 'tinyint(1) unsigned NOT NULL DEFAULT 0'),
+]
+
+PAGE_ROWS = [
+    ('1', '0', "'作品A'", '0'),
+    ('2', '0', "'作品Aの登場人物'", '0'),
+    ('3', '14', "'架空の人物'", '0'),
+    ('4', '1', "'作品A'", '0'),
+    ('5', '0', "'It\\'s_a_title'", '0'),
+]
+
+
+@pytest.mark.parametrize('method', ['auto', 'thread', 'inline'])
+def test_run_page(tmp_path, write_sql_dump, method):
+    """page ダンプから main / category の id→title と登場人物ページ ID を返す（展開方法に依存しない）。"""
+    path = write_sql_dump(tmp_path / 'jawiki-page.sql.gz', 'page', PAGE_COLUMNS, PAGE_ROWS)
+    main, cat, toujo = sql_page.run_page(path, log_progress_fn=False, decompress=method)
+    assert main == {1: '作品A', 2: '作品Aの登場人物', 5: "It's_a_title"}
+    assert cat == {3: '架空の人物'}
+    assert toujo == {2}
+
+
+def test_run_page_cache(tmp_path, write_sql_dump, monkeypatch):
+    """cache_dir を渡すと 2 回目はダンプを読まずにキャッシュから同じ結果を返す。"""
+    path = write_sql_dump(tmp_path / 'jawiki-page.sql.gz', 'page', PAGE_COLUMNS, PAGE_ROWS)
+    cache_dir = tmp_path / 'cache'
+    first = sql_page.run_page(path, log_progress_fn=False, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob('page-*.bin'))) == 1
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('ダンプを読んだ')
+
+    monkeypatch.setattr(sql_page, 'SqlDumpReader', _fail)
+    assert sql_page.run_page(path, log_progress_fn=False, cache_dir=cache_dir) == first
@@ -0,0 +1,121 @@
+"""
+sql_tables のテスト。page / linktarget / categorylinks を並行に読んでも 1 本で読んだのと同じ結果になる。
+"""
+
+import pytest
+
+from wiki_extract.extract import sql_tables
+
+CL_TO_COLUMNS = [
+    ('cl_from', 'int(8) unsigned NOT NULL DEFAULT 0'),
+    ('cl_to', "varbinary(255) NOT NULL DEFAULT ''"),
+    ('cl_sortkey', "varbinary(230) NOT NULL DEFAULT ''"),
+    ('cl_type', "enum('page','subcat','file') NOT NULL DEFAULT 'page'"),
+]
+
+CL_TO_ROWS = [
+    ('101', "'架空の人物'", "'a),(b'", "'subcat'"),
+    ('102', "'架空の探偵'", "''", "'subcat'"),
+    ('1', "'架空の名探偵'", "'x\\'y'", "'page'"),
+    ('2', "'架空の人物'", "''", "'page'"),
+    ('3', "'実在の人物'", "''", "'page'"),
+    ('4', "'架空の人物'", "''", "'file'"),
+]
+
+CL_TARGET_COLUMNS = [
+    ('cl_from', 'int(8) unsigned NOT NULL DEFAULT 0'),
+    ('cl_sortkey', "varbinary(230) NOT NULL DEFAULT ''"),
+    ('cl_type', "enum('page','subcat','file') NOT NULL DEFAULT 'page'"),
+    ('cl_target_id', 'bigint(20) unsigned NOT NULL'),
+]
+
+CL_TARGET_ROWS = [
+    ('101', "''", "'subcat'", '10'),
+    ('102', "'k\\n'", "'subcat'", '11'),
+    ('1', "''", "'page'", '12'),
+    ('2', "''", "'page'", '10'),
+    ('3', "''", "'page'", '13'),
+]
+
+LINKTARGET_COLUMNS = [
+    ('lt_id', 'bigint(20) unsigned NOT NULL'),
+    ('lt_namespace', 'int(11) NOT NULL'),
+    ('lt_title', 'varbinary(255) NOT NULL'),
+]
+
+LINKTARGET_ROWS = [
+    ('10', '14', "'架空の人物'"),
+    ('11', '14', "'架空の探偵'"),
+    ('12', '14', "'架空の名探偵'"),
+    ('13', '14', "'実在の人物'"),
+    ('14', '0', "'架空の人物'"),
+]
+
+PAGE_COLUMNS = [
+    ('page_id', 'int(10) unsigned NOT NULL AUTO_INCREMENT'),
+    ('page_namespace', 'int(11) NOT NULL DEFAULT 0'),
+    ('page_title', "varbinary(255) NOT NULL DEFAULT ''"),
+]
+
+PAGE_ROWS = [
+    ('1', '0', "'探偵A'"),
+    ('2', '0', "'人物B'"),
+    ('3', '0', "'実在C'"),
+    ('5', '0', "'作品Dの登場人物'"),
+    ('100', '14', "'架空の人物'"),
+    ('101', '14', "'架空の探偵'"),
+    ('102', '14', "'架空の名探偵'"),
+    ('103', '14', "'実在の人物'"),
+]
+
+
+@pytest.fixture(params=['cl_to', 'linktarget'])
+def dumps(request, tmp_path, write_sql_dump):
+    """(page, categorylinks, linktarget or None) のダンプ。"""
+    page = write_sql_dump(tmp_path / 'page.sql.gz', 'page', PAGE_COLUMNS, PAGE_ROWS)
+    if request.param == 'cl_to':
+        cl = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TO_COLUMNS, CL_TO_ROWS)
+        return page, cl, None
+    cl = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+    lt = write_sql_dump(tmp_path / 'linktarget.sql.gz', 'linktarget', LINKTARGET_COLUMNS, LINKTARGET_ROWS)
+    return page, cl, lt
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_run_sql_tables(dumps, parallel):
+    """並行でも 1 本でも、page の表と「架空の人物」配下の page_id が同じ。"""
+    page, cl, lt = dumps
+    got = sql_tables.run_sql_tables(page, cl, linktarget_path=lt, log_progress_fn=False, parallel=parallel)
+    assert got.main_id_to_title == {1: '探偵A', 2: '人物B', 3: '実在C', 5: '作品Dの登場人物'}
+    assert got.category_id_to_title == {100: '架空の人物', 101: '架空の探偵', 102: '架空の名探偵', 103: '実在の人物'}
+    assert got.toujo_page_ids == {5}
+    assert got.seed_page_ids == {'架空の人物': {1, 2}}
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_run_sql_tables_seeds(dumps, parallel):
+    """複数の seed カテゴリは 1 回の走査で seed ごとの配下の page_id を返す。"""
+    page, cl, lt = dumps
+    got = sql_tables.run_sql_tables(
+        page, cl, seeds=['架空の人物', '架空の探偵'], linktarget_path=lt, log_progress_fn=False, parallel=parallel
+    )
+    assert got.seed_page_ids == {'架空の人物': {1, 2}, '架空の探偵': {1}}
+
+
+def test_run_sql_tables_cache(dumps, tmp_path, monkeypatch):
+    """2 回目はキャッシュから読み、ダンプもワーカーも使わない。"""
+    page, cl, lt = dumps
+    cache_dir = tmp_path / 'cache'
+    first = sql_tables.run_sql_tables(page, cl, linktarget_path=lt, log_progress_fn=False, cache_dir=cache_dir)
+    monkeypatch.setattr(sql_tables, 'ProcessPoolExecutor', None)
+    monkeypatch.setattr(sql_tables, 'SqlDumpReader', None)
+    second = sql_tables.run_sql_tables(page, cl, linktarget_path=lt, log_progress_fn=False, cache_dir=cache_dir)
+    assert second == first
+
+
+def test_run_sql_tables_requires_linktarget(tmp_path, write_sql_dump):
+    """1.45+ 形式で linktarget が無ければワーカーを起動する前に FileNotFoundError。"""
+    page = write_sql_dump(tmp_path / 'page.sql.gz', 'page', PAGE_COLUMNS, PAGE_ROWS)
+    cl = write_sql_dump(tmp_path / 'categorylinks.sql.gz', 'categorylinks', CL_TARGET_COLUMNS, CL_TARGET_ROWS)
+    with pytest.raises(FileNotFoundError):
+        sql_tables.run_sql_tables(page, cl, log_progress_fn=False)
@@ -0,0 +1,62 @@
+"""
+titles のテスト。タイトルの正規化（高速経路を含む）と TitleIndex の逆引き。
+"""
+
+import re
+import unicodedata
+
+import pytest
+
+from wiki_extract.extract.titles import TitleIndex, canonical_title, normalize_title
+
+
+def _normalize_reference(s):
+    t = unicodedata.normalize('NFKC', s)
+    return re.sub(r'[\s\u3000]+', '_', t).strip().strip('_')
+
+
+def _canonical_reference(s):
+    t = unicodedata.normalize('NFKC', s)
+    t = ''.join(c for c in t if unicodedata.category(c) not in ('Cf', 'Cc'))
+    return re.sub(r'[\s_\u3000]+', '', t)
+
+
+def test_normalize_title():
+    """空白・全角をアンダースコア、NFKC、前後の _ を除く。None と空は空文字。"""
+    assert normalize_title('Foo Bar') == 'Foo_Bar'
+    assert normalize_title('  a  b  ') == 'a_b'
+    assert normalize_title('ＡＢＣ　の人物') == 'ABC_の人物'
+    assert normalize_title('_x_') == 'x'
+    assert normalize_title(None) == ''
+    assert normalize_title('') == ''
+
+
+def test_canonical_title():
+    """比較用: 制御文字・書式文字除去、空白・アンダースコア除去。"""
+    assert canonical_title('Foo_Bar') == 'FooBar'
+    assert canonical_title('架空の\u200b人物') == '架空の人物'
+    assert canonical_title('架空　の_人物\t') == '架空の人物'
+    assert canonical_title(None) == ''
+
+
+@pytest.mark.parametrize('title', [
+    'plain_ascii', 'tab\there', 'ascii\x1cctrl', '架空の人物', 'ｶﾀｶﾅ', 'Ⅳ号', 'e\u0301', '\ufb01',
+    'nbsp\xa0x', 'em\u2003space', 'line\u2028sep', 'ogham\u1680x', 'soft\xadhyphen', 'zw\u200bsp', '\x85',
+])
+def test_fast_paths_match_reference(title):
+    """ASCII・正規化済みの高速経路でも、毎回 NFKC と正規表現を通すのと同じ結果。"""
+    assert normalize_title(title) == _normalize_reference(title)
+    assert canonical_title(title) == _canonical_reference(title)
+    assert canonical_title(normalize_title(title)) == _canonical_reference(title)
+
+
+def test_title_index():
+    """各タイトルを正規化して持ち、完全一致・比較用で逆引きする。重複は最初の page_id。"""
+    index = TitleIndex({10: '架空の 人物', 11: '架空の_人物', 12: 'ＡＢＣ', 13: ''})
+    assert index.titles == {10: '架空の_人物', 11: '架空の_人物', 12: 'ABC', 13: ''}
+    assert index.page_id('架空の人物') is None
+    assert index.page_id('架空の　人物') == 10
+    assert index.canonical_page_id('架空の\u200b人物') == 10
+    assert index.page_id('ABC') == 12
+    assert len(index) == 4
+    assert TitleIndex.of(index) is index
@@ -0,0 +1,247 @@
+"""
+xml_stream のテスト。tmp_path に小さな pages-articles（通常 / multistream）を作って検証。
+"""
+
+import os
+
+import pytest
+
+from wiki_extract.extract import xml_stream
+
+PAGES = [
+    (1, 0, '== 登場人物 ==\n; 太郎'),
+    (2, 1, 'ノート'),
+    (5, 0, 'A &amp; B &lt;ref&gt;'),
+    (8, 0, ''),
+    (9, 14, 'カテゴリ'),
+]
+
+EXPECTED = [
+    (1, 0, '== 登場人物 ==\n; 太郎'),
+    (2, 1, 'ノート'),
+    (5, 0, 'A & B <ref>'),
+    (8, 0, ''),
+    (9, 14, 'カテゴリ'),
+]
+
+
+def _fields(pages):
+    """Page から (page_id, ns, text) だけを取り出す。"""
+    return [page[:3] for page in pages]
+
+
+def test_stream_pages_plain_xml(tmp_path, write_xml_dump):
+    """.xml から (page_id, ns, text) をファイル順に yield。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    assert _fields(xml_stream.stream_pages(path)) == EXPECTED
+
+
+def test_stream_pages_bz2(tmp_path, write_xml_dump):
+    """.xml.bz2 も同じ結果。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml.bz2', PAGES)
+    assert _fields(xml_stream.stream_pages(path)) == EXPECTED
+
+
+def test_page_offset_for(tmp_path, monkeypatch, write_xml_dump):
+    """非圧縮の .xml で page_id 以下で最大の page_id の <page> の位置を二分探索で求める。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    data = path.read_bytes()
+    starts = [i for i in range(len(data)) if data.startswith(b'<page>', i)]
+    for span in (1 << 20, 16):
+        monkeypatch.setattr(xml_stream, '_OFFSET_SEARCH_SPAN', span)
+        assert xml_stream.page_offset_for(path, 0) is None
+        assert xml_stream.page_offset_for(path, 1) == starts[0]
+        assert xml_stream.page_offset_for(path, 4) == starts[1]
+        assert xml_stream.page_offset_for(path, 5) == starts[2]
+        assert xml_stream.page_offset_for(path, 100) == starts[-1]
+
+
+@pytest.mark.parametrize('reader', ['etree', 'bytes', 'expat'])
+def test_stream_pages_from_offset(tmp_path, write_xml_dump, reader):
+    """非圧縮の .xml はページの位置から読み始められる。圧縮ファイルでは ValueError。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    offset = xml_stream.page_offset_for(path, 5)
+    if reader == 'expat':
+        got = xml_stream.stream_pages_expat(path, start_offset=offset)
+    else:
+        got = xml_stream.stream_pages(path, target_ids={1, 5, 8} if reader == 'bytes' else None, start_offset=offset)
+    expected = [EXPECTED[2], EXPECTED[3]] if reader == 'bytes' else EXPECTED[2:]
+    if reader == 'expat':
+        expected = [p if p[1] == 0 else (p[0], p[1], '') for p in expected]
+    assert _fields(got) == expected
+    bz2_path = write_xml_dump(tmp_path / 'pages-articles.xml.bz2', PAGES)
+    with pytest.raises(ValueError):
+        list(xml_stream.stream_pages(bz2_path, start_offset=offset))
+
+
+def test_multistream_blocks(tmp_path, write_multistream_dump):
+    """索引のオフセットからブロック範囲を作る。ヘッダは含まず、末尾はファイル終端まで。"""
+    xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+    blocks = xml_stream.multistream_blocks(xml_path, index_path)
+    assert len(blocks) == 3
+    assert blocks[0][0] > 0
+    assert blocks[-1][1] == xml_path.stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(blocks, blocks[1:]))
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_stream_pages_multistream_matches_plain(tmp_path, write_multistream_dump, workers):
+    """multistream の並列展開は通常ストリームと同じ順序・内容。"""
+    xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+    got = list(xml_stream.stream_pages(xml_path, index_path=index_path, workers=workers))
+    assert _fields(got) == EXPECTED
+    # 索引なしで bz2 として読んでも同じ（連結ストリームの逐次展開）
+    assert list(xml_stream.stream_pages(xml_path)) == got
+
+
+@pytest.mark.parametrize('reader', ['etree', 'expat', 'multistream'])
+def test_stream_pages_main_only(tmp_path, write_xml_dump, write_multistream_dump, reader):
+    """main_only=True はどの読み方でも ns=0 のページだけを返す（既定は全名前空間）。"""
+    if reader == 'multistream':
+        xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+        got = xml_stream.stream_pages(xml_path, index_path=index_path, workers=2, main_only=True)
+    elif reader == 'expat':
+        got = xml_stream.stream_pages_expat(write_xml_dump(tmp_path / 'pages-articles.xml', PAGES), main_only=True)
+    else:
+        got = xml_stream.stream_pages(write_xml_dump(tmp_path / 'pages-articles.xml', PAGES), main_only=True)
+    assert _fields(got) == [page for page in EXPECTED if page[1] == 0]
+
+
+def test_scan_candidate_pages(tmp_path, write_xml_dump):
+    """バイト列スキャンは ns=0 で対象 ID か「登場人物」を含むページだけ返す。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml.bz2', PAGES)
+    got = _fields(xml_stream.stream_pages(path, target_ids={5}))
+    assert got == [EXPECTED[0], EXPECTED[2]]
+
+
+def test_scan_candidate_pages_small_reads(tmp_path, monkeypatch, write_xml_dump):
+    """読み込み単位がページより小さくても境界をまたいで同じ結果。"""
+    monkeypatch.setattr(xml_stream, '_SCAN_READ_SIZE', 7)
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    got = _fields(xml_stream.scan_candidate_pages(path, {5, 8, 9}))
+    assert got == [EXPECTED[0], EXPECTED[2], EXPECTED[3]]
+
+
+def test_stream_pages_multistream_with_target_ids(tmp_path, write_multistream_dump):
+    """multistream でもワーカー側で同じ事前判定をする。"""
+    xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+    got = _fields(xml_stream.stream_pages(xml_path, index_path=index_path, workers=2, target_ids={5}))
+    assert got == [EXPECTED[0], EXPECTED[2]]
+
+
+@pytest.mark.parametrize('multistream', [False, True])
+def test_stream_pages_targets_only(tmp_path, write_multistream_dump, multistream):
+    """sections=False は「登場人物」を含んでいても対象 ID 以外は返さない。"""
+    xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+    got = _fields(xml_stream.stream_pages(
+        xml_path, index_path=index_path if multistream else None, target_ids={5, 9}, sections=False
+    ))
+    assert got == [EXPECTED[2]]
+
+
+def test_stream_pages_targets_only_requires_target_ids(tmp_path, write_xml_dump):
+    """sections=False で target_ids が無ければ ValueError。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    with pytest.raises(ValueError):
+        list(xml_stream.stream_pages(path, sections=False))
+
+
+def test_scan_candidate_pages_stops_after_last_target(tmp_path, monkeypatch, write_xml_dump):
+    """sections=False の逐次読みは最大の対象 ID を過ぎたら残りを読まない。"""
+    monkeypatch.setattr(xml_stream, '_SCAN_READ_SIZE', 64)
+    path = write_xml_dump(tmp_path / 'pages-articles.xml', PAGES)
+    read_sizes = []
+    open_dump = xml_stream.open_dump
+
+    class _Counting:
+        def __init__(self, f):
+            self._f = f
+
+        def read(self, n):
+            data = self._f.read(n)
+            read_sizes.append(len(data))
+            return data
+
+        def close(self):
+            self._f.close()
+
+    monkeypatch.setattr(xml_stream, 'open_dump', lambda *a, **kw: _Counting(open_dump(*a, **kw)))
+    got = _fields(xml_stream.scan_candidate_pages(path, {1}, sections=False))
+    assert got == [EXPECTED[0]]
+    assert sum(read_sizes) < path.stat().st_size
+
+
+def test_target_blocks(tmp_path, write_multistream_dump):
+    """対象 ID を含むブロックだけを選ぶ。"""
+    xml_path, index_path = write_multistream_dump(tmp_path, PAGES)  # ブロックは [1, 2] [5, 8] [9]
+    blocks = xml_stream.multistream_blocks(xml_path, index_path)
+    block_index = xml_stream.read_multistream_index(index_path)
+    assert xml_stream.target_blocks(blocks, block_index, {5, 8}) == [blocks[1]]
+    assert xml_stream.target_blocks(blocks, block_index, {2, 9}) == [blocks[0], blocks[2]]
+    assert xml_stream.target_blocks(blocks, block_index, set()) == []
+
+
+def test_lookup_multistream_index(tmp_path, write_multistream_dump):
+    """索引から page_id か正規化タイトルが一致する行の page_id → タイトル。"""
+    _xml_path, index_path = write_multistream_dump(tmp_path, PAGES)
+    got = xml_stream.lookup_multistream_index(index_path, page_ids=[1, 3], titles=['P9', 'P404'])
+    assert got == {1: 'P1', 9: 'P9'}
+
+
+def test_stream_pages_expat(tmp_path, write_xml_dump):
+    """expat は etree と同じ順序で返し、ns != 0 のページの本文は空文字。"""
+    path = write_xml_dump(tmp_path / 'pages-articles.xml.bz2', PAGES)
+    got = _fields(xml_stream.stream_pages_expat(path))
+    assert got == [(pid, ns, text if ns == 0 else '') for pid, ns, text in EXPECTED]
+
+
+@pytest.mark.parametrize('reader', ['etree', 'bytes', 'expat', 'multistream'])
+def test_stream_pages_revision_and_sha1(tmp_path, write_xml_dump, write_multistream_dump, reader):
+    """どの読み方でも最終リビジョンの <id> と <sha1> を取り出す（contributor の <id> は無視）。"""
+    pages = [(1, 0, '== 登場人物 ==', 11, 'aaa'), (2, 0, '本文', 22, ''), (3, 0, '登場人物', 33, 'ccc')]
+    if reader == 'multistream':
+        xml_path, index_path = write_multistream_dump(tmp_path, pages)
+        got = xml_stream.stream_pages(xml_path, index_path=index_path, workers=1)
+    else:
+        xml_path = write_xml_dump(tmp_path / 'pages-articles.xml.bz2', pages)
+        if reader == 'expat':
+            got = xml_stream.stream_pages_expat(xml_path)
+        else:
+            got = xml_stream.stream_pages(xml_path, target_ids={2} if reader == 'bytes' else None)
+    assert [(p.page_id, p.revision_id, p.sha1) for p in got] == [(1, 11, 'aaa'), (2, 22, ''), (3, 33, 'ccc')]
+
+
+def _current_rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='/proc/self/statm が必要')
+def test_stream_pages_expat_bounded_rss(tmp_path, monkeypatch):
+    """約 64MB の合成ダンプを読み切っても RSS の増加がダンプサイズよりずっと小さい。"""
+    path = tmp_path / 'pages-articles.xml'
+    body = 'あ' * 2700  # UTF-8 で約 8KB
+    n_pages = 8000
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/">\n')
+        for pid in range(1, n_pages + 1):
+            ns = 0 if pid % 4 == 0 else 1
+            f.write(
+                f'<page><title>P{pid}</title><ns>{ns}</ns><id>{pid}</id>'
+                f'<revision><id>{pid}</id><text xml:space="preserve">{body}</text></revision></page>\n'
+            )
+        f.write('</mediawiki>\n')
+    dump_size = path.stat().st_size
+    baseline = _current_rss_bytes()
+    peak = baseline
+    count = 0
+    main_chars = 0
+    for _pid, ns, text, _rev, _sha1 in xml_stream.stream_pages_expat(path):
+        count += 1
+        if ns == 0:
+            main_chars += len(text)
+        if count % 200 == 0:
+            peak = max(peak, _current_rss_bytes())
+    assert count == n_pages
+    assert main_chars == len(body) * (n_pages // 4)
+    assert peak - baseline < min(32 * 1024 * 1024, dump_size // 2)
@@ -0,0 +1,56 @@
+"""
+xml_workers のテスト。書き出し判定と並列モードの決定性。
+"""
+
+import pytest
+
+from wiki_extract.extract import xml_workers
+
+SECTION_TEXT = '== 概要 ==\n本文\n== 登場人物 ==\n; 太郎\n== 脚注 ==\n'
+
+PAGES = [
+    (1, 0, '本文のみ'),
+    (2, 0, SECTION_TEXT),
+    (3, 1, SECTION_TEXT),
+    (4, 0, '登場人物は本文中のみ'),
+    (5, 0, 'ターゲット'),
+    (6, 0, SECTION_TEXT),
+]
+
+
+def test_select_page():
+    """対象 ID は 'target'、登場人物セクションありは 'section'、それ以外は None。"""
+    assert xml_workers.select_page(5, 0, 'x', {5}) == 'target'
+    assert xml_workers.select_page(2, 0, SECTION_TEXT, set()) == 'section'
+    assert xml_workers.select_page(3, 1, SECTION_TEXT, {3}) is None
+    assert xml_workers.select_page(4, 0, '登場人物は本文中のみ', set()) is None
+    assert xml_workers.select_page(1, 0, '本文のみ', set()) is None
+
+
+def test_select_page_span():
+    """'section' は判定に使った登場人物セクションの位置も返す。'target' の位置は None。"""
+    assert xml_workers.select_page_span(5, 0, SECTION_TEXT, {5}) == ('target', None)
+    kind, (start, end) = xml_workers.select_page_span(2, 0, SECTION_TEXT, set())
+    assert kind == 'section'
+    assert SECTION_TEXT[start:end] == '; 太郎'
+    assert xml_workers.select_page_span(1, 0, '本文のみ', set()) is None
+
+
+def test_iter_selected_pages_serial():
+    """workers=1 は入力順に書き出し対象を返す。"""
+    got = list(xml_workers.iter_selected_pages(PAGES, {5}))
+    assert [(page[0], kind) for page, kind, _span in got] == [(2, 'section'), (5, 'target'), (6, 'section')]
+    assert got[0][0] == PAGES[1]
+    assert [None if span is None else page[2][span[0]:span[1]] for page, _kind, span in got] == [
+        '; 太郎', None, '; 太郎',
+    ]
+
+
+@pytest.mark.parametrize('chunk_pages', [1, 2, 512])
+def test_iter_selected_pages_parallel_matches_serial(monkeypatch, chunk_pages):
+    """workers=2 でもチャンクサイズに関わらず結果・順序は workers=1 と同じ。"""
+    monkeypatch.setattr(xml_workers, 'SELECT_CHUNK_PAGES', chunk_pages)
+    pages = PAGES * 5
+    serial = list(xml_workers.iter_selected_pages(pages, {5}))
+    parallel = list(xml_workers.iter_selected_pages(pages, {5}, workers=2))
+    assert parallel == serial
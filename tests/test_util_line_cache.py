@@ -0,0 +1,67 @@
+"""
+line_cache のテスト。LRU の追い出し、ヒット率、無効化、ファイルへの保存。
+"""
+
+from wiki_extract.util.line_cache import LineCache, load_line_caches, save_line_caches
+
+
+def test_get_or_compute_counts_hits():
+    """同じキーは 2 回目から計算せずに返し、ヒット数・ミス数を数える。"""
+    calls = []
+    cache = LineCache(maxsize=4)
+    for key in ['a', 'b', 'a', 'a']:
+        assert cache.get_or_compute(key, lambda k: calls.append(k) or k.upper()) == key.upper()
+    assert calls == ['a', 'b']
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+    assert cache.hit_rate == 0.5
+    assert cache.summary() == 'ヒット率 50.0% (2/4), 保持 2件'
+
+
+def test_evicts_least_recently_used():
+    """上限を超えたら最も古く使われたキーから捨てる。"""
+    cache = LineCache(maxsize=2)
+    cache.get_or_compute('a', str.upper)
+    cache.get_or_compute('b', str.upper)
+    cache.get_or_compute('a', str.upper)
+    cache.get_or_compute('c', str.upper)
+    assert len(cache) == 2
+    cache.get_or_compute('a', str.upper)
+    assert cache.hits == 2
+    cache.get_or_compute('b', str.upper)
+    assert cache.misses == 4
+
+
+def test_disabled_always_computes():
+    """enabled=False なら覚えず数えない。clear で値と統計を捨てる。"""
+    calls = []
+    cache = LineCache(enabled=False)
+    cache.get_or_compute('a', calls.append)
+    cache.get_or_compute('a', calls.append)
+    assert calls == ['a', 'a']
+    assert (cache.hits, cache.misses, len(cache), cache.hit_rate) == (0, 0, 0, 0.0)
+    cache.enabled = True
+    cache.get_or_compute('a', calls.append)
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def test_save_and_load_line_caches(tmp_path):
+    """保存した値は使われた順のまま読み戻し、タプルはタプルに戻す。版が違う・壊れたファイルは読まない。"""
+    path = tmp_path / 'cache.json'
+    names: LineCache[str, tuple[str, ...]] = LineCache()
+    clean: LineCache[str, str] = LineCache(maxsize=2)
+    names.get_or_compute('; a、b', lambda k: ('a', 'b'))
+    for key in ['x', 'y', 'x']:
+        clean.get_or_compute(key, str.upper)
+    save_line_caches(path, 'v1', {'names': names, 'clean': clean})
+
+    names2: LineCache[str, tuple[str, ...]] = LineCache()
+    clean2: LineCache[str, str] = LineCache(maxsize=2)
+    assert load_line_caches(path, 'v1', {'names': names2, 'clean': clean2}) == 3
+    assert names2.items() == [('; a、b', ('a', 'b'))]
+    assert clean2.items() == [('y', 'Y'), ('x', 'X')]
+    assert (clean2.hits, clean2.misses) == (0, 0)
+    assert load_line_caches(path, 'v2', {'names': LineCache()}) == 0
+    path.write_text('{', encoding='utf-8')
+    assert load_line_caches(path, 'v1', {'names': LineCache()}) == 0
+    assert load_line_caches(tmp_path / 'missing.json', 'v1', {'names': LineCache()}) == 0
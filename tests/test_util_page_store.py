@@ -0,0 +1,137 @@
+"""
+page_store のテスト。packed の追記・上書き・削除・不完全な書き込みへの耐性と、files との互換。
+"""
+
+import pytest
+
+from wiki_extract.util import page_store
+
+
+def test_packed_put_get_and_reopen(tmp_path):
+    """書いたページを mmap で読める。再オープンで追記し、同じ page_id は後の内容で上書きされる。"""
+    writer = page_store.PackedPageWriter(tmp_path)
+    writer.put(3, '三')
+    writer.put(1, 'いち')
+    writer.close()
+    writer = page_store.PackedPageWriter(tmp_path)
+    assert 3 in writer and 2 not in writer
+    writer.put(3, '三（改）')
+    writer.delete(1)
+    writer.close()
+    with page_store.PackedPageStore(tmp_path) as store:
+        assert store.ids() == [3]
+        assert store.get(3) == '三（改）'
+        with store.get_bytes(3) as view:
+            assert bytes(view) == '三（改）'.encode('utf-8')
+        with pytest.raises(KeyError):
+            store.get(1)
+
+
+def test_packed_fresh_discards_existing(tmp_path):
+    """fresh=True は既存の pages.dat / pages.idx を捨てて作り直す。"""
+    writer = page_store.PackedPageWriter(tmp_path)
+    writer.put(1, 'a' * 100)
+    writer.close()
+    writer = page_store.PackedPageWriter(tmp_path, fresh=True)
+    writer.put(2, 'b')
+    writer.close()
+    assert (tmp_path / 'pages.dat').read_bytes() == b'b'
+    with page_store.open_page_store(tmp_path, 'packed') as store:
+        assert store.ids() == [2]
+
+
+def test_packed_ignores_torn_writes(tmp_path):
+    """索引末尾の不完全なレコードと pages.dat の範囲外を指すレコードは無視し、追記は境界から続ける。"""
+    writer = page_store.PackedPageWriter(tmp_path)
+    writer.put(1, 'one')
+    writer.put(2, 'two')
+    writer.close()
+    # 2 の本文が書かれる前に落ちた状態 + 書きかけのレコード
+    with open(tmp_path / 'pages.dat', 'r+b') as f:
+        f.truncate(3)
+    with open(tmp_path / 'pages.idx', 'ab') as f:
+        f.write(b'\x05\x00')
+    writer = page_store.PackedPageWriter(tmp_path)
+    assert 1 in writer and 2 not in writer
+    writer.put(2, 'two')
+    writer.close()
+    with page_store.PackedPageStore(tmp_path) as store:
+        assert [(pid, store.get(pid)) for pid in store.ids()] == [(1, 'one'), (2, 'two')]
+
+
+def test_empty_packed_store(tmp_path):
+    """ページが 1 つも無い packed ストアも開ける。"""
+    page_store.PackedPageWriter(tmp_path).close()
+    with page_store.open_page_store(tmp_path, 'packed') as store:
+        assert len(store) == 0
+
+
+def test_files_layout_matches_packed(tmp_path):
+    """files レイアウトも同じ操作で読み書きでき、内容は packed と一致する。"""
+    pages = {5: '五', 2: 'に', 9: ''}
+    for layout in page_store.PAGE_STORE_LAYOUTS:
+        writer = page_store.open_page_writer(tmp_path / layout, layout)
+        for page_id, text in pages.items():
+            writer.put(page_id, text)
+        writer.delete(9)
+        writer.close()
+    with page_store.open_page_store(tmp_path / 'files') as files, \
+         page_store.open_page_store(tmp_path / 'packed', 'packed') as packed:
+        assert list(page_store.iter_pages(files)) == list(page_store.iter_pages(packed)) == [(2, 'に'), (5, '五')]
+        assert files.location(2).endswith('2.txt')
+        assert 'pages.dat@' in packed.location(2)
+
+
+def test_open_page_store_missing(tmp_path):
+    """ストアが無ければ FileNotFoundError。"""
+    with pytest.raises(FileNotFoundError):
+        page_store.open_page_store(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        page_store.open_page_store(tmp_path, 'packed')
+
+
+def test_packed_compact(tmp_path):
+    """使われていない部分が閾値以上なら生きているページだけに詰め直し、未満なら何もしない。続けて書ける。"""
+    writer = page_store.PackedPageWriter(tmp_path)
+    writer.put(2, 'b' * 10)
+    writer.put(1, 'a' * 10)
+    assert writer.compact() == 0
+    writer.put(2, 'B' * 10)
+    writer.delete(1)
+    assert writer.compact() == 20
+    assert (tmp_path / 'pages.dat').read_bytes() == b'B' * 10
+    assert (tmp_path / 'pages.idx').stat().st_size == 24
+    writer.put(3, 'c')
+    writer.close()
+    with page_store.PackedPageStore(tmp_path) as store:
+        assert [(pid, store.get(pid)) for pid in store.ids()] == [(2, 'B' * 10), (3, 'c')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['pages.dat', 'pages.idx']
+
+
+@pytest.mark.parametrize('data_replaced', [False, True])
+def test_packed_compact_interrupted(tmp_path, monkeypatch, data_replaced):
+    """pages.idx.new を置いた後に落ちても、次に開いたときに置き換えを終わらせる。置く前なら一時ファイルを捨てる。"""
+    writer = page_store.PackedPageWriter(tmp_path)
+    writer.put(1, 'old')
+    writer.put(1, 'new')
+    real_finish = page_store._finish_compaction
+
+    def _crash(data_path, index_path):
+        if data_replaced:
+            page_store.os.replace(data_path.with_name('pages.dat.tmp'), data_path)
+        raise OSError('crash')
+
+    monkeypatch.setattr(page_store, '_finish_compaction', _crash)
+    with pytest.raises(OSError):
+        writer.compact()
+    monkeypatch.setattr(page_store, '_finish_compaction', real_finish)
+    with page_store.PackedPageStore(tmp_path) as store:
+        assert store.get(1) == 'new'
+    assert (tmp_path / 'pages.dat').read_bytes() == b'new'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['pages.dat', 'pages.idx']
+
+    (tmp_path / 'pages.dat.tmp').write_bytes(b'partial')
+    (tmp_path / 'pages.idx.tmp').write_bytes(b'partial')
+    with page_store.PackedPageStore(tmp_path) as store:
+        assert store.get(1) == 'new'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['pages.dat', 'pages.idx']
@@ -0,0 +1,53 @@
+"""
+title_map のテスト。TitleMap の引き方・保存と mmap 読込。
+"""
+
+import pytest
+
+from wiki_extract.util import title_map
+
+
+def test_from_items_lookup():
+    """順不同・重複ありでも page_id 昇順に並び、重複は後のものを採る。"""
+    m = title_map.TitleMap.from_items([(5, 'え'), (1, 'a'), (3, ''), (5, '江')])
+    assert len(m) == 3
+    assert list(m) == [1, 3, 5]
+    assert list(m.items()) == [(1, 'a'), (3, ''), (5, '江')]
+    assert m[5] == '江'
+    assert m.get(2) is None
+    assert m.get(2, 'x') == 'x'
+    assert 3 in m and 4 not in m and '3' not in m
+    with pytest.raises(KeyError):
+        m[4]
+    assert m == {1: 'a', 3: '', 5: '江'}
+
+
+def test_save_and_load_mmap(tmp_path):
+    """保存したファイルを mmap で開いて同じ内容。dict からも保存できる。"""
+    path = tmp_path / title_map.PAGE_TITLES_NAME
+    source = {10: '作品A', 2: "It's", 7: '登場人物_一覧'}
+    title_map.save_title_map(path, source)
+    loaded = title_map.load_title_map(path)
+    assert loaded == source
+    assert loaded.get(7) == '登場人物_一覧'
+    assert title_map.TitleMap.from_buffer(loaded.encode()) == source
+
+
+def test_load_corrupt(tmp_path):
+    """切り詰めたファイルは ValueError。"""
+    path = tmp_path / 'titles.bin'
+    title_map.save_title_map(path, {1: 'a', 2: 'b'})
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        title_map.load_title_map(path)
+
+
+
+def test_pickle_mmap(tmp_path):
+    """mmap で開いた TitleMap も pickle で受け渡せる（ワーカープロセスの返り値）。"""
+    import pickle
+
+    path = tmp_path / 'titles.bin'
+    title_map.save_title_map(path, {1: 'a', 2: 'び'})
+    loaded = pickle.loads(pickle.dumps(title_map.load_title_map(path)))
+    assert loaded == {1: 'a', 2: 'び'}
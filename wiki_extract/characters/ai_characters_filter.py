@@ -9,7 +9,15 @@ import re
 import sys
 from pathlib import Path
 
-from wiki_extract.characters.extract_character_candidates import clean_wiki_content, is_excluded_name
+from wiki_extract.characters.extract_character_candidates import (
+    clean_wiki_content,
+    is_excluded_name,
+    line_cache_enabled,
+    line_cache_summary,
+    load_line_cache,
+    save_line_cache,
+    set_line_cache_enabled,
+)
 from wiki_extract.llm.batch_runner import run_llm_batch_loop, stagger_batch_start
 from wiki_extract.llm.client import (
     call_llm_chat,
@@ -385,11 +393,18 @@ def parse_args() -> object:
                    help='除外CSV（既定: <inputの同dir>/characters_excluded.csv）')
     p.add_argument('--exclude-list', type=Path, default=None,
                    help='除外対象ブラックリスト（JSON）。既定: WIKI_EXCLUDE_LIST または data/excluded_names.json')
+    p.add_argument('--no-line-cache', action='store_true',
+                   help='同じ名前の clean_wiki_content の結果を覚えず毎回計算する（除去ルールの調整用）')
+    p.add_argument('--line-cache-file', type=Path, default=None,
+                   help='clean_wiki_content の結果を読み書きする JSON。再実行で使い回す（ルールの版が違えば読まない）。既定: 使わない')
     return p.parse_args()
 
 
 def main() -> None:
     args = parse_args()
+    set_line_cache_enabled(not args.no_line_cache)
+    if args.line_cache_file:
+        log(f'  行キャッシュ: {args.line_cache_file} から {load_line_cache(args.line_cache_file)}件')
     list_path = Path(args.input_list)
     validate_input_file(
         list_path,
@@ -450,6 +465,10 @@ def main() -> None:
             excluded_count,
         )
         log(f'  対象: {target_path}, 除外: {excluded_path}, 今回 対象={target_count}, 除外={excluded_count}, エラー数={errors}')
+        if line_cache_enabled():
+            log(f'  行キャッシュ: {line_cache_summary()}')
+        if args.line_cache_file:
+            save_line_cache(args.line_cache_file)
 
     log('')
     log(f'  実行時間: {format_elapsed(total_timer.elapsed)} ({total_timer.elapsed:.1f}秒)')
@@ -4,15 +4,21 @@
 """
 
 import csv
+import hashlib
 import json
 import os
 import re
 import sys
 from pathlib import Path
+from typing import Callable
 
+from wiki_extract.extract.page_meta import load_page_titles, load_toujo_page_ids, page_meta_path_for
+from wiki_extract.extract.revisions import load_section_offsets, load_sections, sections_path_for
 from wiki_extract.extract.section_parser import extract_toujo_section
 from wiki_extract.extract.sql_page import TOUJO_PATTERN
+from wiki_extract.util.line_cache import LineCache, load_line_caches, save_line_caches
 from wiki_extract.util.log import format_elapsed, log, log_progress, Timer
+from wiki_extract.util.page_store import open_page_store
 
 
 def strip_efn(s: str) -> str:
@@ -1739,53 +1745,536 @@ def split_multi_names(s: str) -> list[str]:
     return [p.strip() for p in parts if p.strip()]
 
 
+# テンプレート・リンク・太字・ref・コメント・span を除く strip_* の順。追加・並び替え時は括弧の数え間違いが起きない。
+# _strip_markup_fast の処理表もこの順（段番号）で前後を決める。
+_MARKUP_STEPS: tuple[Callable[[str], str], ...] = (
+    strip_efn,
+    strip_sfn,
+    strip_refnest,
+    strip_kari_link,
+    strip_wiki_links,
+    strip_yomigana,
+    strip_yomigana_ruby_fushiyo,
+    strip_ruby,
+    strip_vanc,
+    strip_yoshuttei,
+    strip_yoshuttei_range,
+    strip_lang_xx,
+    strip_lang,
+    strip_llang,
+    strip_en,
+    strip_r,
+    strip_nobold,
+    strip_syc,
+    strip_kia,
+    strip_full,
+    strip_vanchor,
+    strip_wiki_bold,
+    strip_small,
+    strip_flagicon,
+    strip_kirokijinbutsu,
+    strip_yomi,
+    strip_color,
+    strip_font_color,
+    strip_weight,
+    strip_fontsize,
+    strip_abbr,
+    strip_font_template,
+    strip_hojo_kanji_font,
+    strip_hash_tag,
+    strip_enlink,
+    strip_ill2,
+    strip_anchors,
+    strip_visible_anchor,
+    strip_ref,
+    strip_html_comments,
+    strip_span_lang_html,
+    strip_span,
+)
+# strip_* → _MARKUP_STEPS での位置（段番号）
+_STEP = {step: i for i, step in enumerate(_MARKUP_STEPS)}
+
+
+# ---- テンプレート・リンク・タグを 1 回の走査で除く経路 ----
+# _MARKUP_STEPS を順に当てる _strip_markup_chain と同じ結果になる形だけをここで読み、
+# 読めない形（処理表に無いテンプレート、ネストしたテンプレート、行をまたぐタグなど）は None を返して
+# _strip_markup_chain に任せる。処理表の各行はどの strip_* に当たるかを持ち、前後は _STEP の段番号で比べる。
+# 段番号で表せない前提（efn / sfn / refnest が最初、仮リンクがリンクより前など）はテストで確かめている。
+
+# 太字除去（strip_wiki_bold）の段。これより後の段のテンプレート・タグは太字除去の時点では元の形のまま残っている
+_BOLD_STEP = _STEP[strip_wiki_bold]
+# 次に見るべき記号（テンプレート・リンク・タグの開始と、対応の取れない閉じ括弧）
+_MARKUP_START_RE = re.compile(r"[{}<]|\[\[")
+# <span lang="..">..</span>（strip_span_lang_html）
+_SPAN_LANG_RE = re.compile(r'<span\s+lang="[^"]*">[^<]*</span>')
+
+
+def _param_first(body: str) -> str | None:
+    """第1パラメータ（strip_ruby / strip_vanc / strip_kari_link）。"""
+    return body.split('|', 1)[0].strip()
+
+
+def _param_first_piped(body: str) -> str | None:
+    """| があるときの第1パラメータ。無いときは閉じ括弧まで残る形なので読まない（strip_yomigana など）。"""
+    if '|' not in body:
+        return None
+    return body.split('|', 1)[0].strip()
+
+
+def _param_first_or_all(body: str) -> str:
+    """_template_first_param と同じ。| が無ければ閉じ括弧 }} ごと残る。"""
+    if '|' in body:
+        return body.split('|', 1)[0].strip()
+    return (body + '}}').strip()
+
+
+def _param_last(body: str) -> str:
+    """_template_last_param と同じ。最後のパラメータに閉じ括弧 }} が付いて残る。"""
+    return (body[body.rfind('|') + 1:] + '}}').strip()
+
+
+def _param_all(body: str) -> str:
+    """strip_small / strip_kirokijinbutsu と同じ。中身全体に閉じ括弧 }} が付いて残る。"""
+    return (body + '}}').strip()
+
+
+def _param_second(body: str) -> str:
+    """strip_lang / strip_llang と同じ。第2パラメータ、無ければ空。"""
+    parts = body.split('|', 2)
+    return parts[1].strip() if len(parts) > 1 else ''
+
+
+def _param_yoshuttei(body: str) -> str:
+    """strip_yoshuttei と同じ。先頭が =表示 なら表示、それ以外は空。"""
+    if body.startswith('='):
+        return body[1:].split('|', 1)[0].strip()
+    return ''
+
+
+def _param_ill2(body: str) -> str:
+    """strip_ill2 と同じ。label= があればその値、無ければ第1パラメータ。"""
+    content = body + '}}'
+    display = ''
+    label_match = re.search(r'label\s*=\s*([^|}]*)', content)
+    if label_match:
+        display = label_match.group(1).strip()
+    if not display:
+        first_pipe = content.find('|')
+        display = content[:first_pipe].strip() if first_pipe >= 0 else content.strip()
+    return display
+
+
+def _param_visible_anchor(body: str) -> str:
+    """strip_visible_anchor と同じ。最後のパラメータ。"""
+    return body[body.rfind('|') + 1:].strip()
+
+
+def _param_none(body: str) -> str:
+    """タグごと除去。"""
+    return ''
+
+
+# テンプレート名 → (段, 置き換え, 直後に続く } を読み飛ばすか)。名前の直後は | が要る。
+# 大文字小文字を区別しない名前（小文字で引く）
+_TEMPLATE_HANDLERS_CI = {
+    'ruby': (_STEP[strip_ruby], _param_first, True),
+    'vanc': (_STEP[strip_vanc], _param_first, True),
+    'en': (_STEP[strip_en], _param_none, True),
+    'r': (_STEP[strip_r], _param_none, True),
+    'nobold': (_STEP[strip_nobold], _param_none, True),
+    'small': (_STEP[strip_small], _param_all, True),
+    'flagicon': (_STEP[strip_flagicon], _param_none, True),
+    'color': (_STEP[strip_color], _param_last, True),
+    'font color': (_STEP[strip_font_color], _param_last, True),
+    'weight': (_STEP[strip_weight], _param_last, True),
+    'fontsize': (_STEP[strip_fontsize], _param_last, True),
+    'abbr': (_STEP[strip_abbr], _param_first_or_all, True),
+    'enlink': (_STEP[strip_enlink], _param_none, True),
+    'ill2': (_STEP[strip_ill2], _param_ill2, True),
+    'anchors': (_STEP[strip_anchors], _param_none, True),
+}
+# 名前と | の間に空白を許すもの（小文字で引く）
+_TEMPLATE_HANDLERS_CI_SPACED = {
+    'lang': (_STEP[strip_lang], _param_second, True),
+    'llang': (_STEP[strip_llang], _param_second, True),
+    'visible anchor': (_STEP[strip_visible_anchor], _param_visible_anchor, False),
+}
+# 大文字小文字を区別する名前
+_TEMPLATE_HANDLERS_EXACT = {
+    '仮リンク': (_STEP[strip_kari_link], _param_first, False),
+    '読み仮名': (_STEP[strip_yomigana], _param_first_piped, False),
+    '読み仮名_ruby不使用': (_STEP[strip_yomigana_ruby_fushiyo], _param_first_piped, True),
+    'SYC': (_STEP[strip_syc], _param_none, True),
+    'KIA': (_STEP[strip_kia], _param_none, True),
+    'Full': (_STEP[strip_full], _param_none, True),
+    'Vanchor': (_STEP[strip_vanchor], _param_none, True),
+    '軌跡人物': (_STEP[strip_kirokijinbutsu], _param_all, True),
+    '読み': (_STEP[strip_yomi], _param_last, True),
+}
+_TEMPLATE_HANDLERS_EXACT_SPACED = {
+    '要出典': (_STEP[strip_yoshuttei], _param_yoshuttei, True),
+    '要出典範囲': (_STEP[strip_yoshuttei_range], _param_none, True),
+}
+# {{TAG}}（パラメータ無し）でも除去するもの（_strip_simple_template）
+_BARE_TEMPLATES = frozenset({'SYC', 'KIA', 'Full', 'Vanchor'})
+_FONT_STEP = _STEP[strip_font_template]
+_HASH_TAG_STEP = _STEP[strip_hash_tag]
+
+
+def _is_efn_name(name: str) -> bool:
+    """strip_efn が当たる名前（ef / efn の後に数字が続いてもよい）。"""
+    if name[:2].lower() != 'ef':
+        return False
+    rest = name[3:] if name[2:3].lower() == 'n' else name[2:]
+    return all(c.isdigit() for c in rest)
+
+
+def _is_lang_xx_name(name: str) -> bool:
+    """strip_lang_xx が当たる名前（lang- の後に英数字と - が続く）。"""
+    return name[:5].lower() == 'lang-' and all(c.isalnum() or c == '-' for c in name[5:])
+
+
+def _find_template_end(s: str, start: int) -> int:
+    """start（{{ の内側）から {{ }} の深さを数え、対応する }} の直後の位置。閉じなければ -1。"""
+    depth = 1
+    k = start
+    n = len(s)
+    while k < n:
+        if s.startswith('{{', k):
+            depth += 1
+            k += 2
+        elif s.startswith('}}', k):
+            depth -= 1
+            k += 2
+            if depth == 0:
+                return k
+        else:
+            k += 1
+    return -1
+
+
+def _link_display(content: str) -> str:
+    """[[リンク|表示]] の表示（strip_wiki_links と同じく最初の | で区切る）。"""
+    first_pipe = content.find('|')
+    return (content[first_pipe + 1:] if first_pipe >= 0 else content).strip()
+
+
+def _replace_links(text: str) -> str | None:
+    """テンプレートの中の [[リンク]] を表示に置き換える。]] が中で閉じない・タグを含むリンクがあれば None。"""
+    pieces = []
+    pos = 0
+    while True:
+        start = text.find('[[', pos)
+        if start == -1:
+            pieces.append(text[pos:])
+            return ''.join(pieces)
+        end = text.find(']]', start + 2)
+        if end == -1 or '<' in text[start:end]:
+            return None
+        pieces.append(text[pos:start])
+        pieces.append(_link_display(text[start + 2:end]))
+        pos = end + 2
+
+
+def _template_handler(inner: str, late: bool):
+    """
+    ネストしていないテンプレートの中身（{{ と }} の間）に当たる (段, 置き換え, 読み飛ばし, 引数) を返す。
+    late なら太字除去より後の段だけ、そうでなければ前の段だけを見る。当たらなければ None。
+    """
+    name, pipe, body = inner.partition('|')
+    if not pipe:
+        if not late and inner in _BARE_TEMPLATES:
+            return _TEMPLATE_HANDLERS_EXACT[inner][0], _param_none, False, ''
+        return None
+    lower = name.lower()
+    spec = (
+        _TEMPLATE_HANDLERS_EXACT.get(name)
+        or _TEMPLATE_HANDLERS_CI.get(lower)
+        or _TEMPLATE_HANDLERS_EXACT_SPACED.get(name.rstrip(' '))
+        or _TEMPLATE_HANDLERS_CI_SPACED.get(lower.rstrip(' '))
+    )
+    if spec is None and _is_lang_xx_name(name):
+        spec = (_STEP[strip_lang_xx], _param_none, True)
+    if spec is not None and spec[0] < _FONT_STEP and (spec[0] > _BOLD_STEP) == late:
+        return spec + (body,)
+    if not late:
+        return None
+    # {{XXXフォント|文字}}（strip_font_template）は名前を問わず中身に「フォント|」があれば当たる
+    font = inner.find('フォント|')
+    if font != -1:
+        return _FONT_STEP, _param_first_or_all, True, inner[font + 5:]
+    if inner.startswith('#tag') and inner[4:].lstrip(' ')[:1] in ('|', ':'):
+        return _HASH_TAG_STEP, _param_none, True, ''
+    if spec is not None and spec[0] > _FONT_STEP:
+        return spec + (body,)
+    return None
+
+
+def _strip_template_fast(s: str, i: int) -> tuple[str, int, bool] | None:
+    """
+    s[i:] の {{ から始まるテンプレートを置き換え、(置き換え後の文字列, 続きの位置, 太字除去より後の段か) を返す。
+    _strip_markup_chain と同じ結果にならない形なら None。
+    """
+    n = len(s)
+    name_end = i + 2
+    while name_end < n and s[name_end] not in '|{}':
+        name_end += 1
+    name = s[i + 2:name_end]
+    if name_end < n and s[name_end] == '|' and (
+        _is_efn_name(name) or name.lower() in ('sfn', 'refnest')
+    ):
+        # efn / sfn / refnest は最初の段で中身ごと消えるので、ネストしていてもよい
+        end = _find_template_end(s, name_end + 1)
+        if end == -1 or _has_loose_braces(s[name_end + 1:end - 2]):
+            return None
+        return '', end, False
+    close = s.find('}}', i + 2)
+    if close == -1:
+        return None
+    inner = s[i + 2:close]
+    if '{' in inner or '}' in inner or any(c in name for c in "[]<'"):
+        return None
+    end = close + 2
+    if inner.startswith('仮リンク|'):
+        # 仮リンクはリンクより先に置き換わる
+        if '[' in inner:
+            return None
+        handler = _TEMPLATE_HANDLERS_EXACT['仮リンク'] + (inner[len('仮リンク|'):],)
+    else:
+        converted = _replace_links(inner)
+        if converted is None:
+            return None
+        handler = _template_handler(converted, late=False)
+    if handler is None:
+        handler = _template_handler(converted.replace("'''", ''), late=True)
+        if handler is None:
+            return None
+    step, replace, eat_braces, body = handler
+    if replace is not _param_none and '<' in body:
+        return None
+    text = replace(body)
+    if text is None or '{' in text or (step < _BOLD_STEP and '}' in text) or text.startswith('}'):
+        return None
+    if eat_braces:
+        while end < n and s[end] == '}':
+            end += 1
+    return text, end, step > _BOLD_STEP
+
+
+def _has_loose_braces(region: str) -> bool:
+    """{{ と }} の対応が取れていない、または単独の { } があるか。"""
+    depth = 0
+    k = 0
+    while k < len(region):
+        if region.startswith('{{', k):
+            depth += 1
+            k += 2
+        elif region.startswith('}}', k):
+            depth -= 1
+            if depth < 0:
+                return True
+            k += 2
+        elif region[k] in '{}':
+            return True
+        else:
+            k += 1
+    return depth != 0
+
+
+def _has_loose_markup(region: str) -> bool:
+    """タグの中身に、タグの範囲を変えうるもの（対応の取れない {{ }}・閉じないリンク・別のタグ）があるか。"""
+    if '<' in region or _has_loose_braces(region):
+        return True
+    start = region.find('[[')
+    while start != -1:
+        end = region.find(']]', start + 2)
+        if end == -1:
+            return True
+        start = region.find('[[', end + 2)
+    return False
+
+
+def _open_tag_end(s: str, j: int, self_closing: bool) -> int:
+    """開始タグの終わり（> または self_closing なら /> の位置）。属性の "..." は読み飛ばす。無ければ -1。"""
+    n = len(s)
+    while j < n:
+        if s[j] == '"':
+            j = s.find('"', j + 1)
+            if j == -1:
+                return -1
+            j += 1
+            continue
+        if s[j] == '>' or (self_closing and s.startswith('/>', j)):
+            return j
+        j += 1
+    return -1
+
+
+def _strip_tag_fast(s: str, i: int) -> tuple[str, int] | None:
+    """s[i:] の < から始まる ref / コメント / span を置き換え、(置き換え後の文字列, 続きの位置) を返す。読めなければ None。"""
+    if s.startswith('<ref', i):
+        j = _open_tag_end(s, i + 4, True)
+        if j == -1 or any(c in s[i + 1:j] for c in "{}[]<'"):
+            return None
+        if s[j] != '>':
+            return '', j + 2
+        k = s.find('</ref>', j + 1)
+        if k == -1 or _has_loose_markup(s[j + 1:k]):
+            return None
+        return '', k + len('</ref>')
+    if s.startswith('<!--', i):
+        k = s.find('-->', i + 4)
+        if k == -1 or any(c in s[i + 4:k] for c in "{}[]<'"):
+            return None
+        return '', k + 3
+    if s[i:i + 5].lower() == '<span':
+        m = _SPAN_LANG_RE.match(s, i)
+        if m:
+            if any(c in m.group() for c in "{}[]'"):
+                return None
+            return '', m.end()
+        j = _open_tag_end(s, i + 5, False)
+        if j == -1 or any(c in s[i + 1:j] for c in "{}[]<"):
+            return None
+        k = s.find('</span>', j + 1)
+        if k == -1:
+            return None
+        content = s[j + 1:k]
+        if any(c in content for c in "{}[]<"):
+            return None
+        return content.replace("'''", '').strip(), k + len('</span>')
+    return None
+
+
+def _strip_markup_fast(s: str) -> str | None:
+    """
+    テンプレート・リンク・太字・ref・コメント・span を 1 回の走査で除き、_strip_markup_chain と同じ文字列を返す。
+    テンプレートは名前（小文字）で処理表を引いて置き換える。同じ結果を保証できない形を見つけたら None。
+    """
+    out: list[str] = []
+    # 太字除去より前に置き換わる断片。太字除去より後のテンプレート・タグが来たところで太字を除いて out に移す
+    pending: list[str] = []
+    pos = 0
+    n = len(s)
+    while pos < n:
+        m = _MARKUP_START_RE.search(s, pos)
+        if m is None:
+            pending.append(s[pos:])
+            break
+        i = m.start()
+        pending.append(s[pos:i])
+        c = s[i]
+        if c == '{':
+            if not s.startswith('{{', i):
+                return None
+            got = _strip_template_fast(s, i)
+            if got is None:
+                return None
+            text, pos, late = got
+        elif c == '[':
+            end = s.find(']]', i + 2)
+            if end == -1:
+                return None
+            content = s[i + 2:end]
+            if any(ch in content for ch in '{}<'):
+                return None
+            text, pos, late = _link_display(content), end + 2, False
+        elif c == '<':
+            got = _strip_tag_fast(s, i)
+            if got is None:
+                return None
+            text, pos = got
+            late = True
+        else:
+            return None
+        if late:
+            out.append(''.join(pending).replace("'''", ''))
+            pending = []
+        elif text:
+            pending.append(text)
+            continue
+        out.append(text)
+    out.append(''.join(pending).replace("'''", ''))
+    result = ''.join(out)
+    if '{{' in result or '[[' in result or '<' in result:
+        return None
+    return result.strip()
+
+
+def _strip_markup_chain(s: str) -> str:
+    """_MARKUP_STEPS の strip_* を順に適用する。"""
+    for step in _MARKUP_STEPS:
+        s = step(s)
+    return s
+
+
+# 行の文字列 → 結果のキャッシュ。同じ行・同じ名前は登場人物ページや候補 CSV に何度も現れる（set_line_cache_enabled で切る）
+_CLEAN_CACHE: LineCache[str, str] = LineCache()
+_LINE_NAMES_CACHE: LineCache[str, tuple[str, ...]] = LineCache()
+
+
+def set_line_cache_enabled(enabled: bool) -> None:
+    """
+    clean_wiki_content と ; 行・:* 行の名前分割のキャッシュを有効/無効にし、覚えた値と統計を捨てる。
+    除去ルールを調整しながら流すときは無効にする（--no-line-cache）。
+    """
+    for cache in (_CLEAN_CACHE, _LINE_NAMES_CACHE):
+        cache.enabled = enabled
+        cache.clear()
+
+
+def line_cache_enabled() -> bool:
+    """set_line_cache_enabled の現在の設定。"""
+    return _LINE_NAMES_CACHE.enabled
+
+
+def line_cache_summary() -> str:
+    """引いたことのあるキャッシュのヒット率などをログ用に並べた文字列。"""
+    caches = (('行→名前', _LINE_NAMES_CACHE), ('clean_wiki_content', _CLEAN_CACHE))
+    return '; '.join(f'{label} {cache.summary()}' for label, cache in caches if cache.hits + cache.misses)
+
+
+def line_cache_rules_version() -> str:
+    """
+    行キャッシュのファイルに入れるルールの版。除去・分割のルールはこのモジュールにあるので、そのソースの SHA-1 にする。
+    ルールを書き換えれば版が変わり、古いファイルは読まれない。
+    """
+    return hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+
+def _line_caches() -> dict[str, LineCache]:
+    return {'clean': _CLEAN_CACHE, 'line_names': _LINE_NAMES_CACHE}
+
+
+def load_line_cache(path: Path) -> int:
+    """
+    --line-cache-file の内容を clean_wiki_content と ; 行・:* 行の名前分割のキャッシュに読み込み、読んだ件数を返す。
+    キャッシュが無効なとき・ファイルが無いとき・ルールの版が違うときは 0。
+    """
+    if not line_cache_enabled():
+        return 0
+    return load_line_caches(path, line_cache_rules_version(), _line_caches())
+
+
+def save_line_cache(path: Path) -> None:
+    """clean_wiki_content と名前分割のキャッシュをルールの版とともに --line-cache-file に保存する（無効なら何もしない）。"""
+    if line_cache_enabled():
+        save_line_caches(path, line_cache_rules_version(), _line_caches())
+
+
 def clean_wiki_content(s: str) -> str:
     """
     Wiki行のテキストにタグ除去・正規化を順に適用する。
-    追加・並び替え時は括弧の数え間違いが起きない。
-    """
-    s = strip_efn(s)
-    s = strip_sfn(s)
-    s = strip_refnest(s)
-    s = strip_kari_link(s)
-    s = strip_wiki_links(s)
-    s = strip_yomigana(s)
-    s = strip_yomigana_ruby_fushiyo(s)
-    s = strip_ruby(s)
-    s = strip_vanc(s)
-    s = strip_yoshuttei(s)
-    s = strip_yoshuttei_range(s)
-    s = strip_lang_xx(s)
-    s = strip_lang(s)
-    s = strip_llang(s)
-    s = strip_en(s)
-    s = strip_r(s)
-    s = strip_nobold(s)
-    s = strip_syc(s)
-    s = strip_kia(s)
-    s = strip_full(s)
-    s = strip_vanchor(s)
-    s = strip_wiki_bold(s)
-    s = strip_small(s)
-    s = strip_flagicon(s)
-    s = strip_kirokijinbutsu(s)
-    s = strip_yomi(s)
-    s = strip_color(s)
-    s = strip_font_color(s)
-    s = strip_weight(s)
-    s = strip_fontsize(s)
-    s = strip_abbr(s)
-    s = strip_font_template(s)
-    s = strip_hojo_kanji_font(s)
-    s = strip_hash_tag(s)
-    s = strip_enlink(s)
-    s = strip_ill2(s)
-    s = strip_anchors(s)
-    s = strip_visible_anchor(s)
-    s = strip_ref(s)
-    s = strip_html_comments(s)
-    s = strip_span_lang_html(s)
-    s = strip_span(s)
+    マークアップの除去は _strip_markup_fast で 1 回の走査で済ませ、読めない行だけ _strip_markup_chain で順に除く。
+    同じ文字列の結果は _CLEAN_CACHE から返す。
+    """
+    return _CLEAN_CACHE.get_or_compute(s, _clean_wiki_content)
+
+
+def _clean_wiki_content(s: str) -> str:
+    """clean_wiki_content の本体（キャッシュを通さない）。"""
+    stripped = _strip_markup_fast(s)
+    s = _strip_markup_chain(s) if stripped is None else stripped
     s = strip_trailing_voice_paren(s)
     s = strip_trailing_cast_paren(s)
     s = strip_trailing_voice_dash(s)
@@ -1798,40 +2287,47 @@ def clean_wiki_content(s: str) -> str:
     return s.strip()
 
 
+def _names_from_line(line: str) -> tuple[str, ...]:
+    """strip 済みの 1 行から名前候補を返す。; 行と :* 行（「名前 - 説明」）以外は空。行ごとに覚えるので clean_wiki_content のキャッシュは通さない。"""
+    if line.startswith(';'):
+        content = line[1:].strip()
+        if not content:
+            return ()
+        content = _clean_wiki_content(content)
+        if not content:
+            return ()
+        # 「; キャラ名: 説明」の形式ならキャラ名のみにする
+        if ':' in content:
+            content = content.split(':', 1)[0].strip()
+            if not content:
+                return ()
+        if content.startswith('第') and '話' in content:
+            return ()
+        return tuple(split_multi_names(content))
+    if line.startswith(':*'):
+        content = line[2:].strip()
+        if not content:
+            return ()
+        content = _clean_wiki_content(content)
+        if not content:
+            return ()
+        if content.startswith('[[') and content.endswith(']]'):
+            return ()
+        if ' - ' in content:
+            char_name = content.split(' - ')[0].strip()
+            # 「名前 - 説明」は名前が短い。「3 - 4刷」のような範囲で誤分割されないよう、前半が長すぎる行は名前扱いしない
+            if char_name and len(char_name) <= 50:
+                return tuple(split_multi_names(char_name))
+    return ()
+
+
 def extract_from_wiki(text: str) -> list[str]:
-    """Wiki構文から登場人物名の行（内容のみ）を抽出。専用ページの「;」行用。"""
+    """Wiki構文から登場人物名の行（内容のみ）を抽出。専用ページの「;」行用。同じ行の結果は _LINE_NAMES_CACHE から返す。"""
     results = []
     for line in text.splitlines():
         line = line.strip()
-        if line.startswith(';'):
-            content = line[1:].strip()
-            if not content:
-                continue
-            content = clean_wiki_content(content)
-            if not content:
-                continue
-            # 「; キャラ名: 説明」の形式ならキャラ名のみにする
-            if ':' in content:
-                content = content.split(':', 1)[0].strip()
-                if not content:
-                    continue
-            if content.startswith('第') and '話' in content:
-                continue
-            results.extend(split_multi_names(content))
-        elif line.startswith(':*'):
-            content = line[2:].strip()
-            if not content:
-                continue
-            content = clean_wiki_content(content)
-            if not content:
-                continue
-            if content.startswith('[[') and content.endswith(']]'):
-                continue
-            if ' - ' in content:
-                char_name = content.split(' - ')[0].strip()
-                # 「名前 - 説明」は名前が短い。「3 - 4刷」のような範囲で誤分割されないよう、前半が長すぎる行は名前扱いしない
-                if char_name and len(char_name) <= 50:
-                    results.extend(split_multi_names(char_name))
+        if line.startswith((';', ':*')):
+            results.extend(_LINE_NAMES_CACHE.get_or_compute(line, _names_from_line))
     return results
 
 
@@ -1840,14 +2336,95 @@ def get_names_for_toujo_page(text: str) -> list[str]:
     return extract_from_wiki(text)
 
 
-def get_names_for_normal_page(text: str) -> list[str]:
-    """通常ページ: 登場人物セクションから名前候補を返す。"""
+def get_names_for_normal_page(text: str, section_span: tuple[int, int] | None = None) -> list[str]:
+    """
+    通常ページ: 登場人物セクションから名前候補を返す。
+    section_span（extract-pages が求めたセクションの位置）があればセクションを探し直さずに切り出す。
+    """
+    if section_span is not None and section_span[1] <= len(text):
+        return extract_from_wiki(text[section_span[0]:section_span[1]])
     section = extract_toujo_section(text)
     if section is None:
         return []
     return extract_from_wiki(section)
 
 
+def get_names_for_page(
+    page_id: int,
+    page_title: str,
+    text: str,
+    toujo_page_ids: set[int],
+    *,
+    section_only: bool = False,
+    section_span: tuple[int, int] | None = None,
+) -> list[str]:
+    """
+    1 ページの名前候補を返す。section_only は本文がすでに登場人物セクションだけの場合（extract-pages --store sections）。
+    section_span は通常ページの登場人物セクションの位置が分かっている場合（page_sections.json の offsets）。
+    登場人物専用ページ（toujo_page_ids に含まれるか、タイトルが「○○の登場人物（一覧）」）は本文全体から抽出する。
+    """
+    if section_only:
+        return extract_from_wiki(text)
+    is_toujo = page_id in toujo_page_ids or bool(
+        TOUJO_PATTERN.match(page_title.replace(' ', '_'))
+    )
+    if is_toujo:
+        return get_names_for_toujo_page(text)
+    return get_names_for_normal_page(text, section_span)
+
+
+def default_exclude_list_path() -> Path:
+    """除外ブラックリストの既定パス: WIKI_EXCLUDE_LIST または data/excluded_names.json。"""
+    _exclude_env = os.environ.get('WIKI_EXCLUDE_LIST', '').strip()
+    if _exclude_env:
+        return Path(_exclude_env)
+    return Path(__file__).resolve().parent.parent / 'data' / 'excluded_names.json'
+
+
+class CandidateWriter:
+    """
+    character_candidates.csv と除外取り分け CSV に（ページ名, 名前）を書き出す。
+    除外判定は is_excluded_name（同じ名前の判定は excluded_cache から返す）。rows / excluded に書き出し件数を数える。
+    """
+
+    def __init__(self, output_path: Path, output_excluded_path: Path, exact_set: set[str], suffix_set: set[str]) -> None:
+        self.exact_set = exact_set
+        self.suffix_set = suffix_set
+        self.excluded_cache: LineCache[str, bool] = LineCache(enabled=line_cache_enabled())
+        self.rows = 0
+        self.excluded = 0
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_excluded_path.parent.mkdir(parents=True, exist_ok=True)
+        self._f_out = open(output_path, 'w', encoding='utf-8', newline='')
+        self._f_ex = open(output_excluded_path, 'w', encoding='utf-8', newline='')
+        self._w_out = csv.writer(self._f_out)
+        self._w_ex = csv.writer(self._f_ex)
+        self._w_out.writerow(['ページ名', '名前'])
+        self._w_ex.writerow(['ページ名', '名前'])
+
+    def write_page(self, page_display: str, names: list[str]) -> None:
+        for name in names:
+            if self.excluded_cache.get_or_compute(name, self._is_excluded):
+                self._w_ex.writerow([page_display, name])
+                self.excluded += 1
+            else:
+                self._w_out.writerow([page_display, name])
+                self.rows += 1
+
+    def _is_excluded(self, name: str) -> bool:
+        return is_excluded_name(name, self.exact_set, self.suffix_set)
+
+    def close(self) -> None:
+        self._f_out.close()
+        self._f_ex.close()
+
+    def __enter__(self) -> 'CandidateWriter':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
 def load_excluded_set(path: Path | None) -> tuple[set[str], set[str]]:
     """
     除外ブラックリストを読み込む。JSON の exact のみ使用。
@@ -1938,22 +2515,26 @@ def parse_args() -> object:
                    help='除外ブラックリスト（JSON）。既定: WIKI_EXCLUDE_LIST または data/excluded_names.json')
     p.add_argument('--output-excluded', type=Path, default=None,
                    help='ブラックリスト該当を書き出すCSV（既定: <outputの同dir>/character_candidates_excluded.csv）')
+    p.add_argument('--no-line-cache', action='store_true',
+                   help='同じ行・名前の除去と除外判定の結果を覚えず毎回計算する（除去ルールの調整用）')
+    p.add_argument('--line-cache-file', type=Path, default=None,
+                   help='行ごとの除去・名前分割の結果を読み書きする JSON。再実行で使い回す（ルールの版が違えば読まない）。既定: 使わない')
     return p.parse_args()
 
 
 def main() -> None:
     """エントリポイント。"""
     args = parse_args()
+    set_line_cache_enabled(not args.no_line_cache)
+    if args.line_cache_file:
+        log(f'  行キャッシュ: {args.line_cache_file} から {load_line_cache(args.line_cache_file)}件')
     input_dir = Path(args.input_dir)
-    pages_dir = input_dir / 'pages'
-    meta_path = input_dir / 'page_meta.json'
+    meta_path = page_meta_path_for(input_dir)
     if args.output is not None:
         output_path = Path(args.output)
     else:
         output_path = input_dir / 'character_candidates.csv'
-    _exclude_env = os.environ.get('WIKI_EXCLUDE_LIST', '').strip()
-    default_exclude_path = Path(_exclude_env) if _exclude_env else Path(__file__).resolve().parent.parent / 'data' / 'excluded_names.json'
-    exclude_list_path = args.exclude_list if args.exclude_list is not None else default_exclude_path
+    exclude_list_path = args.exclude_list if args.exclude_list is not None else default_exclude_list_path()
     exact_set, suffix_set = load_excluded_set(exclude_list_path)
     if args.output_excluded is not None:
         output_excluded_path = Path(args.output_excluded)
@@ -1963,77 +2544,64 @@ def main() -> None:
         msg = f'  除外ブラックリスト: {exclude_list_path} 完全一致＆「の」+exact末尾一致 {len(exact_set)}語'
         log(f'{msg}。該当は {output_excluded_path} に取り分け')
 
-    if not pages_dir.is_dir():
-        log(f'エラー: ページ用ディレクトリが見つかりません: {pages_dir}')
-        sys.exit(1)
     if not meta_path.is_file():
         log(f'エラー: page_meta.json が見つかりません: {meta_path}')
         sys.exit(1)
 
     with open(meta_path, encoding='utf-8') as f:
         meta = json.load(f)
-    main_id_to_title: dict[str, str] = meta['main_id_to_title']
-    toujo_page_ids: set[int] = set(meta['toujo_page_ids'])
+    main_id_to_title = load_page_titles(input_dir, meta)
+    toujo_page_ids = load_toujo_page_ids(meta)
+    try:
+        store = open_page_store(input_dir, meta.get('page_store'))
+    except FileNotFoundError as e:
+        log(f'エラー: {e}')
+        sys.exit(1)
+    # extract-pages --store sections で登場人物セクションだけを保存したページ（本文がすでにセクション）
+    section_only_ids = load_sections(sections_path_for(input_dir)).keys()
+    # 全文を保存したページの登場人物セクションの位置（extract-pages が判定時に求めたもの）
+    section_offsets = load_section_offsets(sections_path_for(input_dir))
 
     log('extract-character-candidates: ページから登場人物候補を抽出')
-    with Timer() as total_timer:
-        items: list[dict[str, str | list[str]]] = []
-        page_files = sorted(pages_dir.glob('*.txt'), key=lambda p: int(p.stem) if p.stem.isdigit() else 0)
-        total_pages = len(page_files)
+    with Timer() as total_timer, store, \
+         CandidateWriter(output_path, output_excluded_path, exact_set, suffix_set) as writer:
+        page_ids = store.ids()
+        total_pages = len(page_ids)
         processed = 0
 
-        for idx, path in enumerate(page_files):
-            if not path.stem.isdigit():
-                continue
-            page_id = int(path.stem)
-            page_title = main_id_to_title.get(str(page_id), path.stem)
+        for idx, page_id in enumerate(page_ids):
+            page_title = main_id_to_title.get(page_id, str(page_id))
             page_display = page_title.replace('_', ' ')
 
             try:
-                text = path.read_text(encoding='utf-8')
-            except OSError as e:
-                log(f'  スキップ {path.name}: 読み込みエラー {e}')
+                text = store.get(page_id)
+            except (OSError, KeyError) as e:
+                log(f'  スキップ {store.location(page_id)}: 読み込みエラー {e}')
                 continue
 
-            # 登場人物専用ページ: toujo_page_ids に含まれるか、タイトルが「○○の登場人物（一覧）」なら本文全体から抽出
-            is_toujo = page_id in toujo_page_ids or bool(
-                TOUJO_PATTERN.match(page_title.replace(' ', '_'))
+            names = get_names_for_page(
+                page_id,
+                page_title,
+                text,
+                toujo_page_ids,
+                section_only=page_id in section_only_ids,
+                section_span=section_offsets.get(page_id),
             )
-            if is_toujo:
-                names = get_names_for_toujo_page(text)
-            else:
-                names = get_names_for_normal_page(text)
-
             if not names:
                 continue
 
-            items.append({'page_title': page_display, 'names': names})
+            writer.write_page(page_display, names)
             processed += 1
             if (idx + 1) % 500 == 0 or (idx + 1) == total_pages:
                 log_progress('extract-character-candidates: pages', count=processed, elapsed=total_timer.elapsed)
 
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        row_count = 0
-        excluded_count = 0
-        with open(output_path, 'w', encoding='utf-8', newline='') as f_out, \
-             open(output_excluded_path, 'w', encoding='utf-8', newline='') as f_ex:
-            w_out = csv.writer(f_out)
-            w_ex = csv.writer(f_ex)
-            w_out.writerow(['ページ名', '名前'])
-            w_ex.writerow(['ページ名', '名前'])
-            for item in items:
-                page_title = item['page_title']
-                for name in item['names']:
-                    if is_excluded_name(name, exact_set, suffix_set):
-                        w_ex.writerow([page_title, name])
-                        excluded_count += 1
-                    else:
-                        w_out.writerow([page_title, name])
-                        row_count += 1
-
-        log(f'  LLM用: {output_path}, {row_count} 行')
-        if excluded_count:
-            log(f'  除外取り分け: {output_excluded_path}, {excluded_count} 行')
+    log(f'  LLM用: {output_path}, {writer.rows} 行')
+    if writer.excluded:
+        log(f'  除外取り分け: {output_excluded_path}, {writer.excluded} 行')
+    if line_cache_enabled():
+        log(f'  行キャッシュ: {line_cache_summary()}; 除外判定 {writer.excluded_cache.summary()}')
+    if args.line_cache_file:
+        save_line_cache(args.line_cache_file)
     log('')
     log(f'  実行時間: {format_elapsed(total_timer.elapsed)} ({total_timer.elapsed:.1f}秒)')
 
@@ -0,0 +1,116 @@
+"""
+extract-pages のチェックポイント（途中再開用）の保存・読込。
+
+出力ディレクトリの .extract_pages_progress に JSON で保存する。内容:
+- dump: pages-articles の名前・サイズ・更新時刻（別ダンプでの再開を防ぐ）
+- last_page_id: 最後に書き出したページ ID（ダンプは page_id 昇順）
+- offset: multistream なら last_page_id を含む bz2 ブロックの開始バイト位置、非圧縮の .xml なら last_page_id の
+  <page> の開始バイト位置（単一ストリームの圧縮ファイルは null）
+- written / with_section: 書き出し件数のカウンタ
+- target_ids: XML 段の対象 page_id 集合（再開時は SQL 段を省略する）
+- seed_page_ids: seed カテゴリ → 配下の page_id（page_meta.json の seeds に使う）
+- page_store: ページストアのレイアウト（'files' / 'packed'）
+- targets_only: --targets-only（登場人物セクションを探さない）で実行したか
+"""
+
+import json
+import os
+from bisect import bisect_right
+from pathlib import Path
+
+from wiki_extract.util.page_store import DEFAULT_PAGE_STORE
+from wiki_extract.util.path_util import progress_path_for
+
+CHECKPOINT_VERSION = 2
+
+
+def checkpoint_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内のチェックポイントファイルのパス。"""
+    return progress_path_for(Path(output_dir) / 'page_meta.json', 'extract_pages')
+
+
+def dump_fingerprint(path: Path) -> dict:
+    """ダンプの同一性判定用: 名前・サイズ・更新時刻（ns）。"""
+    st = Path(path).stat()
+    return {'name': Path(path).name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def block_offset_for(block_index: list[tuple[int, int]], page_id: int) -> int | None:
+    """
+    block_index = [(先頭 page_id, 開始バイト位置), ...]（先頭 page_id 昇順）から、
+    page_id を含むブロックの開始位置を返す。先頭ブロックより前なら None。
+    """
+    i = bisect_right(block_index, (page_id, float('inf'))) - 1
+    if i < 0:
+        return None
+    return block_index[i][1]
+
+
+def save_checkpoint(
+    path: Path,
+    *,
+    dump: dict,
+    last_page_id: int,
+    offset: int | None,
+    written: int,
+    with_section: int,
+    target_ids: set[int],
+    seed_page_ids: dict[str, set[int]],
+    page_store: str = DEFAULT_PAGE_STORE,
+    targets_only: bool = False,
+) -> None:
+    """チェックポイントを一時ファイル経由で置き換え保存する（書き込み途中で落ちても壊れない）。"""
+    state = {
+        'version': CHECKPOINT_VERSION,
+        'dump': dump,
+        'last_page_id': last_page_id,
+        'offset': offset,
+        'written': written,
+        'with_section': with_section,
+        'target_ids': sorted(target_ids),
+        'seed_page_ids': {seed: sorted(ids) for seed, ids in seed_page_ids.items()},
+        'page_store': page_store,
+        'targets_only': targets_only,
+    }
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path, dump: dict) -> dict | None:
+    """
+    チェックポイントを読む。無い・壊れている・バージョンやダンプが一致しない場合は None。
+    target_ids と seed_page_ids の page_id は set[int] にして返す。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get('version') != CHECKPOINT_VERSION:
+        return None
+    if state.get('dump') != dump:
+        return None
+    try:
+        state['last_page_id'] = int(state['last_page_id'])
+        state['written'] = int(state['written'])
+        state['with_section'] = int(state['with_section'])
+        state['target_ids'] = {int(x) for x in state['target_ids']}
+        state['seed_page_ids'] = {
+            str(seed): {int(x) for x in ids} for seed, ids in state['seed_page_ids'].items()
+        }
+        state['page_store'] = str(state.get('page_store', DEFAULT_PAGE_STORE))
+        state['targets_only'] = bool(state.get('targets_only', False))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return state
+
+
+def remove_checkpoint(path: Path) -> None:
+    """完了時にチェックポイントを削除する。"""
+    if path.is_file():
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -31,14 +31,30 @@ def find_dump_optional(data_dir: Path, substring: str) -> Path | None:
     return None
 
 
+def find_multistream_index(xml_path: Path) -> Path | None:
+    """
+    pages-articles-multistream.xml.bz2 と同じディレクトリにある索引（-index.txt.bz2）を返す。
+    multistream でない、または索引が無ければ None。
+    """
+    xml_path = Path(xml_path)
+    if "multistream" not in xml_path.name or not xml_path.name.endswith(".xml.bz2"):
+        return None
+    index_path = xml_path.with_name(xml_path.name[: -len(".xml.bz2")] + "-index.txt.bz2")
+    return index_path if index_path.is_file() else None
+
+
 def find_pages_articles(data_dir: Path) -> Path:
     """
-    pages-articles ダンプを探す: 解凍済み .xml を優先、なければ .xml.bz2。
+    pages-articles ダンプを探す: multistream の .xml.bz2 と索引が揃っていれば最優先（並列展開できるため）、
+    次に解凍済み .xml、なければ .xml.bz2。
     """
     data_dir = Path(data_dir)
     if not data_dir.is_dir():
         raise FileNotFoundError(f"データディレクトリが存在しません: {data_dir}")
-    candidates = [f for f in data_dir.iterdir() if f.is_file() and "pages-articles" in f.name]
+    candidates = sorted(f for f in data_dir.iterdir() if f.is_file() and "pages-articles" in f.name)
+    for f in candidates:
+        if find_multistream_index(f) is not None:
+            return f
     xml_plain = [f for f in candidates if f.name.endswith(".xml") and not f.name.endswith(".xml.bz2")]
     if xml_plain:
         return xml_plain[0]
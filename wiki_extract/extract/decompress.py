@@ -0,0 +1,203 @@
+"""
+ダンプ（.bz2 / .gz / 非圧縮）を開く。展開はパースと別スレッドまたは外部プロセスで行い、
+大きなバイト列チャンクを上限付きキューで受け渡して、展開とパースを別コアで並行させる。
+
+展開方法（method）:
+- 'auto': 外部コマンド（lbzip2 / pbzip2 / bzip2、pigz / gzip）があれば 'subprocess'、なければ 'thread'
+- 'subprocess': 外部コマンドの -dc 出力をパイプで読む
+- 'thread': Python の bz2 / gzip をバックグラウンドスレッドで回す（展開中は GIL を解放する）
+- 'inline': 従来どおり読み手と同じスレッドで展開する
+"""
+
+import bz2
+import gzip
+import io
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import IO, Optional, Union
+
+DECOMPRESS_METHODS = ('auto', 'subprocess', 'thread', 'inline')
+DEFAULT_DECOMPRESS = 'auto'
+
+# スレッド・パイプ間で受け渡すチャンクの大きさと、キューに溜めるチャンク数の上限
+CHUNK_SIZE = 1024 * 1024
+QUEUE_CHUNKS = 16
+
+_TOOLS = {
+    '.bz2': ('lbzip2', 'pbzip2', 'bzip2'),
+    '.gz': ('pigz', 'gzip'),
+}
+
+_EOF = object()
+
+
+def _suffix(path: Union[str, Path]) -> str:
+    name = str(path)
+    for suffix in _TOOLS:
+        if name.endswith(suffix):
+            return suffix
+    return ''
+
+
+def find_decompress_tool(path: Union[str, Path]) -> str | None:
+    """path の圧縮形式を展開できる外部コマンドのパスを返す。無ければ None。"""
+    for tool in _TOOLS.get(_suffix(path), ()):
+        found = shutil.which(tool)
+        if found:
+            return found
+    return None
+
+
+def _open_inline(path: Union[str, Path]) -> IO[bytes]:
+    suffix = _suffix(path)
+    if suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class _ThreadReader(io.RawIOBase):
+    """バックグラウンドスレッドが展開したチャンクを上限付きキューから読む。"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        super().__init__()
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        self._pending = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._produce, args=(path,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item: object) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, path: Union[str, Path]) -> None:
+        try:
+            with _open_inline(path) as f:
+                while not self._stop.is_set():
+                    data = f.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    if not self._put(data):
+                        return
+        except BaseException as e:  # 読み手側で再送出する
+            self._put(e)
+            return
+        self._put(_EOF)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._pending:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is _EOF:
+                self._eof = True
+                return 0
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            self._pending = memoryview(item)
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            # 生産側が put で待っていれば抜けられるようにキューを空ける
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._thread.join()
+        super().close()
+
+
+class _ProcessReader(io.RawIOBase):
+    """外部コマンド（tool -dc path）の標準出力を読む。終了コードが 0 以外なら EOF で OSError。"""
+
+    def __init__(self, tool: str, path: Union[str, Path]) -> None:
+        super().__init__()
+        self._args = [tool, '-dc', str(path)]
+        self._proc = subprocess.Popen(
+            self._args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=CHUNK_SIZE,
+        )
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._proc.stdout.readinto(b)
+        if n == 0:
+            returncode = self._proc.wait()
+            if returncode != 0:
+                err = self._proc.stderr.read().decode('utf-8', errors='replace').strip()
+                raise OSError(f"展開コマンドが失敗しました（終了コード {returncode}）: {' '.join(self._args)}: {err}")
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._proc.poll() is None:
+                self._proc.terminate()
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+            self._proc.wait()
+        super().close()
+
+
+def open_dump(
+    path: Union[str, Path],
+    mode: str = 'rb',
+    *,
+    encoding: str = 'utf-8',
+    errors: str = 'replace',
+    method: Optional[str] = None,
+) -> IO:
+    """
+    ダンプを開く。mode は 'rb' または 'rt'。圧縮ファイルは method に従って別スレッド／外部プロセスで展開する。
+    非圧縮ファイルは method に関わらず通常の open。
+    """
+    if mode not in ('rb', 'rt'):
+        raise ValueError(f"mode は 'rb' または 'rt' です: {mode}")
+    method = method or DEFAULT_DECOMPRESS
+    if method not in DECOMPRESS_METHODS:
+        raise ValueError(f"展開方法は {', '.join(DECOMPRESS_METHODS)} のいずれかです: {method}")
+    if not _suffix(path):
+        if mode == 'rt':
+            return open(path, 'r', encoding=encoding, errors=errors)
+        return open(path, 'rb')
+    if method == 'auto':
+        method = 'subprocess' if find_decompress_tool(path) else 'thread'
+    if method == 'inline':
+        raw: IO[bytes] = _open_inline(path)
+    else:
+        if method == 'subprocess':
+            tool = find_decompress_tool(path)
+            if tool is None:
+                raise FileNotFoundError(f"{path} を展開する外部コマンドが見つかりません: {', '.join(_TOOLS[_suffix(path)])}")
+            reader: io.RawIOBase = _ProcessReader(tool, path)
+        else:
+            reader = _ThreadReader(path)
+        raw = io.BufferedReader(reader, buffer_size=CHUNK_SIZE)
+    if mode == 'rt':
+        return io.TextIOWrapper(raw, encoding=encoding, errors=errors)
+    return raw
+
@@ -2,18 +2,102 @@
 ダンプから対象ページの Wiki ソースをページごとファイルで出力する。
 
 対象: 架空の人物カテゴリ、○○の登場人物専用ページ、登場人物セクションがある通常ページ。
+
+書き出したページのリビジョン ID と sha1 を page_revisions.json に記録し、次回実行時は一致するページの書き込みを省略する。
+前回からの差分は pages_manifest.json（added / changed / removed / unchanged）に出力し、削除されたページはストアから消す。
+
+--store sections では対象 ID（架空の人物・登場人物専用ページ）以外は登場人物セクションだけを保存し、
+元の本文内での位置を page_sections.json に出力する（extract-character-candidates はセクションを探し直さない）。
+
+--page-store packed では pages/ の代わりに pages.dat + pages.idx の 2 ファイルに追記する（wiki_extract.util.page_store）。
+
+--emit-candidates ではページを保存せず、対象ページを読んだその場で登場人物候補を抽出して
+character_candidates.csv と除外取り分け CSV に書き出す（extract-character-candidates と同じ出力）。
+
+page_meta.json には書き出したページの page_id・タイトル・種別だけを出力する（wiki_extract.extract.page_meta）。
+全メインページの page_id → タイトルは実行中だけ page_titles.bin に置き（--resume で使う）、
+--full-title-map のときだけ残して page_meta.json にも入れる。
+
+--targets-only では登場人物セクションを探さず対象 ID のページだけを書き出す。multistream なら対象 ID を含む
+bz2 ブロックだけを展開し、最後の対象ページを書き出したところで読むのをやめる。
+--ids / --titles は指定したページだけを既存の出力に書き足す（SQL 段は読まず、タイトルは multistream の索引で引く）。
 """
 
 import json
+import os
 import sys
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, Mapping
 
-from wiki_extract.extract.data_dir import find_dump_optional, require_dumps
-from wiki_extract.extract.section_parser import extract_toujo_section
-from wiki_extract.extract.sql_categorylinks import run_categorylinks
-from wiki_extract.extract.sql_page import run_page
-from wiki_extract.extract.xml_stream import stream_pages
+from wiki_extract.characters.extract_character_candidates import (
+    CandidateWriter,
+    default_exclude_list_path,
+    get_names_for_page,
+    line_cache_enabled,
+    line_cache_summary,
+    load_excluded_set,
+    load_line_cache,
+    save_line_cache,
+    set_line_cache_enabled,
+)
+from wiki_extract.extract.checkpoint import (
+    block_offset_for,
+    checkpoint_path_for,
+    dump_fingerprint,
+    load_checkpoint,
+    remove_checkpoint,
+    save_checkpoint,
+)
+from wiki_extract.extract.data_dir import find_dump_optional, find_multistream_index, require_dumps
+from wiki_extract.extract.decompress import DECOMPRESS_METHODS, DEFAULT_DECOMPRESS
+from wiki_extract.extract.page_meta import (
+    KIND_REQUESTED,
+    KIND_TOUJO,
+    page_kind,
+    page_meta_path_for,
+    update_page_meta,
+    write_page_meta,
+)
+from wiki_extract.extract.revisions import (
+    STATUS_CHANGED,
+    STATUS_UNCHANGED,
+    RevisionJournal,
+    build_manifest,
+    classify_page,
+    journal_path_for,
+    load_revisions,
+    load_section_offsets,
+    manifest_path_for,
+    revisions_path_for,
+    sections_path_for,
+    write_manifest,
+    write_revisions,
+    write_sections,
+)
+from wiki_extract.extract.sql_categorylinks import CATEGORY_FICTIONAL
+from wiki_extract.extract.sql_page import TOUJO_PATTERN, run_page
+from wiki_extract.extract.sql_tables import run_sql_tables
+from wiki_extract.extract.titles import TitleIndex, normalize_title
+from wiki_extract.extract.xml_stream import (
+    Page,
+    is_seekable_dump,
+    lookup_multistream_index,
+    page_offset_for,
+    read_multistream_index,
+    stream_pages,
+    stream_pages_expat,
+)
+from wiki_extract.extract.xml_workers import iter_selected_pages
 from wiki_extract.util.log import format_elapsed, log, log_progress, Timer
+from wiki_extract.util.page_store import (
+    DEFAULT_PAGE_STORE,
+    PACKED_DATA_NAME,
+    PAGE_STORE_LAYOUTS,
+    PAGES_DIR_NAME,
+    open_page_writer,
+)
+from wiki_extract.util.title_map import PAGE_TITLES_NAME, load_title_map, save_title_map
 
 
 def parse_args() -> object:
@@ -27,7 +111,341 @@ def parse_args() -> object:
                    help='SQL/XML ダンプを置くディレクトリ。既定: WIKI_DATA_DIR または /data')
     p.add_argument('--output-dir', type=Path, default=Path(_out),
                    help='出力ディレクトリ。既定: WIKI_OUTPUT_DIR または /out。pages/ と page_meta.json をここに作成')
-    return p.parse_args()
+    p.add_argument('--workers', type=int, default=None,
+                   help='登場人物セクション判定の並列ワーカー数。2 以上でワーカープロセスで行う。既定: 1')
+    p.add_argument('--decompress-workers', type=int, default=None,
+                   help='multistream の bz2 展開・パースのワーカー数。既定: CPU コア数から --workers（2 以上のとき）を'
+                        '引いた数（最低 1）。プロセス数の合計は --workers + --decompress-workers')
+    p.add_argument('--xml-reader', choices=('etree', 'bytes', 'expat'), default='etree',
+                   help='XML の読み方。bytes は <page> をバイト列のまま判定し、対象 ID か「登場人物」を含む'
+                        'ページだけをデコード・パースする。expat は要素木を作らず ns != 0 の本文を読み捨てる'
+                        '（メモリ一定）。multistream の場合は bytes 以外はブロック単位の etree。既定: etree')
+    p.add_argument('--decompress', choices=DECOMPRESS_METHODS, default=DEFAULT_DECOMPRESS,
+                   help='.gz / .bz2 の展開方法。auto は外部コマンド（lbzip2 / bzip2 / pigz / gzip）があれば subprocess、'
+                        'なければ thread（別スレッドで展開しパースと並行）。inline は従来どおり同一スレッド。既定: auto')
+    p.add_argument('--sql-cache-dir', type=Path, default=None,
+                   help='page / categorylinks / linktarget の解析結果のキャッシュ置き場。ダンプ（名前・サイズ・更新時刻・'
+                        '先頭の内容）が同じなら SQL 段を読まずにキャッシュを使う。既定: <output-dir>/.sql_cache')
+    p.add_argument('--no-sql-cache', action='store_true',
+                   help='SQL 段のキャッシュを使わない（読みも書きもしない）')
+    p.add_argument('--no-sql-parallel', action='store_true',
+                   help='page / linktarget をワーカープロセスで読まず、categorylinks と順に 1 本で読む'
+                        '（既定は page・linktarget を別プロセスで読み、categorylinks の走査と並行させる）')
+    p.add_argument('--resume', action='store_true',
+                   help='前回中断時のチェックポイント（<output-dir>/.extract_pages_progress）から再開する。'
+                        'SQL 段を省略し、multistream なら中断したブロックから、非圧縮の .xml なら中断したページの'
+                        'バイト位置から読む。単一ストリームの .xml.bz2 / .gz は途中から展開できないため先頭から読み直し、'
+                        '書き出し済みのページの判定と書き込みだけを省略する')
+    p.add_argument('--checkpoint-interval', type=float, default=60.0,
+                   help='チェックポイントを書く間隔（秒）。0 以下で書かない。既定: 60')
+    p.add_argument('--full', action='store_true',
+                   help='前回の page_revisions.json とリビジョンが一致するページも書き直す'
+                        '（pages_manifest.json の差分判定は通常どおり行う）。packed では pages.dat を作り直す')
+    p.add_argument('--store', choices=('full', 'sections'), default='full',
+                   help='保存する本文。sections は架空の人物・登場人物専用ページ以外は登場人物セクションだけを保存する'
+                        '（位置は page_sections.json）。既定: full')
+    p.add_argument('--emit-candidates', action='store_true',
+                   help='ページを保存せず、対象ページから直接 character_candidates.csv と除外取り分け CSV を出力する'
+                        '（extract-character-candidates を兼ねる。--resume は使えない）')
+    p.add_argument('--candidates-output', type=Path, default=None,
+                   help='--emit-candidates の出力 CSV（既定: <output-dir>/character_candidates.csv。'
+                        '除外取り分けは同じディレクトリの character_candidates_excluded.csv）')
+    p.add_argument('--exclude-list', type=Path, default=None,
+                   help='--emit-candidates の除外ブラックリスト（JSON）。既定: WIKI_EXCLUDE_LIST または data/excluded_names.json')
+    p.add_argument('--no-line-cache', action='store_true',
+                   help='--emit-candidates で同じ行・名前の除去と除外判定の結果を覚えず毎回計算する（除去ルールの調整用）')
+    p.add_argument('--line-cache-file', type=Path, default=None,
+                   help='--emit-candidates で行ごとの除去・名前分割の結果を読み書きする JSON。再実行で使い回す'
+                        '（ルールの版が違えば読まない）。既定: 使わない')
+    p.add_argument('--page-store', choices=PAGE_STORE_LAYOUTS, default=DEFAULT_PAGE_STORE,
+                   help='ページ本文の置き方。files は pages/{page_id}.txt、packed は pages.dat（本文の追記）と'
+                        ' pages.idx（page_id → 位置・長さ）の 2 ファイル。既定: files')
+    p.add_argument('--seed-category', action='append', default=None, metavar='CATEGORY',
+                   help='対象にするカテゴリ（配下のサブカテゴリも含む）。複数指定すると categorylinks の 1 回の走査で'
+                        'まとめて求め、page_meta.json の各ページに属する seed を入れる。既定: 架空の人物')
+    p.add_argument('--targets-only', action='store_true',
+                   help='登場人物セクションを探さず、対象 ID（seed カテゴリ配下・登場人物専用ページ）だけを書き出す。'
+                        'multistream なら対象を含むブロックだけを展開し、最後の対象ページで読むのをやめる')
+    p.add_argument('--ids', type=int, nargs='+', default=None, metavar='PAGE_ID',
+                   help='指定した page_id のページだけを既存の出力に書き足す（--targets-only と同じ読み方。SQL 段は省略）')
+    p.add_argument('--titles', nargs='+', default=None, metavar='TITLE',
+                   help='指定したタイトルのページだけを既存の出力に書き足す（--ids と併用可）。'
+                        'タイトルは multistream の索引、無ければ page ダンプで引く')
+    p.add_argument('--full-title-map', action='store_true',
+                   help='全メインページの page_id → タイトルを page_titles.bin と page_meta.json の main_id_to_title に残す'
+                        '（既定では page_meta.json は書き出したページのタイトルだけ）')
+    args = p.parse_args()
+    args.seed_category = list(dict.fromkeys(args.seed_category or [CATEGORY_FICTIONAL]))
+    if args.ids or args.titles:
+        args.targets_only = True
+    return args
+
+
+def _sql_cache_dir(args: object, output_dir: Path) -> Path | None:
+    """SQL 段のキャッシュディレクトリ（--no-sql-cache なら None）。"""
+    if args.no_sql_cache:
+        return None
+    return Path(args.sql_cache_dir) if args.sql_cache_dir else output_dir / '.sql_cache'
+
+
+def _load_targets(
+    args: object,
+    data_dir: Path,
+    page_path: Path,
+    cl_path: Path,
+    output_dir: Path,
+    timer: Timer,
+) -> tuple[set[int], Mapping[int, str], set[int], dict[str, set[int]]]:
+    """
+    page / categorylinks ダンプから XML 段の対象 page_id 集合を作り、全メインページのタイトルを page_titles.bin に書き出す
+    （途中再開時は SQL 段を読まずにこれを使う）。
+    返り値: (対象 page_id 集合, main_id_to_title, toujo_page_ids, seed カテゴリ → 配下の page_id)
+    """
+    cache_dir = _sql_cache_dir(args, output_dir)
+
+    # 2) page / linktarget / categorylinks（--no-sql-parallel でなければ並行に読む）
+    linktarget_path = find_dump_optional(data_dir, 'linktarget')
+    if linktarget_path is None:
+        log('  linktarget: 未配置（1.45+ の categorylinks の場合は必須。download.ps1 / download.sh で jawiki-latest-linktarget.sql.gz を取得）')
+    log_progress('page / categorylinks: 読込', elapsed=timer.elapsed)
+    main_id_to_title, _category_id_to_title, toujo_page_ids, seed_page_ids = run_sql_tables(
+        page_path,
+        cl_path,
+        seeds=args.seed_category,
+        linktarget_path=linktarget_path,
+        log_progress_fn=True,
+        decompress=args.decompress,
+        cache_dir=cache_dir,
+        parallel=not args.no_sql_parallel,
+    )
+    log(f'  main pages: {len(main_id_to_title)}, toujo pages: {len(toujo_page_ids)}')
+    for seed, ids in seed_page_ids.items():
+        log(f'  seed {seed}: {len(ids)}')
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    save_title_map(output_dir / PAGE_TITLES_NAME, main_id_to_title)
+
+    # 対象 = seed カテゴリ（既定は架空の人物）配下 ∪ 登場人物専用ページ（XML ストリーム時に「登場人物」セクションありも追加）
+    target_ids = set(toujo_page_ids).union(*seed_page_ids.values())
+    return target_ids, main_id_to_title, toujo_page_ids, seed_page_ids
+
+
+def _write_page_meta(
+    args: object,
+    output_dir: Path,
+    page_ids: Iterable[int],
+    target_ids: set[int],
+    main_id_to_title: Mapping[int, str],
+    toujo_page_ids: set[int],
+    seed_page_ids: dict[str, set[int]],
+) -> Path:
+    """
+    書き出したページの page_id・タイトル・種別・seed を page_meta.json に出力する（extract-character-candidates で使用）。
+    --full-title-map でなければ、実行中に置いた page_titles.bin は消す。
+    """
+    meta_path = page_meta_path_for(output_dir)
+    write_page_meta(
+        meta_path,
+        [
+            (page_id, main_id_to_title.get(page_id), page_kind(page_id, target_ids, toujo_page_ids))
+            for page_id in page_ids
+        ],
+        page_store=args.page_store,
+        seed_page_ids=seed_page_ids,
+        main_id_to_title=main_id_to_title if args.full_title_map else None,
+    )
+    if not args.full_title_map:
+        (output_dir / PAGE_TITLES_NAME).unlink(missing_ok=True)
+    log(f'  page_meta.json: {meta_path}')
+    return meta_path
+
+
+def _compact_store(store: object) -> None:
+    """packed の pages.dat に上書き・削除で残った古い本文が溜まっていれば詰め直す（files では何もしない）。"""
+    reclaimed = store.compact()
+    if reclaimed:
+        log(f'  {PACKED_DATA_NAME} を詰め直し: {reclaimed} バイト減')
+
+
+def _decompress_workers(args: object) -> int:
+    """
+    multistream の展開ワーカー数。--decompress-workers が無ければ CPU コア数から判定ワーカーの分を引く
+    （判定と展開の 2 つのプールで CPU コア数を超えないように）。
+    """
+    if args.decompress_workers:
+        return args.decompress_workers
+    select_workers = args.workers or 1
+    return max(1, (os.cpu_count() or 1) - (select_workers if select_workers > 1 else 0))
+
+
+def _open_pages(
+    args: object,
+    xml_path: Path,
+    index_path: Path | None,
+    target_ids: set[int],
+    start_offset: int = 0,
+) -> Iterator[Page]:
+    """
+    --xml-reader と multistream の有無に応じて XML のページストリームを開く。
+    --targets-only ならどの --xml-reader でもバイト列の事前判定で対象 ID のページだけを読む。
+    書き出すのは ns=0 のページだけなので、どの読み方でも main_only で ns != 0 のページは返さない。
+    """
+    if args.targets_only:
+        return stream_pages(
+            xml_path,
+            index_path=index_path,
+            workers=_decompress_workers(args),
+            target_ids=target_ids,
+            decompress=args.decompress,
+            start_offset=start_offset,
+            sections=False,
+        )
+    if args.xml_reader == 'expat' and index_path is None:
+        return stream_pages_expat(xml_path, decompress=args.decompress, start_offset=start_offset, main_only=True)
+    return stream_pages(
+        xml_path,
+        index_path=index_path,
+        workers=_decompress_workers(args),
+        target_ids=target_ids if args.xml_reader == 'bytes' else None,
+        decompress=args.decompress,
+        start_offset=start_offset,
+        main_only=True,
+    )
+
+
+def _emit_candidates(
+    args: object,
+    pages: Iterator[Page],
+    target_ids: set[int],
+    main_id_to_title: Mapping[int, str],
+    toujo_page_ids: set[int],
+    output_dir: Path,
+    timer: Timer,
+) -> list[int]:
+    """
+    対象ページを保存せず、その場で名前候補を抽出して character_candidates.csv と除外取り分け CSV に書き出す。
+    返り値は候補抽出したページの page_id のリスト。
+    """
+    output_path = Path(args.candidates_output) if args.candidates_output else output_dir / 'character_candidates.csv'
+    output_excluded_path = output_path.parent / 'character_candidates_excluded.csv'
+    exclude_list_path = args.exclude_list if args.exclude_list is not None else default_exclude_list_path()
+    exact_set, suffix_set = load_excluded_set(exclude_list_path)
+    if exact_set:
+        log(f'  除外ブラックリスト: {exclude_list_path} {len(exact_set)}語')
+    set_line_cache_enabled(not args.no_line_cache)
+    if args.line_cache_file:
+        log(f'  行キャッシュ: {args.line_cache_file} から {load_line_cache(args.line_cache_file)}件')
+    selected_ids: list[int] = []
+    with CandidateWriter(output_path, output_excluded_path, exact_set, suffix_set) as writer:
+        for page, _kind, section_span in iter_selected_pages(pages, target_ids, workers=args.workers or 1):
+            selected_ids.append(page.page_id)
+            selected = len(selected_ids)
+            page_title = main_id_to_title.get(page.page_id, str(page.page_id))
+            names = get_names_for_page(
+                page.page_id, page_title, page.text, toujo_page_ids, section_span=section_span
+            )
+            if names:
+                writer.write_page(page_title.replace('_', ' '), names)
+            if selected % 10000 == 0:
+                log_progress('xml: 候補抽出したページ', count=selected, elapsed=timer.elapsed)
+    log_progress('xml: 完了', count=len(selected_ids), elapsed=timer.elapsed)
+    log(f'  対象ページ数: {len(selected_ids)}')
+    log(f'  LLM用: {output_path}, {writer.rows} 行')
+    if writer.excluded:
+        log(f'  除外取り分け: {output_excluded_path}, {writer.excluded} 行')
+    if line_cache_enabled():
+        log(f'  行キャッシュ: {line_cache_summary()}; 除外判定 {writer.excluded_cache.summary()}')
+    if args.line_cache_file:
+        save_line_cache(args.line_cache_file)
+    return selected_ids
+
+
+def _resolve_requested(
+    args: object,
+    page_path: Path,
+    index_path: Path | None,
+    output_dir: Path,
+) -> dict[int, str]:
+    """
+    --ids / --titles のページの page_id → タイトル。multistream の索引があれば page ダンプは読まない。
+    見つからない page_id・タイトルはログに出して除く。
+    """
+    ids = args.ids or []
+    titles = args.titles or []
+    if index_path is not None:
+        requested = lookup_multistream_index(index_path, page_ids=ids, titles=titles)
+    else:
+        main_id_to_title = run_page(
+            page_path, log_progress_fn=True, decompress=args.decompress, cache_dir=_sql_cache_dir(args, output_dir)
+        )[0]
+        index = TitleIndex(main_id_to_title)
+        requested = {page_id: index.titles[page_id] for page_id in ids if page_id in index.titles}
+        for title in titles:
+            page_id = index.page_id(title)
+            if page_id is not None:
+                requested[page_id] = index.titles[page_id]
+    missing_ids = [page_id for page_id in ids if page_id not in requested]
+    found_titles = set(requested.values())
+    missing_titles = [title for title in titles if normalize_title(title) not in found_titles]
+    if missing_ids:
+        log(f'  --ids: 見つからない page_id: {", ".join(map(str, missing_ids))}')
+    if missing_titles:
+        log(f'  --titles: 見つからないタイトル: {", ".join(missing_titles)}')
+    return requested
+
+
+def _update_requested_pages(
+    args: object,
+    pages: Iterator[Page],
+    requested: dict[int, str],
+    output_dir: Path,
+    timer: Timer,
+) -> None:
+    """
+    --ids / --titles: 指定したページを既存のページストアに書き足し（同じ page_id は置き換え）、
+    page_revisions.json・page_sections.json・page_meta.json に反映する。pages_manifest.json はこのページだけの差分。
+    """
+    meta_path = page_meta_path_for(output_dir)
+    layout = args.page_store
+    if meta_path.is_file():
+        with open(meta_path, encoding='utf-8') as f:
+            layout = json.load(f).get('page_store', layout)
+    store = open_page_writer(output_dir, layout)
+    revisions_path = revisions_path_for(output_dir)
+    previous_revisions = load_revisions(revisions_path)
+    entries: dict[int, tuple[int, str, str, tuple[int, int] | None]] = {}
+    for page, _kind, _section_span in iter_selected_pages(pages, set(requested), workers=1):
+        status = classify_page(previous_revisions, page.page_id, page.revision_id, page.sha1)
+        if status != STATUS_UNCHANGED or args.full or page.page_id not in store:
+            store.put(page.page_id, page.text)
+        entries[page.page_id] = (page.revision_id, page.sha1, status, None)
+    _compact_store(store)
+    store.close()
+    log_progress('xml: 完了', count=len(entries), elapsed=timer.elapsed)
+
+    merged = {
+        page_id: (revision_id, sha1, STATUS_UNCHANGED, span)
+        for page_id, (revision_id, sha1, span) in previous_revisions.items()
+    }
+    merged.update(entries)
+    write_revisions(revisions_path, merged)
+    # 書き直したページは全文を対象 ID として保存したので、以前のセクション位置は使わない
+    sections_path = sections_path_for(output_dir)
+    offsets = {
+        page_id: span for page_id, span in load_section_offsets(sections_path).items() if page_id not in entries
+    }
+    write_sections(sections_path, merged, offsets)
+    write_manifest(manifest_path_for(output_dir), build_manifest(entries, {}))
+    update_page_meta(
+        meta_path,
+        [
+            (page_id, requested[page_id], KIND_TOUJO if TOUJO_PATTERN.match(requested[page_id]) else KIND_REQUESTED)
+            for page_id in entries
+        ],
+        page_store=layout,
+    )
+    log(f'  書き出しページ数: {len(entries)}（指定 {len(requested)}）')
+    log(f'  page_meta.json: {meta_path}')
 
 
 def main() -> None:
@@ -44,71 +462,187 @@ def main() -> None:
         log(f'  categorylinks: {cl_path.name}')
         log(f'  page: {page_path.name}')
         log(f'  pages-articles: {xml_path.name}')
+        index_path = find_multistream_index(xml_path)
+        if index_path is not None:
+            log(f'  multistream index: {index_path.name}（bz2 ブロックを並列展開）')
 
-        # 2) page ダンプ
-        log_progress('page: 読込', elapsed=total_timer.elapsed)
-        main_id_to_title, category_id_to_title, toujo_page_ids = run_page(
-            page_path, log_progress_fn=True
-        )
-        log(f'  main pages: {len(main_id_to_title)}, toujo pages: {len(toujo_page_ids)}')
-
-        # 3) categorylinks: 架空の人物の page_ids
-        linktarget_path = find_dump_optional(data_dir, 'linktarget')
-        if linktarget_path is None:
-            log('  linktarget: 未配置（1.45+ の categorylinks の場合は必須。download.ps1 / download.sh で jawiki-latest-linktarget.sql.gz を取得）')
-        log_progress('categorylinks: 読込', elapsed=total_timer.elapsed)
-        fictional_page_ids = run_categorylinks(
-            cl_path, category_id_to_title, linktarget_path=linktarget_path, log_progress_fn=True
-        )
-        log(f'  fictional_page_ids: {len(fictional_page_ids)}')
-
-        # 対象 = 架空の人物 ∪ 登場人物専用ページ（XML ストリーム時に「登場人物」セクションありも追加）
-        target_ids: set[int] = fictional_page_ids | toujo_page_ids
-
-        # 4) 出力ディレクトリ
-        pages_dir = output_dir / 'pages'
-        pages_dir.mkdir(parents=True, exist_ok=True)
-
-        # 5) XML ストリームで対象ページのみ書き出し
-        written = 0
-        checked_with_section = 0
-        log_progress('xml: ストリーム・ページ書き出し', elapsed=total_timer.elapsed)
-        for page_id, ns, text in stream_pages(xml_path):
-            if ns != 0:
-                continue
-            if page_id in target_ids:
-                out_path = pages_dir / f'{page_id}.txt'
-                out_path.write_text(text, encoding='utf-8')
-                written += 1
-                continue
-            # 登場人物セクションがあるか判定（軽量チェック後で extract_toujo_section）
-            if '登場人物' not in text:
-                continue
-            checked_with_section += 1
-            if extract_toujo_section(text) is None:
-                continue
-            out_path = pages_dir / f'{page_id}.txt'
-            out_path.write_text(text, encoding='utf-8')
+        if (args.ids or args.titles) and not args.emit_candidates:
+            # 指定ページだけを既存の出力に書き足す（SQL 段・チェックポイントは使わない）
+            requested = _resolve_requested(args, page_path, index_path, output_dir)
+            log_progress('xml: 指定ページの読込', elapsed=total_timer.elapsed)
+            pages = _open_pages(args, xml_path, index_path, set(requested))
+            _update_requested_pages(args, pages, requested, output_dir, total_timer)
+            log(f'  実行時間: {format_elapsed(total_timer.elapsed)} ({total_timer.elapsed:.1f}秒)')
+            return
+
+        checkpoint_path = checkpoint_path_for(output_dir)
+        fingerprint = dump_fingerprint(xml_path)
+        titles_path = output_dir / PAGE_TITLES_NAME
+        state = None
+        if args.resume and args.emit_candidates:
+            log('  --resume: --emit-candidates では使えないため最初から実行します')
+        elif args.resume:
+            state = load_checkpoint(checkpoint_path, fingerprint)
+            if state is None or not titles_path.is_file():
+                log('  --resume: 有効なチェックポイントが無いため最初から実行します')
+                state = None
+            elif state['page_store'] != args.page_store:
+                log(f"  --resume: 中断時の --page-store（{state['page_store']}）と異なるため最初から実行します")
+                state = None
+            elif state['targets_only'] != args.targets_only:
+                log('  --resume: 中断時の --targets-only と異なるため最初から実行します')
+                state = None
+            elif set(state['seed_page_ids']) != set(args.seed_category):
+                log('  --resume: 中断時の --seed-category と異なるため最初から実行します')
+                state = None
+
+        if state is not None:
+            # 途中再開: SQL 段は省略し、チェックポイントの対象集合とカウンタを使う
+            target_ids: set[int] = state['target_ids']
+            seed_page_ids: dict[str, set[int]] = state['seed_page_ids']
+            last_page_id = state['last_page_id']
+            written = state['written']
+            with_section = state['with_section']
+            main_id_to_title = load_title_map(titles_path)
+            toujo_page_ids = {
+                page_id for page_id in target_ids if TOUJO_PATTERN.match(main_id_to_title.get(page_id, ''))
+            }
+            log(f'  再開: page_id {last_page_id} の次から（書き出し済み {written} ページ）')
+        elif args.ids or args.titles:
+            # --emit-candidates で指定ページだけを候補抽出する
+            main_id_to_title = _resolve_requested(args, page_path, index_path, output_dir)
+            target_ids = set(main_id_to_title)
+            toujo_page_ids = {page_id for page_id, title in main_id_to_title.items() if TOUJO_PATTERN.match(title)}
+            seed_page_ids = {}
+        else:
+            target_ids, main_id_to_title, toujo_page_ids, seed_page_ids = _load_targets(
+                args, data_dir, page_path, cl_path, output_dir, total_timer
+            )
+            last_page_id = 0
+            written = 0
+            with_section = 0
+        log(f'  target_ids: {len(target_ids)}')
+
+        if args.emit_candidates:
+            # 4') ページを保存せずに候補 CSV へ直接出力
+            log_progress(f'xml: ストリーム・候補抽出 (reader={args.xml_reader})', elapsed=total_timer.elapsed)
+            pages = _open_pages(args, xml_path, index_path, target_ids)
+            selected_ids = _emit_candidates(
+                args, pages, target_ids, main_id_to_title, toujo_page_ids, output_dir, total_timer
+            )
+            _write_page_meta(
+                args, output_dir, selected_ids, target_ids, main_id_to_title, toujo_page_ids, seed_page_ids
+            )
+            log(f'  実行時間: {format_elapsed(total_timer.elapsed)} ({total_timer.elapsed:.1f}秒)')
+            return
+
+        # 4) ページストアと前回のリビジョン記録
+        store = open_page_writer(output_dir, args.page_store, fresh=args.full and state is None)
+        pages_location = output_dir / (PACKED_DATA_NAME if args.page_store == 'packed' else PAGES_DIR_NAME)
+        revisions_path = revisions_path_for(output_dir)
+        previous_revisions = load_revisions(revisions_path)
+        if previous_revisions:
+            log(f'  前回のリビジョン記録: {len(previous_revisions)} ページ（一致するページは'
+                f'{"書き直す" if args.full else "書き込みを省略"}）')
+        journal = RevisionJournal(journal_path_for(output_dir), resume_page_id=last_page_id)
+
+        # multistream なら再開位置をブロック単位で求められるよう、ブロックの先頭 page_id を読んでおく。
+        # 非圧縮の .xml はチェックポイントに最後に書き出したページのバイト位置を残し、そこから読む
+        block_index = read_multistream_index(index_path) if index_path is not None else []
+        seekable = index_path is None and is_seekable_dump(xml_path)
+        start_offset = 0
+        if last_page_id and block_index:
+            start_offset = block_offset_for(block_index, last_page_id) or 0
+            log(f'  再開: multistream のバイト位置 {start_offset} のブロックから読込')
+        elif last_page_id and seekable and state.get('offset'):
+            start_offset = state.get('offset')
+            log(f'  再開: バイト位置 {start_offset} のページから読込')
+        elif last_page_id:
+            log('  再開: 圧縮された XML は途中から展開できないため先頭から読み直す（書き出し済みのページは判定・書き込みを省略）')
+
+        # 5) XML ストリームで対象ページのみ書き出し（--workers 2 以上なら判定をワーカープロセスで並列実行）
+        workers = args.workers or 1
+        pools = f'workers={workers}'
+        if index_path is not None:
+            pools += f', decompress_workers={_decompress_workers(args)}'
+        log_progress(f'xml: ストリーム・ページ書き出し (reader={args.xml_reader}, {pools})', elapsed=total_timer.elapsed)
+        pages = _open_pages(args, xml_path, index_path, target_ids, start_offset)
+        if last_page_id:
+            # 書き出し済みのページは判定もせずに読み飛ばす（ダンプは page_id 昇順）
+            pages = (p for p in pages if p[0] > last_page_id)
+
+        def _checkpoint_offset(page_id: int) -> int | None:
+            if block_index:
+                return block_offset_for(block_index, page_id)
+            return page_offset_for(xml_path, page_id) if seekable else None
+
+        def _checkpoint(page_id: int) -> None:
+            store.flush()
+            journal.flush()
+            save_checkpoint(
+                checkpoint_path,
+                dump=fingerprint,
+                last_page_id=page_id,
+                offset=_checkpoint_offset(page_id),
+                written=written,
+                with_section=with_section,
+                target_ids=target_ids,
+                seed_page_ids=seed_page_ids,
+                page_store=args.page_store,
+                targets_only=args.targets_only,
+            )
+
+        last_checkpoint = time.monotonic()
+        for page, kind, section_span in iter_selected_pages(pages, target_ids, workers=workers):
+            page_id = page.page_id
+            text = page.text
+            # span はセクションだけを保存する場合の元の位置、offset は全文を保存する場合のセクション位置
+            span = None
+            offset = section_span
+            if kind == 'section' and args.store == 'sections':
+                span = section_span
+                offset = None
+                text = text[span[0]:span[1]]
+            status = classify_page(previous_revisions, page_id, page.revision_id, page.sha1, span)
+            if status == STATUS_UNCHANGED and page_id not in store:
+                status = STATUS_CHANGED
+            if status != STATUS_UNCHANGED or args.full:
+                store.put(page_id, text)
+            journal.record(page_id, page.revision_id, page.sha1, status, span, offset)
             written += 1
-            if checked_with_section % 10000 == 0 and checked_with_section:
-                log_progress('xml: 登場人物セクション確認済み', count=checked_with_section, elapsed=total_timer.elapsed)
+            if kind == 'section':
+                with_section += 1
+                if with_section % 10000 == 0:
+                    log_progress('xml: 登場人物セクションありページ', count=with_section, elapsed=total_timer.elapsed)
+            if args.checkpoint_interval > 0 and time.monotonic() - last_checkpoint >= args.checkpoint_interval:
+                _checkpoint(page_id)
+                last_checkpoint = time.monotonic()
 
         log_progress('xml: 完了', count=written, elapsed=total_timer.elapsed)
         log(f'  書き出しページ数: {written}')
 
-        # 6) page_meta.json（extract-character-candidates で使用）
-        page_meta = {
-            'main_id_to_title': main_id_to_title,
-            'toujo_page_ids': list(toujo_page_ids),
-        }
-        meta_path = output_dir / 'page_meta.json'
-        with open(meta_path, 'w', encoding='utf-8') as f:
-            json.dump(page_meta, f, ensure_ascii=False, indent=0)
-        log(f'  page_meta.json: {meta_path}')
+        # 6) リビジョン記録と差分マニフェスト。前回あって今回対象外のページは削除する
+        journal.close()
+        manifest = build_manifest(journal.entries, previous_revisions)
+        for page_id in manifest['removed']:
+            store.delete(page_id)
+        _compact_store(store)
+        store.close()
+        write_revisions(revisions_path, journal.entries)
+        write_sections(sections_path_for(output_dir), journal.entries, journal.offsets)
+        manifest_path = manifest_path_for(output_dir)
+        write_manifest(manifest_path, manifest)
+        meta_path = _write_page_meta(
+            args, output_dir, journal.entries, target_ids, main_id_to_title, toujo_page_ids, seed_page_ids
+        )
+        log(f"  差分: 追加 {len(manifest['added'])}, 変更 {len(manifest['changed'])}, "
+            f"削除 {len(manifest['removed'])}, 変更なし {len(manifest['unchanged'])}")
+        journal.remove()
+        remove_checkpoint(checkpoint_path)
 
     log('')
     log(f'  実行時間: {format_elapsed(total_timer.elapsed)} ({total_timer.elapsed:.1f}秒)')
-    log(f'  出力: {pages_dir} と {meta_path}')
+    log(f'  出力: {pages_location} と {meta_path}（差分: {manifest_path}）')
 
 
 if __name__ == '__main__':
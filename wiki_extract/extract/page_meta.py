@@ -0,0 +1,135 @@
+"""
+extract-pages が出力ディレクトリに置く page_meta.json の読み書き。
+
+形式: {"version": 2, "page_store": "files", "pages": [{"id": 5, "title": "...", "kind": "fictional"}, ...]}
+- pages は書き出したページ（--emit-candidates では候補抽出したページ）だけを page_id 昇順で持つ。
+  kind は toujo（登場人物専用ページ）・fictional（seed カテゴリ配下。既定の seed は架空の人物）・section（登場人物セクションあり）、
+  --ids / --titles で初めて書き出したページは requested。
+  seed カテゴリ配下のページには、属する seed のリスト seeds も入る（例: "seeds": ["架空の人物", "架空の動物"]）
+- --full-title-map のときだけ、全メインページの main_id_to_title（page_id → タイトル）も入る
+  （同じ内容をコンパクトにした page_titles.bin も残す）
+
+version の無い古い形式（main_id_to_title と toujo_page_ids）も読める。
+"""
+
+import json
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, Optional
+
+from wiki_extract.util.title_map import PAGE_TITLES_NAME, load_title_map
+
+PAGE_META_VERSION = 2
+PAGE_META_NAME = 'page_meta.json'
+
+KIND_TOUJO = 'toujo'
+KIND_FICTIONAL = 'fictional'
+KIND_SECTION = 'section'
+KIND_REQUESTED = 'requested'
+
+
+def page_meta_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内の page_meta.json のパス。"""
+    return Path(output_dir) / PAGE_META_NAME
+
+
+def page_kind(page_id: int, target_ids: set[int], toujo_page_ids: set[int]) -> str:
+    """書き出したページの種別。対象 ID でなければ登場人物セクションで選ばれたページ。"""
+    if page_id in toujo_page_ids:
+        return KIND_TOUJO
+    if page_id in target_ids:
+        return KIND_FICTIONAL
+    return KIND_SECTION
+
+
+def write_page_meta(
+    path: Path,
+    pages: Iterable[tuple[int, Optional[str], str]],
+    *,
+    page_store: str,
+    seed_page_ids: Optional[dict[str, set[int]]] = None,
+    main_id_to_title: Optional[Mapping[int, str]] = None,
+) -> None:
+    """
+    (page_id, タイトル, 種別) の列を page_meta.json に一時ファイル経由で書く。
+    seed_page_ids（seed カテゴリ → 配下の page_id）を渡すと、各ページに属する seed を seeds として入れる。
+    main_id_to_title を渡すと全メインページの対応も入れる（--full-title-map）。
+    """
+    seed_items = list((seed_page_ids or {}).items())
+    entries = []
+    for page_id, title, kind in sorted(pages):
+        entry: dict = {'id': page_id, 'title': title, 'kind': kind}
+        seeds = [seed for seed, ids in seed_items if page_id in ids]
+        if seeds:
+            entry['seeds'] = seeds
+        entries.append(entry)
+    data: dict = {
+        'version': PAGE_META_VERSION,
+        'page_store': page_store,
+        'pages': entries,
+    }
+    if main_id_to_title is not None:
+        data['main_id_to_title'] = dict(main_id_to_title.items())
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=0)
+    os.replace(tmp, path)
+
+
+def update_page_meta(
+    path: Path,
+    pages: Iterable[tuple[int, Optional[str], str]],
+    *,
+    page_store: str,
+) -> None:
+    """
+    既存の page_meta.json に (page_id, タイトル, 種別) の列を加えて書き直す（--ids / --titles）。
+    すでにあるページはタイトルだけ更新し、種別・seeds・main_id_to_title はそのまま残す。
+    page_meta.json が無い（または古い形式の）ときは pages だけで作る。
+    """
+    meta: dict = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if not isinstance(meta, dict) or meta.get('version') != PAGE_META_VERSION:
+        meta = {}
+    existing = {p['id']: p for p in meta.get('pages', [])}
+    merged = {page_id: (page_id, p['title'], p['kind']) for page_id, p in existing.items()}
+    for page_id, title, kind in pages:
+        merged[page_id] = (page_id, title, existing[page_id]['kind'] if page_id in existing else kind)
+    seed_page_ids: dict[str, set[int]] = {}
+    for page_id, p in existing.items():
+        for seed in p.get('seeds', ()):
+            seed_page_ids.setdefault(seed, set()).add(page_id)
+    write_page_meta(
+        path,
+        merged.values(),
+        page_store=meta.get('page_store', page_store),
+        seed_page_ids=seed_page_ids,
+        main_id_to_title=meta.get('main_id_to_title'),
+    )
+
+
+def load_page_titles(directory: Path, meta: dict) -> Mapping[int, str]:
+    """
+    extract-pages の出力ディレクトリの page_id（int）→ タイトル。
+    page_titles.bin（--full-title-map）があれば mmap で開き、無ければ page_meta.json の pages、
+    古い形式なら main_id_to_title を使う。
+    """
+    path = Path(directory) / PAGE_TITLES_NAME
+    if path.is_file():
+        return load_title_map(path)
+    if 'pages' in meta:
+        return {p['id']: p['title'] for p in meta['pages'] if p['title'] is not None}
+    return {int(k): v for k, v in meta.get('main_id_to_title', {}).items()}
+
+
+def load_toujo_page_ids(meta: dict) -> set[int]:
+    """page_meta.json の登場人物専用ページの page_id 集合（古い形式は toujo_page_ids）。"""
+    if 'pages' in meta:
+        return {p['id'] for p in meta['pages'] if p['kind'] == KIND_TOUJO}
+    return set(meta.get('toujo_page_ids', []))
@@ -0,0 +1,279 @@
+"""
+extract-pages の差分実行用: 書き出したページのリビジョン ID と sha1 を記録し、前回実行と比較する。
+
+出力ディレクトリに置くファイル:
+- page_revisions.json: {"version": 1, "pages": {"page_id": [revision_id, sha1] または [revision_id, sha1, [開始, 終了]], ...}}
+  （書き出したページのみ。3 要素目は登場人物セクションだけを保存したページの、元の本文内での位置）
+- page_sections.json: {"version": 1, "sections": {"page_id": [開始, 終了], ...}, "offsets": {"page_id": [開始, 終了], ...}}
+  （sections はセクションだけを保存したページ。offsets は全文を保存した登場人物セクションありページの、
+  保存した本文内でのセクション位置で、extract-character-candidates はセクションを探し直さずに切り出す）
+- pages_manifest.json: 前回実行からの差分 {"added": [...], "changed": [...], "removed": [...], "unchanged": [...]}
+- .page_revisions.partial: 実行中の記録（1 行 1 ページのタブ区切り。6 列目が offsets）。完了時に削除し、--resume 時は読み戻す
+"""
+
+import json
+import os
+from pathlib import Path
+
+REVISIONS_VERSION = 1
+
+STATUS_ADDED = 'added'
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+
+
+def revisions_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内のリビジョン記録のパス。"""
+    return Path(output_dir) / 'page_revisions.json'
+
+
+def manifest_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内の差分マニフェストのパス。"""
+    return Path(output_dir) / 'pages_manifest.json'
+
+
+def sections_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内のセクション位置一覧のパス。"""
+    return Path(output_dir) / 'page_sections.json'
+
+
+def journal_path_for(output_dir: Path) -> Path:
+    """出力ディレクトリ内の実行中リビジョン記録のパス。"""
+    return Path(output_dir) / '.page_revisions.partial'
+
+
+def _span_or_none(value: object) -> tuple[int, int] | None:
+    if value is None:
+        return None
+    start, end = value
+    return int(start), int(end)
+
+
+def load_revisions(path: Path) -> dict[int, tuple[int, str, tuple[int, int] | None]]:
+    """page_revisions.json を {page_id: (revision_id, sha1, セクション位置 or None)} で読む。無い・壊れている場合は空。"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != REVISIONS_VERSION:
+        return {}
+    try:
+        return {
+            int(k): (int(v[0]), str(v[1]), _span_or_none(v[2] if len(v) > 2 else None))
+            for k, v in data['pages'].items()
+        }
+    except (KeyError, TypeError, ValueError, IndexError, AttributeError):
+        return {}
+
+
+def _load_section_spans(path: Path, key: str) -> dict[int, tuple[int, int]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != REVISIONS_VERSION:
+        return {}
+    try:
+        return {int(k): (int(v[0]), int(v[1])) for k, v in data.get(key, {}).items()}
+    except (TypeError, ValueError, IndexError, AttributeError):
+        return {}
+
+
+def load_sections(path: Path) -> dict[int, tuple[int, int]]:
+    """page_sections.json の sections を {page_id: (開始, 終了)} で読む。無い・壊れている場合は空。"""
+    return _load_section_spans(path, 'sections')
+
+
+def load_section_offsets(path: Path) -> dict[int, tuple[int, int]]:
+    """page_sections.json の offsets（保存した全文内のセクション位置）を読む。無い・壊れている・古い場合は空。"""
+    return _load_section_spans(path, 'offsets')
+
+
+def classify_page(
+    previous: dict[int, tuple[int, str, tuple[int, int] | None]],
+    page_id: int,
+    revision_id: int,
+    sha1: str,
+    span: tuple[int, int] | None = None,
+) -> str:
+    """
+    前回の記録と比べてページの状態を返す。リビジョン ID・sha1・保存形（全文かセクションのみか）が
+    すべて一致すれば unchanged（リビジョン ID も sha1 も取れていないページは常に changed 扱い）。
+    """
+    prev = previous.get(page_id)
+    if prev is None:
+        return STATUS_ADDED
+    if (revision_id or sha1) and prev == (revision_id, sha1, span):
+        return STATUS_UNCHANGED
+    return STATUS_CHANGED
+
+
+class RevisionJournal:
+    """
+    実行中に書き出した（または変更なしと判定した）ページのリビジョンと状態を追記で記録する。
+    offsets には全文を保存したページの登場人物セクションの位置を持つ（page_sections.json の offsets）。
+    resume_page_id を渡すと既存の記録のうちその page_id 以下を引き継ぐ（途中再開用）。
+    """
+
+    def __init__(self, path: Path, *, resume_page_id: int = 0) -> None:
+        self.path = Path(path)
+        self.entries: dict[int, tuple[int, str, str, tuple[int, int] | None]] = {}
+        self.offsets: dict[int, tuple[int, int]] = {}
+        if resume_page_id:
+            entries, offsets = _read_journal(self.path)
+            self.entries = {page_id: entry for page_id, entry in entries.items() if page_id <= resume_page_id}
+            self.offsets = {page_id: span for page_id, span in offsets.items() if page_id in self.entries}
+        self._f = open(self.path, 'w', encoding='utf-8')
+        for page_id, entry in self.entries.items():
+            self._write(page_id, entry, self.offsets.get(page_id))
+
+    def _write(
+        self,
+        page_id: int,
+        entry: tuple[int, str, str, tuple[int, int] | None],
+        offset: tuple[int, int] | None,
+    ) -> None:
+        revision_id, sha1, status, span = entry
+        span_field = _span_field(span)
+        self._f.write(f'{page_id}\t{revision_id}\t{sha1}\t{status}\t{span_field}\t{_span_field(offset)}\n')
+
+    def record(
+        self,
+        page_id: int,
+        revision_id: int,
+        sha1: str,
+        status: str,
+        span: tuple[int, int] | None = None,
+        offset: tuple[int, int] | None = None,
+    ) -> None:
+        """
+        span は登場人物セクションだけを保存した場合の元の本文内での位置（全文なら None）。
+        offset は全文を保存した場合の登場人物セクションの位置（セクションが無ければ None）。
+        """
+        entry = (revision_id, sha1, status, span)
+        self.entries[page_id] = entry
+        if offset is not None:
+            self.offsets[page_id] = offset
+        else:
+            self.offsets.pop(page_id, None)
+        self._write(page_id, entry, offset)
+
+    def flush(self) -> None:
+        """チェックポイント保存前に呼ぶ（チェックポイントより記録が遅れないように）。"""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def remove(self) -> None:
+        """完了時に記録ファイルを削除する。"""
+        self.close()
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def _span_field(span: tuple[int, int] | None) -> str:
+    return f'{span[0]}:{span[1]}' if span is not None else ''
+
+
+def _parse_span_field(field: str) -> tuple[int, int] | None:
+    if not field:
+        return None
+    start, _, end = field.partition(':')
+    return int(start), int(end)
+
+
+def _read_journal(
+    path: Path,
+) -> tuple[dict[int, tuple[int, str, str, tuple[int, int] | None]], dict[int, tuple[int, int]]]:
+    """
+    実行中リビジョン記録を (entries, offsets) で読む。無ければ空。書き込み途中の不完全な行は無視する。
+    offsets の列が無い（5 列の）行も読む。
+    """
+    entries: dict[int, tuple[int, str, str, tuple[int, int] | None]] = {}
+    offsets: dict[int, tuple[int, int]] = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) not in (5, 6) or not parts[0].isdigit() or not parts[1].isdigit():
+                    continue
+                page_id = int(parts[0])
+                entries[page_id] = (int(parts[1]), parts[2], parts[3], _parse_span_field(parts[4]))
+                offset = _parse_span_field(parts[5]) if len(parts) == 6 else None
+                if offset is not None:
+                    offsets[page_id] = offset
+                else:
+                    offsets.pop(page_id, None)
+    except OSError:
+        return {}, {}
+    return entries, offsets
+
+
+def _replace_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=0)
+    os.replace(tmp, path)
+
+
+def write_revisions(path: Path, entries: dict[int, tuple[int, str, str, tuple[int, int] | None]]) -> None:
+    """page_revisions.json を一時ファイル経由で置き換え保存する。"""
+    pages: dict[str, list] = {}
+    for page_id in sorted(entries):
+        revision_id, sha1, _status, span = entries[page_id]
+        pages[str(page_id)] = [revision_id, sha1] if span is None else [revision_id, sha1, list(span)]
+    _replace_json(path, {'version': REVISIONS_VERSION, 'pages': pages})
+
+
+def write_sections(
+    path: Path,
+    entries: dict[int, tuple[int, str, str, tuple[int, int] | None]],
+    offsets: dict[int, tuple[int, int]] | None = None,
+) -> None:
+    """
+    セクションだけを保存したページの位置（sections）と、全文を保存したページのセクション位置（offsets）を
+    page_sections.json に書き出す（無ければ空の一覧）。
+    """
+    sections = {
+        str(page_id): list(entries[page_id][3])
+        for page_id in sorted(entries)
+        if entries[page_id][3] is not None
+    }
+    offsets = offsets or {}
+    data = {
+        'version': REVISIONS_VERSION,
+        'sections': sections,
+        'offsets': {str(page_id): list(offsets[page_id]) for page_id in sorted(offsets) if page_id in entries},
+    }
+    _replace_json(path, data)
+
+
+def build_manifest(
+    entries: dict[int, tuple[int, str, str, tuple[int, int] | None]],
+    previous: dict[int, tuple[int, str, tuple[int, int] | None]],
+) -> dict[str, list[int]]:
+    """今回の記録と前回の記録から added / changed / removed / unchanged の page_id リスト（昇順）を作る。"""
+    manifest: dict[str, list[int]] = {
+        STATUS_ADDED: [],
+        STATUS_CHANGED: [],
+        'removed': sorted(previous.keys() - entries.keys()),
+        STATUS_UNCHANGED: [],
+    }
+    for page_id in sorted(entries):
+        manifest[entries[page_id][2]].append(page_id)
+    return manifest
+
+
+def write_manifest(path: Path, manifest: dict[str, list[int]]) -> None:
+    """pages_manifest.json を書き出す。"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=0)
@@ -5,13 +5,16 @@
 """
 
 import re
-from typing import Iterator
+from typing import Iterator, NamedTuple
 
 import mwparserfromhell
+from mwparserfromhell.definitions import PARSER_BLACKLIST
 
 
 # "== 登場人物 ==" や "=== 登場人物 ===" などにマッチ
 SECTION_HEADING_RE = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+# 本文全体に finditer する見出し。空白に改行を含めず、1 行ずつ SECTION_HEADING_RE.match するのと同じ行だけにマッチ
+_HEADING_LINE_RE = re.compile(r"^(={2,6})[^\S\n]*(.+?)[^\S\n]*\1[^\S\n]*$", re.MULTILINE)
 # 定義リストの用語: "; 虎杖 悠仁（いたどり ゆうじ）" や ";; ネスト" → HTML <dt>
 DT_LINE_RE = re.compile(r"^\s*;+\s*(.*)$", re.MULTILINE)
 # 見出し内の読み仮名を除く（例: 虎杖 悠仁（いたどり ゆうじ） -> 虎杖 悠仁）
@@ -33,38 +36,60 @@ GROUP_HEADING_EXACT = frozenset({
 })
 
 
+class Heading(NamedTuple):
+    """見出し行。start / end は行の先頭と末尾（改行の手前）の位置。"""
+
+    level: int
+    title: str
+    start: int
+    end: int
+
+
+def iter_headings(wikitext: str) -> Iterator[Heading]:
+    """本文を 1 回の finditer でたどり、見出し行を出現順に返す（行に分割もコピーもしない）。"""
+    for m in _HEADING_LINE_RE.finditer(wikitext):
+        yield Heading(len(m.group(1)), m.group(2).strip(), m.start(), m.end())
+
+
+def toujo_section_span(wikitext: str) -> tuple[int, int] | None:
+    """
+    extract_toujo_section が返すセクション本文の wikitext 内での位置 (開始, 終了) を返す。
+    wikitext[開始:終了] が extract_toujo_section(wikitext) と一致する。該当セクションがなければ None。
+    セクションは「登場人物」を含む見出しの次の行から、同レベル以上か「補足」を含む見出しの手前の行末まで
+    （セクション内に「登場人物」を含む見出しがあればそこから数え直す）。
+    """
+    if "登場人物" not in wikitext:
+        return None
+    content_start = -1
+    section_level = 0
+    stop = -1
+    for heading in iter_headings(wikitext):
+        if "登場人物" in heading.title:
+            content_start = heading.end + 1
+            section_level = heading.level
+        elif content_start >= 0 and (heading.level <= section_level or "補足" in heading.title):
+            stop = heading.start
+            break
+    if content_start < 0:
+        return None
+    if stop < 0:
+        # 末尾まで。見出しが最終行（後ろに改行が無い）なら本文の行は無い
+        return (content_start, len(wikitext)) if content_start <= len(wikitext) else None
+    if stop == content_start:
+        return None
+    return content_start, stop - 1
+
+
 def extract_toujo_section(wikitext: str) -> str | None:
     """
     最初の「登場人物」セクションを抽出（見出しから、同レベル以上の次の見出しまで）。
     「役名に関する補足」などの補足サブセクション手前で止め、役者名・説明文を避ける。
     該当セクションがなければ None を返す。
     """
-    if "登場人物" not in wikitext:
+    span = toujo_section_span(wikitext)
+    if span is None:
         return None
-    lines = wikitext.split("\n")
-    in_section = False
-    section_level = 0
-    result: list[str] = []
-    for line in lines:
-        m = SECTION_HEADING_RE.match(line)
-        if m:
-            level = len(m.group(1))
-            title = m.group(2).strip()
-            if "登場人物" in title:
-                in_section = True
-                section_level = level
-                result = []
-                continue
-            if in_section:
-                if level <= section_level:
-                    in_section = False
-                    break
-                if "補足" in title:
-                    in_section = False
-                    break
-        if in_section:
-            result.append(line)
-    return "\n".join(result) if result else None
+    return wikitext[span[0]:span[1]]
 
 
 def _normalize_title(title: str) -> str:
@@ -93,35 +118,149 @@ def _is_likely_group_heading(plain_title: str) -> bool:
     return False
 
 
+class OutlineHeading(NamedTuple):
+    """section_outline の見出し。has_dt は見出しの下（より深い見出しの下も含む）に ; 行があるか（レベル 3/4 のみ）。"""
+
+    level: int
+    title: str
+    has_dt: bool
+
+
+class SectionOutline(NamedTuple):
+    """登場人物セクションを 1 回たどった結果: 見出し・定義リストの用語・太字だけの行の名前（いずれも出現順）。"""
+
+    headings: list[OutlineHeading]
+    dt_terms: list[str]
+    bold_names: list[str]
+
+
+def section_outline(section_wikitext: str) -> SectionOutline:
+    """
+    セクションの行を 1 回だけたどり、見出しの木と ; 行・太字だけの行を集める（行数・見出し数に対して線形）。
+    レベル 3/4 の見出しは同レベル以上の次の見出しまでを本文とし、その間に ; 行があれば has_dt。
+    本文を読んでいる途中の見出しをスタックに積み、; 行が来たら積まれている見出しすべてに印を付けて降ろす。
+    """
+    headings: list[list] = []
+    dt_terms: list[str] = []
+    bold_names: list[str] = []
+    # ; 行がまだ見つかっていないレベル 3/4 の見出しの headings 内の添字（レベル昇順）
+    open_headings: list[int] = []
+    for line in section_wikitext.splitlines():
+        if line.startswith("="):
+            m = SECTION_HEADING_RE.match(line)
+            if m:
+                level = len(m.group(1))
+                while open_headings and headings[open_headings[-1]][0] >= level:
+                    open_headings.pop()
+                if level in (3, 4):
+                    open_headings.append(len(headings))
+                headings.append([level, m.group(2).strip(), False])
+                continue
+        if ";" in line:
+            m = DT_LINE_RE.match(line)
+            if m:
+                term = m.group(1).strip()
+                if term:
+                    dt_terms.append(term)
+                    for i in open_headings:
+                        headings[i][2] = True
+                    open_headings.clear()
+                continue
+        if "'''" in line:
+            m = BOLD_ONLY_LINE_RE.match(line)
+            if m:
+                bold_names.append(m.group(1).strip())
+    return SectionOutline([OutlineHeading(*h) for h in headings], dt_terms, bold_names)
+
+
 def _headings_with_dt_in_body(section_wikitext: str) -> set[str]:
     """
     見出し直下の本文に定義リスト（; 行）が1行以上ある見出しのタイトルを返す。
     そのような見出しは「グループ見出し」とみなし、キャラ名としては出力しない（; 行のみから抽出する）。
     作品ごとの文言に依存しない汎用ルール。
     """
-    lines = section_wikitext.splitlines()
-    result: set[str] = set()
-    i = 0
-    while i < len(lines):
-        m = SECTION_HEADING_RE.match(lines[i])
-        if m:
-            level = len(m.group(1))
-            title = m.group(2).strip()
-            if level in (3, 4):
-                j = i + 1
-                while j < len(lines):
-                    next_m = SECTION_HEADING_RE.match(lines[j])
-                    if next_m and len(next_m.group(1)) <= level:
-                        break
-                    dt_m = DT_LINE_RE.match(lines[j])
-                    if dt_m and dt_m.group(1).strip():
-                        result.add(title)
-                        break
-                    j += 1
-            i += 1
-        else:
-            i += 1
-    return result
+    return {h.title for h in section_outline(section_wikitext).headings if h.has_dt}
+
+
+# 見出し・用語の名前は短く、ほとんどが平文と [[リンク]] と <ref> だけなので、その形に限って正規表現で読む。
+# 読めない形（テンプレート・コメント・強調・実体参照など）は mwparserfromhell に回す。
+# <ref name="x" /> と、中に別のタグを含まない <ref>...</ref>
+_REF_TAG_RE = re.compile(r"<ref(?:\s[^<>]*?)?(?:/>|>[^<]*</ref>)")
+# [[タイトル]] / [[タイトル|表示名]]。タイトルに使えない文字を含むものはマッチさせない
+_WIKILINK_RE = re.compile(r"\[\[([^\[\]{}<>|\n]+)(?:\|([^\[\]{}<>\n]*))?\]\]")
+# リンクの外・中にあれば mwparserfromhell に回す文字列
+_UNSCANNABLE_RE = re.compile(r"[<>\[\]{}&\n]|''|://|__|~~~")
+# 先頭にあるとリスト・見出し・水平線などとして読まれる記号
+_LINE_MARKUP_STARTS = (";", ":", "*", "#", "=", "-", " ")
+# 行頭の "="。見出しとして読めなかった行が無いかを数えるのに使う
+_LINE_START_EQ_RE = re.compile(r"^=", re.MULTILINE)
+# splitlines() が "\n" 以外で区切る文字（単独の \r など）。あると section_outline と mwparserfromhell で行が食い違う
+_OTHER_LINE_BREAK_RE = re.compile(r"\r(?!\n)|[\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+# コメント・中身を構文解析しないタグ・行をまたぐタグ。この中の見出しらしい行は mwparserfromhell では見出しにならない
+_UNPARSED_BLOCK_RE = re.compile(r"<!--|<(?:%s)\b|<[^>\n]*\n" % "|".join(PARSER_BLACKLIST), re.IGNORECASE)
+# リンク先から除く名前空間
+_NON_MAIN_PREFIXES = frozenset({
+    "Category", "File", "Image", "Wikipedia", "Template", "Help", "Portal", "Draft", "User", "Talk", "WP",
+})
+
+
+def _scan_ref_tags(wikitext: str) -> str | None:
+    """<ref> を取り除いて strip した文字列。ほかのタグやコメントが残るときは None。"""
+    if "<" not in wikitext:
+        return wikitext.strip()
+    stripped = _REF_TAG_RE.sub("", wikitext)
+    if "<" in stripped or ">" in stripped:
+        return None
+    return stripped.strip()
+
+
+def _scan_name_parts(s: str) -> tuple[str, list[str]] | None:
+    """
+    _name_parts の軽量版。平文・[[リンク]]・[[リンク|表示名]]・<ref> 以外を含むときは None。
+    """
+    s = _scan_ref_tags(s)
+    if s is None or s.startswith(_LINE_MARKUP_STARTS):
+        return None
+    if "[" not in s:
+        return None if _UNSCANNABLE_RE.search(s) else (s, [])
+    pieces: list[str] = []
+    titles: list[str] = []
+    pos = 0
+    for m in _WIKILINK_RE.finditer(s):
+        title, text = m.group(1), m.group(2)
+        # "mailto:" などの URI スキームで始まると外部リンクとして読まれるので、名前空間付きはまとめて任せる
+        if not title.strip() or ":" in title:
+            return None
+        pieces.append(s[pos:m.start()])
+        pieces.append(title if text is None else text)
+        titles.append(title.strip())
+        pos = m.end()
+    pieces.append(s[pos:])
+    if _UNSCANNABLE_RE.search("".join(pieces + titles)):
+        return None
+    return "".join(pieces), titles
+
+
+def _parse_name_parts(s: str) -> tuple[str, list[str]]:
+    """_name_parts の mwparserfromhell 版。"""
+    parsed = mwparserfromhell.parse(_strip_ref_tags(s))
+    titles = [
+        node.title.strip_code().strip()
+        for node in parsed.filter_wikilinks()
+        if isinstance(node, mwparserfromhell.nodes.Wikilink)
+    ]
+    return parsed.strip_code(), titles
+
+
+def _name_parts(s: str) -> tuple[str, list[str]]:
+    """
+    見出し/用語から <ref> を除き、strip_code した平文とリンク先タイトルの列（出現順）を返す。
+    軽量スキャナで読めるものはそれで読み、読めないものだけ mwparserfromhell で構文解析する。
+    """
+    parts = _scan_name_parts(s)
+    if parts is None:
+        parts = _parse_name_parts(s)
+    return parts
 
 
 def _strip_ref_tags(wikitext: str) -> str:
@@ -130,6 +269,9 @@ def _strip_ref_tags(wikitext: str) -> str:
     レンダリング後の HTML の <sup class="reference"> はウィキテキストでは <ref> になる。
     出典番号・説明文をキャラ名から除外するため、ref タグごと除去する。
     """
+    stripped = _scan_ref_tags(wikitext)
+    if stripped is not None:
+        return stripped
     parsed = mwparserfromhell.parse(wikitext)
     for tag in list(parsed.filter_tags()):
         if tag.tag == 'ref':
@@ -137,6 +279,31 @@ def _strip_ref_tags(wikitext: str) -> str:
     return str(parsed).strip()
 
 
+def _has_multiline_braces(wikitext: str) -> bool:
+    """{ と } の数が合わない行があるか（行をまたぐテンプレート・引数・表）。"""
+    if "{" not in wikitext and "}" not in wikitext:
+        return False
+    return any(line.count("{") != line.count("}") for line in wikitext.split("\n"))
+
+
+def _section_headings(section_wikitext: str, outline: SectionOutline) -> list[tuple[int, str]]:
+    """
+    セクション内の見出しの (レベル, タイトル) の列。
+    行頭が "=" の行がすべて見出しとして読め、見出しらしい行を見出しでなくしうるもの（コメント、構文解析しないタグ、
+    行をまたぐタグ・テンプレート、"\n" 以外の改行）も無ければ outline の見出しをそのまま使う。
+    そうでなければ mwparserfromhell で構文解析する。
+    """
+    if (
+        len(outline.headings) == len(_LINE_START_EQ_RE.findall(section_wikitext))
+        and not _UNPARSED_BLOCK_RE.search(section_wikitext)
+        and not _OTHER_LINE_BREAK_RE.search(section_wikitext)
+        and not _has_multiline_braces(section_wikitext)
+    ):
+        return [(h.level, h.title) for h in outline.headings]
+    parsed = mwparserfromhell.parse(section_wikitext)
+    return [(h.level, str(h.title).strip()) for h in parsed.filter_headings()]
+
+
 def _heading_title_to_name(heading_title: str) -> str | None:
     """
     見出し/用語（例: "おこりや長介（[[いかりや長介]]）" や "[[志村ケン太]]"）から
@@ -148,23 +315,16 @@ def _heading_title_to_name(heading_title: str) -> str | None:
     s = heading_title.strip()
     if not s:
         return None
-    s = _strip_ref_tags(s)
-    if not s:
-        return None
-    parsed = mwparserfromhell.parse(s)
+    plain, link_titles = _name_parts(s)
     # まず括弧前のテキストをキャラ名候補とする（「キャラ名（モデル名）」でモデルだけリンクの記事で正しくキャラ名を取る）
-    plain = parsed.strip_code().strip()
-    plain_before_paren = READING_PAREN_RE.sub("", plain).strip()
+    plain_before_paren = READING_PAREN_RE.sub("", plain.strip()).strip()
     if plain_before_paren and not _is_likely_group_heading(plain_before_paren):
         return plain_before_paren.replace(" ", "_")
     # 括弧前が空またはグループ見出しのときのみ、リンク先を採用（例: 見出しが [[志村ケン太]] のみ）
-    for node in parsed.filter_wikilinks():
-        if not isinstance(node, mwparserfromhell.nodes.Wikilink):
-            continue
-        title = node.title.strip_code().strip()
+    for title in link_titles:
         if ":" in title:
             prefix = title.split(":", 1)[0].strip()
-            if prefix in ("Category", "File", "Image", "Wikipedia", "Template", "Help", "Portal", "Draft", "User", "Talk", "WP"):
+            if prefix in _NON_MAIN_PREFIXES:
                 continue
         name = _normalize_title(title)
         if name and not _is_likely_group_heading(title):
@@ -182,14 +342,12 @@ def extract_character_names_from_toujo_section(section_wikitext: str) -> Iterato
     キャラ名としては出力しない（; 行のみから抽出）。作品ごとの文言に依存しない。
     """
     seen: set[str] = set()
-    headings_with_dt = _headings_with_dt_in_body(section_wikitext)
-    parsed = mwparserfromhell.parse(section_wikitext)
+    outline = section_outline(section_wikitext)
+    headings_with_dt = {h.title for h in outline.headings if h.has_dt}
     # (1) 見出し（=== / ====）から（直下に ; 行がある見出しはスキップ）
-    for heading in parsed.filter_headings():
-        level = heading.level
+    for level, title in _section_headings(section_wikitext, outline):
         if level < 3 or level > 4:
             continue
-        title = str(heading.title).strip()
         if title in headings_with_dt:
             continue
         name = _heading_title_to_name(title)
@@ -197,23 +355,13 @@ def extract_character_names_from_toujo_section(section_wikitext: str) -> Iterato
             seen.add(name)
             yield name
     # (2) 定義リストの用語（; 虎杖 悠仁（いたどり ゆうじ））から
-    for line in section_wikitext.splitlines():
-        m = DT_LINE_RE.match(line)
-        if not m:
-            continue
-        term = m.group(1).strip()
-        if not term:
-            continue
+    for term in outline.dt_terms:
         name = _heading_title_to_name(term)
         if name and name not in seen:
             seen.add(name)
             yield name
     # (3) 行全体が「'''名前'''」または「'''名前'''（読み）」の形（寄生獣など ; を使わない記事用）
-    for line in section_wikitext.splitlines():
-        m = BOLD_ONLY_LINE_RE.match(line)
-        if not m:
-            continue
-        raw_name = m.group(1).strip()
+    for raw_name in outline.bold_names:
         if not raw_name:
             continue
         name = raw_name.replace(" ", "_")
@@ -237,7 +385,7 @@ def extract_links_from_wikitext(wikitext: str) -> Iterator[str]:
             continue
         if ":" in title:
             prefix = title.split(":", 1)[0].strip()
-            if prefix in ("Category", "File", "Image", "Wikipedia", "Template", "Help", "Portal", "Draft", "User", "Talk", "WP"):
+            if prefix in _NON_MAIN_PREFIXES:
                 continue
         if "#" in title:
             title = title.split("#", 1)[0].strip()
@@ -0,0 +1,138 @@
+"""
+SQL ダンプの解析結果を再利用するためのキャッシュ（バイナリファイル）。
+
+キャッシュファイル名は、入力ダンプのキー（名前・サイズ・更新時刻・先頭 1MB の SHA-1）と解析パラメータから決める。
+ダンプが差し替わればキーが変わるので、古いキャッシュは使われない。
+
+ファイル形式（リトルエンディアン）:
+- マジック b'WXSQLC' + バージョン（uint16）+ ヘッダ JSON の長さ（uint32）+ ヘッダ JSON
+- ヘッダの tables に並んだ順に各テーブルの本体（それぞれ 8 バイト境界から始まる）:
+  - set: page_id の int64 配列（昇順）
+  - map: wiki_extract.util.title_map の TitleMap 形式。読み込み時はファイルを mmap して TitleMap で返す
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+
+from wiki_extract.util.title_map import TitleMap, _int64_bytes, _int64_view
+
+SQL_CACHE_VERSION = 2
+
+_MAGIC = b'WXSQLC'
+_PREAMBLE = struct.Struct('<6sHI')
+_HEADER_HASH_BYTES = 1024 * 1024
+
+
+def dump_key(path: Path) -> dict:
+    """ダンプの同一性判定用: 名前・サイズ・更新時刻（ns）・先頭 1MB の SHA-1。"""
+    path = Path(path)
+    st = path.stat()
+    with open(path, 'rb') as f:
+        head = hashlib.sha1(f.read(_HEADER_HASH_BYTES)).hexdigest()
+    return {'name': path.name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'head_sha1': head}
+
+
+def mapping_digest(mapping: dict[int, str]) -> str:
+    """id → タイトルの対応の内容ハッシュ（キャッシュのキーに入力の辞書を含めるときに使う）。"""
+    h = hashlib.sha1()
+    for key in sorted(mapping):
+        h.update(f'{key}\t{mapping[key]}\n'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def cache_path(cache_dir: Path, name: str, dumps: list[Path | None], params: dict | None = None) -> Path:
+    """name（'page' など）のキャッシュファイルのパス。dumps の None は「未使用」としてキーに含める。"""
+    key = {
+        'version': SQL_CACHE_VERSION,
+        'dumps': [dump_key(p) if p is not None else None for p in dumps],
+        'params': params or {},
+    }
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()[:20]
+    return Path(cache_dir) / f'{name}-{digest}.bin'
+
+
+def _padding(pos: int) -> bytes:
+    return b'\0' * (-pos % 8)
+
+
+def save_tables(
+    path: Path,
+    *,
+    maps: dict[str, Mapping] | None = None,
+    sets: dict[str, set[int]] | None = None,
+) -> None:
+    """id → タイトルの対応（maps。dict / TitleMap）と id 集合（sets）をキャッシュファイルに一時ファイル経由で保存する。"""
+    tables: list[dict] = []
+    bodies: list[bytes] = []
+    for name, mapping in (maps or {}).items():
+        if not isinstance(mapping, TitleMap):
+            mapping = TitleMap.from_items(mapping.items())
+        body = mapping.encode()
+        tables.append({'name': name, 'kind': 'map', 'bytes': len(body)})
+        bodies.append(body)
+    for name, values in (sets or {}).items():
+        ids = sorted(values)
+        tables.append({'name': name, 'kind': 'set', 'count': len(ids)})
+        bodies.append(_int64_bytes(ids))
+    header = json.dumps({'tables': tables}).encode('utf-8')
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(_MAGIC, SQL_CACHE_VERSION, len(header)))
+        f.write(header)
+        pos = _PREAMBLE.size + len(header)
+        for body in bodies:
+            pad = _padding(pos)
+            f.write(pad)
+            f.write(body)
+            pos += len(pad) + len(body)
+    os.replace(tmp, path)
+
+
+def load_tables(path: Path) -> tuple[dict[str, TitleMap], dict[str, set[int]]] | None:
+    """
+    save_tables で保存したキャッシュを (maps, sets) で読む。maps はファイルを mmap した TitleMap。
+    無い・壊れている・バージョン違いなら None。
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _PREAMBLE.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    data = memoryview(mm)
+    try:
+        magic, version, header_len = _PREAMBLE.unpack_from(data, 0)
+        if magic != _MAGIC or version != SQL_CACHE_VERSION:
+            return None
+        pos = _PREAMBLE.size
+        header = json.loads(bytes(data[pos:pos + header_len]).decode('utf-8'))
+        pos += header_len
+        maps: dict[str, TitleMap] = {}
+        sets: dict[str, set[int]] = {}
+        for table in header['tables']:
+            pos += -pos % 8
+            if table['kind'] == 'set':
+                count = int(table['count'])
+                if pos + 8 * count > len(data):
+                    return None
+                sets[table['name']] = set(_int64_view(data[pos:pos + 8 * count]))
+                pos += 8 * count
+                continue
+            size = int(table['bytes'])
+            if pos + size > len(data):
+                return None
+            maps[table['name']] = TitleMap.from_buffer(data[pos:pos + size])
+            pos += size
+        if pos != len(data):
+            return None
+    except (struct.error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return None
+    return maps, sets
@@ -1,60 +1,31 @@
 """
-「架空の人物」カテゴリ配下の page_id を取得する。
+「架空の人物」などの seed カテゴリ配下の page_id を取得する（複数の seed もダンプ 1 回の読込・1 回の走査で）。
 
 MediaWiki 1.45+ では categorylinks に cl_to がなく cl_target_id のみのため、
 linktarget で lt_id → カテゴリ名を解決する。page でカテゴリの page_id を取得する。
+カテゴリ名の正規化・逆引きは page のカテゴリから 1 回だけ作る TitleIndex（wiki_extract.extract.titles）で行う。
 """
 
-import gzip
-import re
-import unicodedata
+from array import array
 from collections import Counter
-from contextlib import contextmanager
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Iterator, Optional, TextIO, Union
+from typing import Callable, Hashable, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
 
-from mwsql import Dump
-
-from wiki_extract.util.log import log_progress, Timer
+from wiki_extract.extract.sql_cache import cache_path, load_tables, mapping_digest, save_tables
+from wiki_extract.extract.sql_dump import SqlDumpReader
+from wiki_extract.extract.titles import TitleIndex, canonical_title, normalize_title
+from wiki_extract.util.log import log, log_progress, Timer
 
 NS_CATEGORY = 14
 
 CATEGORY_FICTIONAL = "架空の人物"
 
-
-@contextmanager
-def _open_file_utf8_replace(
-    file_path: Union[str, Path], encoding: Optional[str] = None
-) -> Iterator[TextIO]:
-    enc = encoding or 'utf-8'
-    if str(file_path).endswith('.gz'):
-        infile = gzip.open(file_path, mode='rt', encoding=enc, errors='replace')
-    else:
-        infile = open(file_path, mode='r', encoding=enc, errors='replace')
-    try:
-        yield infile
-    finally:
-        infile.close()
-
-
-def _normalize_title(s: str) -> str:
-    """MediaWiki タイトル: 空白・全角スペースをアンダースコアに、NFKC 正規化。"""
-    if s is None:
-        return ""
-    t = unicodedata.normalize('NFKC', str(s) or "")
-    return re.sub(r'[\s\u3000]+', '_', t).strip().strip('_')
-
-
-def _canonical_title(s: str) -> str:
-    """
-    比較用: NFKC 正規化し、書式・制御文字（ゼロ幅スペース等）を除去し、
-    空白・アンダースコア・全角スペースを除去。
-    """
-    if s is None:
-        return ""
-    t = unicodedata.normalize('NFKC', str(s) or "")
-    t = ''.join(c for c in t if unicodedata.category(c) not in ('Cf', 'Cc'))
-    return re.sub(r'[\s_\u3000]+', '', t)
+# cl_type の値（文字列、または MediaWiki の定数 page=0, subcat=1 の数値）
+_CL_TYPE_PAGE = frozenset({'page', '0'})
+_CL_TYPE_SUBCAT = frozenset({'subcat', '1'})
+_CL_TYPE_ALL = _CL_TYPE_PAGE | _CL_TYPE_SUBCAT
+_NS_CATEGORY_VALUE = str(NS_CATEGORY)
 
 
 def _is_garbage_linktarget_title(title: str) -> bool:
@@ -70,289 +41,459 @@ def _is_garbage_linktarget_title(title: str) -> bool:
     return False
 
 
-def _build_category_set(
+class ClosureStats(NamedTuple):
+    """カテゴリ閉包の統計（seed ごと）。"""
+
+    seed: str
+    # 閉包に含まれるカテゴリ数（seed を含む）
+    nodes: int
+    # seed からの最大の深さ（seed だけなら 0）
+    depth: int
+    # たどった親→子の辺の数
+    edges: int
+    # 既に訪れた、同じか浅い深さのカテゴリへ戻る辺の数（循環の候補。自己ループも含む）
+    back_edges: int
+
+
+def _bits(mask: int) -> Iterator[int]:
+    """ビットマスクの立っているビットの位置を小さい順に返す。"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _closures(
+    children_of: Callable[[Hashable], Iterable[Hashable]],
+    seeds: Sequence[Optional[Hashable]],
+    seed_names: Sequence[str],
+) -> tuple[dict[Hashable, int], list[Optional[ClosureStats]]]:
+    """
+    children_of（親 → 子）を全 seed から同時に幅優先でたどる。返り値はカテゴリ → 到達した seed のビットマスク
+    （i 番目の seed がビット i）と seed ごとの統計。seeds の None はたどらない（統計も None）。
+    各カテゴリは新しい seed が届いた段でだけ展開するので、循環があっても (カテゴリ, seed) ごとに 1 回しか訪れない。
+    """
+    n = len(seeds)
+    frontier: dict[Hashable, int] = {}
+    for i, seed in enumerate(seeds):
+        if seed is not None:
+            frontier[seed] = frontier.get(seed, 0) | (1 << i)
+    # mask は直前の段までに届いた seed（同じか浅い深さ）
+    mask = dict(frontier)
+    depth = [0] * n
+    edges = [0] * n
+    back_edges = [0] * n
+    level = 0
+    while frontier:
+        reached: dict[Hashable, int] = {}
+        for parent, bits in frontier.items():
+            children = children_of(parent)
+            if not isinstance(children, (list, tuple)):
+                children = list(children)
+            for i in _bits(bits):
+                edges[i] += len(children)
+            for child in children:
+                have = mask.get(child, 0)
+                if bits & have:
+                    for i in _bits(bits & have):
+                        back_edges[i] += 1
+                new = bits & ~have
+                if new:
+                    reached[child] = reached.get(child, 0) | new
+        level += 1
+        for child, new in reached.items():
+            mask[child] = mask.get(child, 0) | new
+            for i in _bits(new):
+                depth[i] = level
+        frontier = reached
+
+    nodes = [0] * n
+    for bits in mask.values():
+        for i in _bits(bits):
+            nodes[i] += 1
+    stats = [
+        ClosureStats(seed_names[i], nodes[i], depth[i], edges[i], back_edges[i]) if seeds[i] is not None else None
+        for i in range(n)
+    ]
+    return mask, stats
+
+
+def _build_category_sets(
     subcat_rows: list[tuple[int, str]],
-    category_page_id_to_title: dict[int, str],
-    seed: str,
-) -> set[str]:
-    """固定点: seed 配下の全カテゴリ名。subcat_rows = (cl_from, 親カテゴリ名)。"""
-    seed_n = _normalize_title(seed)
-    c: set[str] = {seed_n}
-    prev_size = 0
-    while len(c) > prev_size:
-        prev_size = len(c)
-        for cl_from, cl_to in subcat_rows:
-            cl_to_n = _normalize_title(cl_to)
-            if cl_to_n not in c:
-                continue
-            title = category_page_id_to_title.get(cl_from)
-            if title:
-                c.add(_normalize_title(title))
-    return c
+    categories: Union[TitleIndex, Mapping[int, str]],
+    seeds: Sequence[Optional[str]],
+) -> tuple[dict[str, int], list[Optional[ClosureStats]]]:
+    """
+    全 seed 配下のカテゴリ名 → seed のビットマスクと閉包の統計（1 回の走査）。
+    subcat_rows = (cl_from, 正規化済みの親カテゴリ名)。seeds の None はたどらない。
+    categories はカテゴリの page_id → タイトル（TitleIndex なら正規化済みのタイトルをそのまま使う）。
+    """
+    seeds_n = [normalize_title(seed) if seed is not None else None for seed in seeds]
+    titles = TitleIndex.of(categories).titles
+    children_ids: dict[str, list[int]] = {}
+    for cl_from, cl_to in subcat_rows:
+        children_ids.setdefault(cl_to, []).append(cl_from)
+
+    def _children_of(parent: str) -> list[str]:
+        return [title for title in map(titles.get, children_ids.get(parent, ())) if title]
 
+    return _closures(_children_of, seeds_n, [s or '' for s in seeds_n])
 
-def _build_category_page_id_set(
+
+def _build_category_page_id_sets(
     subcat_rows_by_lt: list[tuple[int, int]],
     lt_id_to_page_id: dict[int, int],
-    seed_page_id: int,
-) -> set[int]:
+    seed_page_ids: Sequence[Optional[int]],
+    seeds: Sequence[str],
+) -> tuple[dict[int, int], list[Optional[ClosureStats]]]:
     """
-    固定点: seed_page_id 配下の全カテゴリの page_id。
-    subcat_rows_by_lt = (cl_from=サブカテゴリの page_id, cl_target_id=親の lt_id)。
+    全 seed 配下のカテゴリの page_id → seed のビットマスクと閉包の統計（1 回の走査）。
+    subcat_rows_by_lt = (cl_from=サブカテゴリの page_id, cl_target_id=親の lt_id)。seed_page_ids の None はたどらない。
     """
-    c: set[int] = {seed_page_id}
-    prev_size = 0
-    while len(c) > prev_size:
-        prev_size = len(c)
-        for cl_from, parent_lt_id in subcat_rows_by_lt:
-            parent_page_id = lt_id_to_page_id.get(parent_lt_id)
-            if parent_page_id not in c:
-                continue
-            c.add(cl_from)
-    return c
+    children: dict[int, list[int]] = {}
+    for cl_from, parent_lt_id in subcat_rows_by_lt:
+        parent_page_id = lt_id_to_page_id.get(parent_lt_id)
+        if parent_page_id is not None:
+            children.setdefault(parent_page_id, []).append(cl_from)
+    return _closures(lambda parent: children.get(parent, ()), seed_page_ids, [normalize_title(s) for s in seeds])
 
 
 def _resolve_seed_page_id(
     seed: str,
-    category_page_id_to_title: dict[int, str],
+    categories: Union[TitleIndex, Mapping[int, str]],
 ) -> int | None:
     """
-    page テーブルから seed に正規化一致するカテゴリの page_id を返す。
-    完全一致が無い場合、seed で始まる最短のカテゴリ名を候補に採用する。
+    page テーブルから seed に正規化一致（比較用タイトルが一致）するカテゴリの page_id を返す。
+    同じ比較用タイトルのカテゴリが複数あれば page_id の並びで最初のもの。
     """
-    want = _canonical_title(seed)
-    for pid, title in category_page_id_to_title.items():
-        if _canonical_title(title) == want:
-            return pid
-    # 根カテゴリがダンプに無い場合: seed で始まる最短のカテゴリ名を候補にする（長さが一致すれば採用）
-    candidates = [
-        (pid, title)
-        for pid, title in category_page_id_to_title.items()
-        if _canonical_title(title).startswith(want) and len(_canonical_title(title)) >= len(want)
-    ]
-    if not candidates:
-        return None
-    best = min(candidates, key=lambda x: len(_canonical_title(x[1])))
-    if len(_canonical_title(best[1])) == len(want):
-        return best[0]
-    return None
+    return TitleIndex.of(categories).canonical_page_id(seed)
 
 
-def _load_linktarget_category_titles(
+def load_linktarget_category_titles(
     linktarget_path: Path,
     *,
     seed_titles: Optional[list[str]] = None,
     log_progress_fn: bool = True,
+    decompress: Optional[str] = None,
 ) -> dict[int, str]:
     """
     linktarget ダンプから ns=14 の行を読み、lt_id → 正規化タイトル を返す。
     seed_titles を渡すと、行内のいずれかの列がそのタイトルに正規化一致すれば採用する
-    （パースずれ・列ずれ対策）。
+    （パースずれ・列ずれ対策）。decompress は decompress.open_dump の展開方法。
     """
-    import mwsql.dump as _mwsql_dump
-    _orig_open = _mwsql_dump._open_file
-    _mwsql_dump._open_file = _open_file_utf8_replace
     seed_canonicals = (
-        {_canonical_title(s) for s in (seed_titles or [])} if seed_titles else set()
+        {canonical_title(s) for s in (seed_titles or [])} if seed_titles else set()
     )
-    try:
-        dump = Dump.from_file(str(linktarget_path))
-        col = dump.col_names
+    with SqlDumpReader(linktarget_path, decompress=decompress) as dump:
+        col = dump.columns
         idx_id = col.index('lt_id') if 'lt_id' in col else 0
         idx_ns = col.index('lt_namespace') if 'lt_namespace' in col else 1
         idx_title = col.index('lt_title') if 'lt_title' in col else 2
         out: dict[int, str] = {}
-        for row in dump.rows(convert_dtypes=False):
-            if len(row) <= max(idx_id, idx_ns, idx_title):
-                continue
-            lt_id, lt_ns, lt_title = row[idx_id], row[idx_ns], row[idx_title]
-            try:
-                ns = int(lt_ns) if lt_ns is not None else -1
-            except (TypeError, ValueError):
-                continue
-            if ns != NS_CATEGORY:
-                continue
+        rows = dump.rows((idx_id, idx_title), where={idx_ns: _NS_CATEGORY_VALUE.__eq__})
+        for lt_id, lt_title in rows:
             raw = str(lt_title) if lt_title else ''
             if not _is_garbage_linktarget_title(raw):
-                out[int(lt_id)] = _normalize_title(raw)
+                out[int(lt_id)] = normalize_title(raw)
                 continue
             if seed_canonicals:
-                for i, cell in enumerate((row[idx_id], row[idx_ns], row[idx_title])):
-                    if i == 1:
-                        continue
+                for cell in (lt_id, lt_title):
                     cell_str = str(cell or '').strip()
-                    if _canonical_title(cell_str) in seed_canonicals:
-                        out[int(lt_id)] = _normalize_title(cell_str)
+                    if canonical_title(cell_str) in seed_canonicals:
+                        out[int(lt_id)] = normalize_title(cell_str)
                         break
         if log_progress_fn:
             log_progress("linktarget: カテゴリタイトル読込済", count=len(out))
         return out
-    finally:
-        _mwsql_dump._open_file = _orig_open
 
 
-def run_categorylinks(
+def _uses_linktarget(columns: list[str], linktarget_path: Optional[Path]) -> bool:
+    """categorylinks の列から 1.45+ 形式（cl_target_id を linktarget で解決する）か判定する。"""
+    if 'cl_to' in columns:
+        return False
+    if 'cl_target_id' not in columns or linktarget_path is None:
+        raise FileNotFoundError(
+            "categorylinks に cl_to がありません（MediaWiki 1.45+ 形式）。"
+            " jawiki-latest-linktarget.sql.gz が必要です。"
+            " ホストで download.ps1 または download.sh を実行し ./dumps に配置してから、コンテナを再実行してください。"
+        )
+    return True
+
+
+def categorylinks_uses_linktarget(
     categorylinks_path: Path,
-    category_page_id_to_title: dict[int, str],
+    linktarget_path: Optional[Path],
     *,
-    linktarget_path: Optional[Path] = None,
-    log_progress_fn: bool = True,
-) -> set[int]:
+    decompress: Optional[str] = None,
+) -> bool:
     """
-    「架空の人物」カテゴリ配下の page_id を集める。
-    MediaWiki 1.45+ のダンプ（cl_to なし）の場合は linktarget_path が必須。
+    categorylinks ダンプの CREATE TABLE だけを読み、linktarget が要るか（1.45+ 形式か）を返す。
+    要るのに linktarget_path が無ければ FileNotFoundError。
+    """
+    with SqlDumpReader(categorylinks_path, decompress=decompress) as dump:
+        return _uses_linktarget(dump.columns, linktarget_path)
+
+
+class CategorylinksScan(NamedTuple):
+    """
+    categorylinks を 1 回読んだ結果（page / linktarget の結果を待たずに作れる部分）。
+    所属先は 1.45+ 形式なら cl_target_id、cl_to 形式なら target_names の通し番号。
     """
-    import mwsql.dump as _mwsql_dump
-    _orig_open = _mwsql_dump._open_file
-    _mwsql_dump._open_file = _open_file_utf8_replace
-    try:
-        with Timer() as timer:
-            if log_progress_fn:
-                log_progress("categorylinks: ダンプ読込", elapsed=timer.elapsed)
-            dump = Dump.from_file(str(categorylinks_path))
-            col = dump.col_names
-            use_cl_to = 'cl_to' in col
-            idx_from = col.index('cl_from') if 'cl_from' in col else 0
-            idx_type = col.index('cl_type') if 'cl_type' in col else 5
+
+    use_cl_to: bool
+    # サブカテゴリの辺 (cl_from=サブカテゴリの page_id, 所属先)
+    subcat_edges: list[tuple[int, int]]
+    # page の所属（同じ位置が 1 組）
+    page_from: array
+    page_target: array
+    # cl_to 形式: 通し番号 → 生のカテゴリ名
+    target_names: list[str]
+
+
+def scan_categorylinks(dump: SqlDumpReader, *, log_progress_fn: bool = True) -> CategorylinksScan:
+    """
+    開いた categorylinks ダンプの行を 1 回だけ読み、サブカテゴリの辺はリストに、
+    page の所属は (cl_from, 所属先) の組として array('i') 2 本に溜める。
+    cl_to 形式ではカテゴリ名に通し番号を振る（同じ名前の正規化は後で 1 回で済む）。
+    """
+    with Timer() as timer:
+        if log_progress_fn:
+            log_progress("categorylinks: ダンプ読込", elapsed=timer.elapsed)
+        col = dump.columns
+        use_cl_to = 'cl_to' in col
+        idx_from = col.index('cl_from') if 'cl_from' in col else 0
+        idx_type = col.index('cl_type') if 'cl_type' in col else 5
+        idx_target = col.index('cl_to') if use_cl_to else col.index('cl_target_id')
+
+        subcat_edges: list[tuple[int, int]] = []
+        page_from = array('i')
+        page_target = array('i')
+        target_index: dict[str, int] = {}
+        rows = dump.rows(
+            (idx_from, idx_target, idx_type),
+            where={idx_type: _CL_TYPE_ALL.__contains__},
+        )
+        for cl_from, target, cl_type in rows:
             if use_cl_to:
-                idx_to = col.index('cl_to')
-                idx_target = 0
-                target_id_to_title = {}
+                raw = target or ""
+                tid = target_index.get(raw)
+                if tid is None:
+                    tid = target_index[raw] = len(target_index)
             else:
-                idx_to = 0
-                if 'cl_target_id' not in col or linktarget_path is None:
-                    raise FileNotFoundError(
-                        "categorylinks に cl_to がありません（MediaWiki 1.45+ 形式）。"
-                        " jawiki-latest-linktarget.sql.gz が必要です。"
-                        " ホストで download.ps1 または download.sh を実行し ./dumps に配置してから、コンテナを再実行してください。"
-                    )
-                idx_target = col.index('cl_target_id')
-                if log_progress_fn:
-                    log_progress("categorylinks: linktarget 読込", elapsed=timer.elapsed)
-                target_id_to_title = _load_linktarget_category_titles(
-                    linktarget_path,
-                    seed_titles=[CATEGORY_FICTIONAL],
-                    log_progress_fn=log_progress_fn,
-                )
+                tid = int(target) if target else 0
+            if cl_type in _CL_TYPE_SUBCAT:
+                subcat_edges.append((int(cl_from), tid))
+            else:
+                page_from.append(int(cl_from))
+                page_target.append(tid)
+        if log_progress_fn:
+            log_progress(
+                "categorylinks: 読込完了",
+                count=len(page_from) + len(subcat_edges),
+                elapsed=timer.elapsed,
+            )
+    return CategorylinksScan(use_cl_to, subcat_edges, page_from, page_target, list(target_index))
 
-            subcat_rows: list[tuple[int, str]] = []
-            subcat_rows_by_lt: list[tuple[int, int]] = []
-            fictional_ids: set[int] = set()
-            P_fictional = _resolve_seed_page_id(CATEGORY_FICTIONAL, category_page_id_to_title)
-
-            def _cl_type_is(s: object, want: str) -> bool:
-                """cl_type が文字列または数値で want と一致するか。"""
-                if s is None:
-                    return False
-                if isinstance(s, str):
-                    return s.strip() == want
-                # 数値の場合は MediaWiki の定数: page=0, subcat=1, file=2 の可能性
-                if want == "page":
-                    return s == 0 or str(s).strip() == "page"
-                if want == "subcat":
-                    return s == 1 or str(s).strip() == "subcat"
-                return str(s).strip() == want
-
-            n_cols = max(idx_from, idx_type, idx_to, idx_target)
-            # 第1パス: サブカテゴリ行を収集（cl_to の場合は名前、1.45+ の場合は (cl_from, cl_target_id)）
-            subcat_rows_by_lt: list[tuple[int, int]] = []
-            for row in dump.rows(convert_dtypes=True):
-                if len(row) <= n_cols:
-                    continue
-                cl_from = row[idx_from]
-                cl_type = row[idx_type]
-                if not _cl_type_is(cl_type, "subcat"):
-                    continue
-                if use_cl_to:
-                    cl_to_n = _normalize_title(str(row[idx_to]) if row[idx_to] else "")
-                    if cl_to_n:
-                        subcat_rows.append((cl_from, cl_to_n))
-                else:
-                    tid = row[idx_target]
-                    tid_int = int(tid) if tid is not None else 0
-                    cl_to_n = target_id_to_title.get(tid_int, "")
-                    if cl_to_n:
-                        subcat_rows.append((cl_from, cl_to_n))
-                    subcat_rows_by_lt.append((cl_from, tid_int))
-
-            if not use_cl_to:
-                # lt_id を category の page_id に対応させる（page のタイトル一致で対応）
-                category_title_to_page_id: dict[str, int] = {}
-                for pid, t in category_page_id_to_title.items():
-                    nt = _normalize_title(t)
-                    if nt and nt not in category_title_to_page_id:
-                        category_title_to_page_id[nt] = pid
-                lt_id_to_page_id: dict[int, int] = {}
-                for lt_id, title in target_id_to_title.items():
-                    pid = category_title_to_page_id.get(title)
-                    if pid is not None:
-                        lt_id_to_page_id[lt_id] = pid
-                # linktarget に無い lt_id をサブカテゴリ出現数から推定して補う
+
+def _seed_list(seeds: Iterable[str]) -> list[str]:
+    """seed の並びから重複を除く（順序は保つ）。空なら「架空の人物」だけ。"""
+    return list(dict.fromkeys(seeds)) or [CATEGORY_FICTIONAL]
+
+
+def resolve_seed_page_ids(
+    scan: CategorylinksScan,
+    categories: Union[TitleIndex, Mapping[int, str]],
+    target_id_to_title: Optional[dict[int, str]] = None,
+    *,
+    seeds: Iterable[str] = (CATEGORY_FICTIONAL,),
+    log_progress_fn: bool = True,
+) -> dict[str, set[int]]:
+    """
+    scan_categorylinks の結果から全 seed カテゴリの閉包をまとめて作り、seed → 配下の page_id を返す。
+    categories はカテゴリの page_id → タイトル（TitleIndex を渡せば作り直さない）。
+    1.45+ 形式では target_id_to_title（load_linktarget_category_titles の結果）が必須。
+    """
+    with Timer() as timer:
+        index = TitleIndex.of(categories)
+        seeds = _seed_list(seeds)
+        seeds_n = [normalize_title(seed) for seed in seeds]
+        seed_page_ids = [_resolve_seed_page_id(seed, index) for seed in seeds]
+        subcat_edges = scan.subcat_edges
+        if log_progress_fn:
+            log_progress(f"categorylinks: カテゴリ閉包構築（{', '.join(seeds)}）", elapsed=timer.elapsed)
+        # 所属先（cl_to の通し番号 / lt_id）→ seed のビットマスク
+        wanted: dict[int, int] = {}
+        if scan.use_cl_to:
+            target_titles = [normalize_title(raw) for raw in scan.target_names]
+            subcat_rows = [
+                (cl_from, target_titles[tid]) for cl_from, tid in subcat_edges if target_titles[tid]
+            ]
+            masks, stats = _build_category_sets(subcat_rows, index, seeds)
+            for tid, title in enumerate(target_titles):
+                bits = masks.get(title)
+                if bits:
+                    wanted[tid] = bits
+        else:
+            target_id_to_title = dict(target_id_to_title or {})
+            # lt_id を category の page_id に対応させる（page のタイトル一致で対応）
+            lt_id_to_page_id: dict[int, int] = {}
+            for lt_id, title in target_id_to_title.items():
+                pid = index.exact.get(title)
+                if pid is not None:
+                    lt_id_to_page_id[lt_id] = pid
+            # 架空の人物の lt_id が linktarget に無ければ、無い lt_id のうちサブカテゴリ出現数が最多のものを架空の人物とみなす
+            # （seed の並び順によらず、推定するのは架空の人物だけ）
+            fictional_n = normalize_title(CATEGORY_FICTIONAL)
+            if fictional_n in seeds_n and fictional_n not in target_id_to_title.values():
                 missing = {
-                    tid for (_, tid) in subcat_rows_by_lt
+                    tid for (_, tid) in subcat_edges
                     if tid and tid not in target_id_to_title
                 }
-                subcat_counts = Counter(tid for (_, tid) in subcat_rows_by_lt if tid)
+                subcat_counts = Counter(tid for (_, tid) in subcat_edges if tid)
                 best = max(
                     (m for m in missing if subcat_counts.get(m, 0) > 0),
                     key=lambda m: subcat_counts[m],
                     default=None,
                 )
                 if best is not None:
-                    target_id_to_title[best] = _normalize_title(CATEGORY_FICTIONAL)
-                    if P_fictional is not None:
-                        lt_id_to_page_id[best] = P_fictional
-                    for cl_from, tid in subcat_rows_by_lt:
-                        if tid == best:
-                            subcat_rows.append((cl_from, _normalize_title(CATEGORY_FICTIONAL)))
-
-            if log_progress_fn:
-                log_progress("categorylinks: 架空の人物カテゴリ構築", elapsed=timer.elapsed)
-            if use_cl_to:
-                c_fictional = _build_category_set(
-                    subcat_rows, category_page_id_to_title, _normalize_title(CATEGORY_FICTIONAL)
+                    target_id_to_title[best] = fictional_n
+                    fictional_page_id = seed_page_ids[seeds_n.index(fictional_n)]
+                    if fictional_page_id is not None:
+                        lt_id_to_page_id[best] = fictional_page_id
+
+            # page に seed のカテゴリがあるものは page_id のグラフで、無いものはカテゴリ名のグラフでたどる
+            stats = [None] * len(seeds)
+            if any(pid is not None for pid in seed_page_ids):
+                masks_by_id, stats_by_id = _build_category_page_id_sets(
+                    subcat_edges, lt_id_to_page_id, seed_page_ids, seeds
                 )
-                c_fictional_page_ids: set[int] = set()
-            else:
-                if P_fictional is not None:
-                    c_fictional_page_ids = _build_category_page_id_set(
-                        subcat_rows_by_lt, lt_id_to_page_id, P_fictional
-                    )
-                    c_fictional = set()
-                else:
-                    c_fictional_page_ids = set()
-                    c_fictional = _build_category_set(
-                        subcat_rows, category_page_id_to_title, _normalize_title(CATEGORY_FICTIONAL)
-                    )
-
-            if log_progress_fn:
-                log_progress("categorylinks: page_id 収集中", elapsed=timer.elapsed)
-            dump2 = Dump.from_file(str(categorylinks_path))
-            for row in dump2.rows(convert_dtypes=True):
-                if len(row) <= n_cols:
-                    continue
-                cl_from = row[idx_from]
-                cl_type = row[idx_type]
-                if not _cl_type_is(cl_type, "page"):
-                    continue
-                if use_cl_to:
-                    cl_to_n = _normalize_title(str(row[idx_to]) if row[idx_to] else "")
-                    if cl_to_n in c_fictional:
-                        fictional_ids.add(cl_from)
-                else:
-                    tid = row[idx_target]
-                    tid_int = int(tid) if tid is not None else 0
-                    if c_fictional_page_ids and lt_id_to_page_id.get(tid_int) in c_fictional_page_ids:
-                        fictional_ids.add(cl_from)
-                    elif c_fictional and target_id_to_title.get(tid_int) in c_fictional:
-                        fictional_ids.add(cl_from)
-
-            if log_progress_fn:
-                log_progress(
-                    "categorylinks: 完了",
-                    count=len(fictional_ids),
-                    elapsed=timer.elapsed,
+                stats = stats_by_id
+                for lt_id, pid in lt_id_to_page_id.items():
+                    bits = masks_by_id.get(pid)
+                    if bits:
+                        wanted[lt_id] = bits
+            unresolved = [seed if pid is None else None for seed, pid in zip(seeds, seed_page_ids)]
+            if any(seed is not None for seed in unresolved):
+                subcat_rows = [
+                    (cl_from, target_id_to_title[tid]) for cl_from, tid in subcat_edges
+                    if target_id_to_title.get(tid)
+                ]
+                masks_by_name, stats_by_name = _build_category_sets(subcat_rows, index, unresolved)
+                stats = [a if a is not None else b for a, b in zip(stats, stats_by_name)]
+                for lt_id, title in target_id_to_title.items():
+                    bits = masks_by_name.get(title)
+                    if bits:
+                        wanted[lt_id] = wanted.get(lt_id, 0) | bits
+
+        if log_progress_fn:
+            for st in stats:
+                log(
+                    f'  カテゴリ閉包 {st.seed}: カテゴリ数={st.nodes} 深さ={st.depth}'
+                    f' 辺={st.edges} 戻る辺={st.back_edges}'
                 )
-            return fictional_ids
-    finally:
-        _mwsql_dump._open_file = _orig_open
+            log_progress("categorylinks: page_id 収集中", elapsed=timer.elapsed)
+
+        found: list[set[int]] = [set() for _ in seeds]
+        if len(seeds) == 1:
+            found[0] = {cl_from for cl_from, tid in zip(scan.page_from, scan.page_target) if tid in wanted}
+        else:
+            get = wanted.get
+            for cl_from, tid in zip(scan.page_from, scan.page_target):
+                bits = get(tid)
+                if bits:
+                    for i in _bits(bits):
+                        found[i].add(cl_from)
+
+        if log_progress_fn:
+            log_progress(
+                "categorylinks: 完了",
+                count=len(set().union(*found)),
+                elapsed=timer.elapsed,
+            )
+        return dict(zip(seeds, found))
+
+
+def categorylinks_cache_file(
+    cache_dir: Path,
+    categorylinks_path: Path,
+    linktarget_path: Optional[Path],
+    category_page_id_to_title: Mapping[int, str],
+    seeds: Iterable[str] = (CATEGORY_FICTIONAL,),
+) -> Path:
+    """run_categorylinks の結果のキャッシュファイル（ダンプ・カテゴリ一覧の内容・seed で決まる）。"""
+    return cache_path(
+        cache_dir,
+        'categorylinks',
+        [categorylinks_path, linktarget_path],
+        {'seeds': _seed_list(seeds), 'categories': mapping_digest(category_page_id_to_title)},
+    )
+
+
+def load_cached_seed_page_ids(
+    cache_file: Path,
+    seeds: Iterable[str] = (CATEGORY_FICTIONAL,),
+    *,
+    log_progress_fn: bool = True,
+) -> Optional[dict[str, set[int]]]:
+    """categorylinks_cache_file のキャッシュがあれば seed → 配下の page_id を返す。無ければ None。"""
+    seeds = _seed_list(seeds)
+    cached = load_tables(cache_file)
+    if cached is None or not set(seeds) <= cached[1].keys():
+        return None
+    if log_progress_fn:
+        log_progress("categorylinks: キャッシュから読込", count=len(set().union(*(cached[1][s] for s in seeds))))
+    return {seed: cached[1][seed] for seed in seeds}
+
+
+def save_cached_seed_page_ids(cache_file: Path, seed_page_ids: dict[str, set[int]]) -> None:
+    """seed → 配下の page_id をキャッシュに保存する。"""
+    save_tables(cache_file, sets=seed_page_ids)
+
+
+def run_categorylinks(
+    categorylinks_path: Path,
+    category_page_id_to_title: Mapping[int, str],
+    *,
+    seeds: Iterable[str] = (CATEGORY_FICTIONAL,),
+    linktarget_path: Optional[Path] = None,
+    log_progress_fn: bool = True,
+    decompress: Optional[str] = None,
+    cache_dir: Optional[Path] = None,
+) -> dict[str, set[int]]:
+    """
+    seeds（既定は「架空の人物」だけ）の各カテゴリ配下の page_id を集め、seed → page_id 集合で返す。
+    ダンプは 1 回だけ読み、全 seed の閉包をまとめてたどる（categorylinks → linktarget → 閉包の順に 1 本で実行）。
+    MediaWiki 1.45+ のダンプ（cl_to なし）の場合は linktarget_path が必須。
+    decompress は decompress.open_dump の展開方法（None なら既定）。
+    cache_dir を渡すと、同じダンプ・同じカテゴリ一覧・同じ seed での結果をそこにキャッシュし、次回以降はダンプを読まない。
+    page / linktarget と並行に読む場合は sql_tables.run_sql_tables を使う。
+    """
+    seeds = _seed_list(seeds)
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = categorylinks_cache_file(
+            cache_dir, categorylinks_path, linktarget_path, category_page_id_to_title, seeds
+        )
+        cached = load_cached_seed_page_ids(cache_file, seeds, log_progress_fn=log_progress_fn)
+        if cached is not None:
+            return cached
+
+    with SqlDumpReader(categorylinks_path, decompress=decompress) as dump:
+        use_linktarget = _uses_linktarget(dump.columns, linktarget_path)
+        scan = scan_categorylinks(dump, log_progress_fn=log_progress_fn)
+    target_id_to_title = None
+    if use_linktarget:
+        if log_progress_fn:
+            log_progress("categorylinks: linktarget 読込")
+        target_id_to_title = load_linktarget_category_titles(
+            linktarget_path,
+            seed_titles=seeds,
+            log_progress_fn=log_progress_fn,
+            decompress=decompress,
+        )
+    seed_page_ids = resolve_seed_page_ids(
+        scan, category_page_id_to_title, target_id_to_title, seeds=seeds, log_progress_fn=log_progress_fn
+    )
+    if cache_file is not None:
+        save_cached_seed_page_ids(cache_file, seed_page_ids)
+    return seed_page_ids
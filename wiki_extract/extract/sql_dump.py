@@ -0,0 +1,273 @@
+"""
+mysqldump 形式の SQL ダンプ（CREATE TABLE と INSERT INTO ... VALUES (...),(...); の行）をストリームで読む。
+
+必要な列だけを取り出し（列の射影）、行の絞り込み条件（述語）を先に評価して、条件に合わない行は
+出力のタプルを作らずに読み飛ばす。
+
+INSERT 行の分解は 2 通り:
+- 高速経路: \\ と \' 以外のエスケープを str.replace で先に戻し、VALUES 以降を '),(' で区切って
+  csv モジュール（C 実装）でまとめて値に分ける。区切りが文字列の中に入っていた場合は行数・列数が合わなくなるので、
+  その行は正確な経路で読み直す（文字列 'NULL' や _binary 接頭辞を含む行も正確な経路）。
+  述語の列が行の最初の文字列リテラルより前にあれば（page の名前空間など）、csv に渡す前に区切った断片のまま
+  述語を評価し、合わない行は値のリストを作らずに捨てる。
+- 正確な経路: テーブルの列数から作った正規表現で 1 タプルずつ照合する。
+
+値は SQL の表記のまま文字列で返す: 文字列リテラルは引用符を外してエスケープを戻し、NULL は None、
+数値はそのままの文字列（int などへの変換は呼び出し側）。
+"""
+
+import csv
+import re
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence, Union
+
+from wiki_extract.extract.decompress import open_dump
+
+# 1 つの値: 文字列リテラル（バックスラッシュエスケープ、mysqldump の _binary 接頭辞付きも）または数値・NULL
+_STRING = r"'[^'\\]*(?:\\.[^'\\]*)*'"
+_VALUE = rf"(?:_binary )?(?:{_STRING}|[^,()']*)"
+_CAPTURED_VALUE = rf"(?:_binary )?({_STRING}|[^,()']*)"
+# 列数が合わないタプルを読み飛ばすための汎用パターン
+_ANY_TUPLE = re.compile(rf"\({_VALUE}(?:,{_VALUE})*\)", re.DOTALL)
+
+_CSV_FORMAT = {'delimiter': ',', 'quotechar': "'", 'escapechar': '\\', 'doublequote': False}
+
+_COLUMN_LINE = re.compile(r"\s*`([^`]+)`\s")
+_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+# 高速経路で \\ を一時的に退避する文字（行に含まれていれば高速経路を使わない）
+_BACKSLASH_PLACEHOLDER = '\ufffe'
+_FAST_ESCAPES = [('\\' + c, raw) for c, raw in _ESCAPES.items()] + [('\\"', '"')]
+
+Column = Union[str, int]
+
+
+def _unescape(match: re.Match) -> str:
+    c = match.group(1)
+    return _ESCAPES.get(c, c)
+
+
+def _decode(raw: str) -> Optional[str]:
+    """SQL の値の表記を文字列に戻す。NULL は None。"""
+    if raw.startswith("'"):
+        inner = raw[1:-1]
+        return _ESCAPE.sub(_unescape, inner) if '\\' in inner else inner
+    if raw == 'NULL':
+        return None
+    return raw
+
+
+def _count_values(line: str, pos: int) -> int:
+    """pos から始まるタプルの値の数（CREATE TABLE が無いダンプで列数を決めるため）。"""
+    m = _ANY_TUPLE.match(line, pos)
+    if m is None:
+        return 0
+    return len(re.findall(rf"(?:^|,)({_VALUE})", m.group(0)[1:-1]))
+
+
+def _split_line_fast(
+    line: str,
+    pos: int,
+    n_columns: int,
+    predicates: Sequence[tuple[int, Callable[[Optional[str]], bool]]] = (),
+) -> Optional[list[list[str]]]:
+    """
+    INSERT 行（pos は最初の '('）を csv で値のリストに分け、predicates（(列の位置, 述語)）がすべて真の行だけを返す。
+    NULL は 'NULL' のまま。述語の列が最初の文字列より前にある行は csv の前に断片のまま評価し、それ以外の行は分けてから評価する。
+    高速経路に使えない行・区切りが文字列の中に入っていた行は None（正確な経路で読む）。
+    """
+    end = line.rfind(')')
+    if end <= pos:
+        return None
+    body = line[pos + 1:end]
+    if "'NULL'" in body or '_binary ' in body:
+        return None
+    has_pairs = False
+    if '\\' in body:
+        if _BACKSLASH_PLACEHOLDER in body:
+            return None
+        has_pairs = '\\\\' in body
+        if has_pairs:
+            body = body.replace('\\\\', _BACKSLASH_PLACEHOLDER)
+        if body.count('\\') != body.count("\\'"):
+            for escaped, raw in _FAST_ESCAPES:
+                body = body.replace(escaped, raw)
+            if body.count('\\') != body.count("\\'"):
+                return None
+    pieces = body.split('),(')
+    undecided: list[int] = []
+    if predicates:
+        last = max(p for p, _ in predicates) + 1
+        kept: list[str] = []
+        for piece in pieces:
+            # 最初の引用符より前（数値と NULL だけの部分）に述語の列がすべて収まっていれば、その値で判定する
+            q = piece.find("'")
+            head = (piece if q < 0 else piece[:q]).split(',', last)
+            if len(head) <= last:
+                undecided.append(len(kept))
+                kept.append(piece)
+                continue
+            for p, pred in predicates:
+                value = head[p]
+                if not pred(None if value == 'NULL' else value):
+                    break
+            else:
+                kept.append(piece)
+                continue
+            # 捨てる断片が文字列の途中で切れたもの（引用符が奇数個）なら区切りを誤っているので正確な経路へ
+            quotes = piece.count("'")
+            if "\\'" in piece:
+                quotes -= piece.count("\\'")
+            if quotes % 2:
+                return None
+        pieces = kept
+    if has_pairs:
+        pieces = [piece.replace(_BACKSLASH_PLACEHOLDER, '\\\\') for piece in pieces]
+    try:
+        rows = list(csv.reader(pieces, **_CSV_FORMAT))
+    except csv.Error:
+        return None
+    if len(rows) != len(pieces) or (rows and set(map(len, rows)) != {n_columns}):
+        return None
+    if undecided:
+        drop = {
+            i for i in undecided
+            if not all(pred(None if (v := rows[i][p]) == 'NULL' else v) for p, pred in predicates)
+        }
+        if drop:
+            rows = [row for i, row in enumerate(rows) if i not in drop]
+    return rows
+
+
+class SqlDumpReader:
+    """
+    SQL ダンプを 1 回だけ先頭から読む。開いた時点で CREATE TABLE の列名を columns に読み込む。
+    decompress は decompress.open_dump の展開方法（None なら既定）で、呼び出しごとに指定する。
+
+        with SqlDumpReader(path) as dump:
+            for page_id, title in dump.rows(['page_id', 'page_title'], where={'page_namespace': {'0'}.__contains__}):
+                ...
+    """
+
+    def __init__(self, path: Union[str, Path], *, decompress: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self._f = open_dump(self.path, 'rt', encoding='utf-8', errors='replace', method=decompress)
+        self.columns: list[str] = []
+        # 列数が合わず読み飛ばしたタプルの数
+        self.skipped = 0
+        self._pending: Optional[str] = None
+        self._consumed = False
+        in_create = False
+        for line in self._f:
+            if line.startswith('INSERT INTO '):
+                self._pending = line
+                break
+            if line.startswith('CREATE TABLE '):
+                in_create = True
+                self.columns = []
+            elif in_create:
+                m = _COLUMN_LINE.match(line)
+                if m is not None:
+                    self.columns.append(m.group(1))
+                elif line.lstrip().startswith(')'):
+                    in_create = False
+
+    def index(self, column: Column) -> int:
+        """列名（または位置）を位置に変換する。無い列名は KeyError。"""
+        if isinstance(column, int):
+            return column
+        try:
+            return self.columns.index(column)
+        except ValueError:
+            raise KeyError(f'{self.path.name} に列 {column} がありません') from None
+
+    def _lines(self) -> Iterator[str]:
+        if self._pending is not None:
+            yield self._pending
+            self._pending = None
+        yield from self._f
+
+    def rows(
+        self,
+        columns: Sequence[Column],
+        *,
+        where: Optional[dict[Column, Callable[[Optional[str]], bool]]] = None,
+    ) -> Iterator[tuple[Optional[str], ...]]:
+        """
+        columns（列名または位置）の値のタプルを行ごとに返す。
+        where は {列: 述語} で、述語は値（rows が返すのと同じ文字列 / None）を受け取り、すべて真の行だけを返す。
+        """
+        if self._consumed:
+            raise RuntimeError(f'{self.path.name} の行は 1 回しか読めません')
+        positions = [self.index(c) for c in columns]
+        predicates = [(self.index(c), pred) for c, pred in (where or {}).items()]
+        self._consumed = True
+        return self._iter_rows(positions, predicates)
+
+    def _iter_rows(
+        self,
+        positions: list[int],
+        predicates: list[tuple[int, Callable[[Optional[str]], bool]]],
+    ) -> Iterator[tuple[Optional[str], ...]]:
+        n_columns = 0
+        tuple_re: Optional[re.Pattern] = None
+        out_groups: list[int] = []
+        pred_groups: list[tuple[int, Callable[[Optional[str]], bool]]] = []
+        for line in self._lines():
+            if not line.startswith('INSERT INTO '):
+                continue
+            pos = line.find('(', line.find(' VALUES '))
+            if tuple_re is None:
+                n_columns = len(self.columns) or _count_values(line, pos)
+                if n_columns == 0:
+                    continue
+                needed = sorted(set(positions) | {p for p, _ in predicates})
+                if needed and needed[-1] >= n_columns:
+                    raise KeyError(f'{self.path.name} の列は {n_columns} 個です: {needed[-1]}')
+                group_of = {p: i + 1 for i, p in enumerate(needed)}
+                tuple_re = re.compile(
+                    r'\('
+                    + ','.join(_CAPTURED_VALUE if i in group_of else _VALUE for i in range(n_columns))
+                    + r'\)',
+                    re.DOTALL,
+                )
+                out_groups = [group_of[p] for p in positions]
+                project = itemgetter(*positions) if len(positions) > 1 else lambda row: tuple([row[p] for p in positions])
+                pred_groups = [(group_of[p], pred) for p, pred in predicates]
+
+            rows = _split_line_fast(line, pos, n_columns, predicates)
+            if rows is not None:
+                if 'NULL' in line:
+                    for values in map(project, rows):
+                        yield tuple([None if v == 'NULL' else v for v in values])
+                else:
+                    yield from map(project, rows)
+                continue
+
+            match = tuple_re.match
+            end = len(line)
+            while 0 <= pos < end and line[pos] == '(':
+                m = match(line, pos)
+                if m is None:
+                    m = _ANY_TUPLE.match(line, pos)
+                    self.skipped += 1
+                    if m is None:
+                        break
+                    pos = m.end() + 1
+                    continue
+                pos = m.end() + 1
+                for group, pred in pred_groups:
+                    if not pred(_decode(m.group(group))):
+                        break
+                else:
+                    yield tuple([_decode(m.group(g)) for g in out_groups])
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> 'SqlDumpReader':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
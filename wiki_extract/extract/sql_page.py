@@ -3,68 +3,84 @@ page テーブルを読む: ns=0 の page_id→title、ns=14（カテゴリ）
 """
 
 import re
-import unicodedata
 from pathlib import Path
+from typing import Optional
 
-from mwsql import Dump
-
+from wiki_extract.extract.sql_cache import cache_path, load_tables, save_tables
+from wiki_extract.extract.sql_dump import SqlDumpReader
+from wiki_extract.extract.titles import normalize_title
+from wiki_extract.util.title_map import TitleMap, TitleMapBuilder
 from wiki_extract.util.log import log_progress, Timer
 
 
 NS_MAIN = 0
 NS_CATEGORY = 14
+# ダンプ上の名前空間の値（SqlDumpReader は値を文字列で返すので、読み飛ばしの判定は文字列のまま行う）
+_NS_MAIN_VALUE = str(NS_MAIN)
+_NAMESPACES = frozenset({_NS_MAIN_VALUE, str(NS_CATEGORY)})
 
 # 登場人物ページのタイトルパターン（MediaWiki ではアンダースコア、テスト等では「一覧」も）。
 # 例: "○○の登場人物"、"○○の登場人物一覧"、"○○の主要な登場人物" にマッチ。
 TOUJO_PATTERN = re.compile(r".+の.*登場人物(?:_一覧|一覧)?$")
 
 
-def _normalize_page_title(s: str) -> str:
-    """NFKC 正規化し、空白・全角スペースをアンダースコアに（ダンプの表記揺れ対策）。"""
-    if not s:
-        return ""
-    t = unicodedata.normalize('NFKC', str(s))
-    return re.sub(r'[\s\u3000]+', '_', t).strip().strip('_') or ""
-
-
 def run_page(
     page_path: Path,
     *,
     log_progress_fn: bool = True,
-) -> tuple[dict[int, str], dict[int, str], set[int]]:
+    decompress: Optional[str] = None,
+    cache_dir: Optional[Path] = None,
+) -> tuple[TitleMap, TitleMap, set[int]]:
     """
-    page ダンプを読む。返り値:
+    page ダンプを読む。返り値（対応表はコンパクトな読み取り専用の TitleMap）:
     - main_id_to_title: ns=0 の page_id → page_title
     - category_id_to_title: ns=14 の page_id → page_title
     - toujo_page_ids: *の…登場人物 や *の…登場人物一覧 のタイトルを持つページの page_id の集合（例: 主要な登場人物）
+    decompress は decompress.open_dump の展開方法（None なら既定）。
+    cache_dir を渡すと、同じダンプの解析結果をそこにキャッシュし、次回以降はダンプを読まない。
     """
-    with Timer() as timer:
+    cache_file = cache_path(cache_dir, 'page', [page_path]) if cache_dir is not None else None
+    if cache_file is not None:
+        cached = load_tables(cache_file)
+        if cached is not None and {'main', 'category'} <= cached[0].keys() and 'toujo' in cached[1]:
+            maps, sets = cached
+            if log_progress_fn:
+                log_progress('page: キャッシュから読込', count=len(maps['main']) + len(maps['category']))
+            return maps['main'], maps['category'], sets['toujo']
+
+    with Timer() as timer, SqlDumpReader(page_path, decompress=decompress) as dump:
         if log_progress_fn:
             log_progress("page: ダンプ読込", elapsed=timer.elapsed)
-        dump = Dump.from_file(str(page_path))
-        col = dump.col_names
+        col = dump.columns
         idx_id = col.index('page_id') if 'page_id' in col else 0
         idx_ns = col.index('page_namespace') if 'page_namespace' in col else 1
         idx_title = col.index('page_title') if 'page_title' in col else 2
-        main_id_to_title: dict[int, str] = {}
-        category_id_to_title: dict[int, str] = {}
+        main_titles = TitleMapBuilder()
+        category_titles = TitleMapBuilder()
         toujo_page_ids: set[int] = set()
         n_main = 0
         n_cat = 0
-        for row in dump.rows(convert_dtypes=True):
-            if len(row) <= max(idx_id, idx_ns, idx_title):
-                continue
-            page_id, page_namespace, page_title = row[idx_id], row[idx_ns], row[idx_title]
-            title = _normalize_page_title(page_title or "")
-            if page_namespace == NS_MAIN:
-                main_id_to_title[page_id] = title
+        rows = dump.rows((idx_id, idx_ns, idx_title), where={idx_ns: _NAMESPACES.__contains__})
+        for page_id, page_namespace, page_title in rows:
+            page_id = int(page_id)
+            title = normalize_title(page_title)
+            if page_namespace == _NS_MAIN_VALUE:
+                main_titles.add(page_id, title)
                 n_main += 1
                 if TOUJO_PATTERN.match(title):
                     toujo_page_ids.add(page_id)
-            elif page_namespace == NS_CATEGORY:
-                category_id_to_title[page_id] = title
+            else:
+                category_titles.add(page_id, title)
                 n_cat += 1
 
+    main_id_to_title = main_titles.build()
+    category_id_to_title = category_titles.build()
+    if cache_file is not None:
+        save_tables(
+            cache_file,
+            maps={'main': main_id_to_title, 'category': category_id_to_title},
+            sets={'toujo': toujo_page_ids},
+        )
     if log_progress_fn:
         log_progress(
             "page: 完了",
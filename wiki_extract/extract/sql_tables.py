@@ -0,0 +1,127 @@
+"""
+extract-pages の SQL 段: page / linktarget / categorylinks の 3 ダンプを並行に読み、対象判定に要る表を返す。
+
+依存関係（小さなタスクグラフ）:
+
+    page ─────────────┐
+    linktarget ───────┼─→ カテゴリ閉包 → seed カテゴリ（既定は「架空の人物」）ごとの配下の page_id
+    categorylinks 走査 ┘
+
+page と linktarget は互いに独立なので別プロセスで読み、その間に categorylinks をこのプロセスで走査する。
+categorylinks の走査は page / linktarget の結果を使わない（所属先を番号のまま溜める）ので、
+3 つの結果は閉包を作る段で初めて合流する。展開方法などの読み方は呼び出しごとに引数で渡す。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from wiki_extract.extract.sql_cache import cache_path
+from wiki_extract.extract.sql_categorylinks import (
+    CATEGORY_FICTIONAL,
+    categorylinks_cache_file,
+    categorylinks_uses_linktarget,
+    load_cached_seed_page_ids,
+    load_linktarget_category_titles,
+    resolve_seed_page_ids,
+    run_categorylinks,
+    save_cached_seed_page_ids,
+    scan_categorylinks,
+)
+from wiki_extract.extract.sql_dump import SqlDumpReader
+from wiki_extract.extract.sql_page import run_page
+from wiki_extract.extract.titles import TitleIndex
+from wiki_extract.util.log import log_progress
+from wiki_extract.util.title_map import TitleMap
+
+
+class SqlTables(NamedTuple):
+    """SQL 段の結果。"""
+
+    main_id_to_title: TitleMap
+    category_id_to_title: TitleMap
+    toujo_page_ids: set[int]
+    # seed カテゴリ → 配下の page_id
+    seed_page_ids: dict[str, set[int]]
+
+
+def run_sql_tables(
+    page_path: Path,
+    categorylinks_path: Path,
+    *,
+    seeds: Iterable[str] = (CATEGORY_FICTIONAL,),
+    linktarget_path: Optional[Path] = None,
+    log_progress_fn: bool = True,
+    decompress: Optional[str] = None,
+    cache_dir: Optional[Path] = None,
+    parallel: bool = True,
+) -> SqlTables:
+    """
+    page / categorylinks（1.45+ 形式なら linktarget も）を読み、SqlTables を返す。seeds は run_categorylinks と同じ。
+    parallel なら page と linktarget をワーカープロセスで読み、categorylinks の走査と並行させる。
+    False なら run_page → run_categorylinks の順に 1 本で読む（結果は同じ）。
+    cache_dir は run_page / run_categorylinks と同じキャッシュ。page と categorylinks の両方がキャッシュにあれば
+    ダンプは読まない。
+    """
+    seeds = list(seeds) or [CATEGORY_FICTIONAL]
+    page_tables = None
+    if cache_dir is not None and cache_path(cache_dir, 'page', [page_path]).is_file():
+        page_tables = run_page(page_path, log_progress_fn=log_progress_fn, decompress=decompress, cache_dir=cache_dir)
+        cl_cache_file = categorylinks_cache_file(
+            cache_dir, categorylinks_path, linktarget_path, page_tables[1], seeds
+        )
+        seed_page_ids = load_cached_seed_page_ids(cl_cache_file, seeds, log_progress_fn=log_progress_fn)
+        if seed_page_ids is not None:
+            return SqlTables(*page_tables, seed_page_ids)
+
+    if not parallel:
+        if page_tables is None:
+            page_tables = run_page(
+                page_path, log_progress_fn=log_progress_fn, decompress=decompress, cache_dir=cache_dir
+            )
+        seed_page_ids = run_categorylinks(
+            categorylinks_path,
+            page_tables[1],
+            seeds=seeds,
+            linktarget_path=linktarget_path,
+            log_progress_fn=log_progress_fn,
+            decompress=decompress,
+            cache_dir=cache_dir,
+        )
+        return SqlTables(*page_tables, seed_page_ids)
+
+    # ワーカーは categorylinks を開く前に起動する（展開スレッドを持ったまま fork しない）
+    use_linktarget = categorylinks_uses_linktarget(categorylinks_path, linktarget_path, decompress=decompress)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        page_future = None
+        if page_tables is None:
+            page_future = executor.submit(
+                run_page, page_path, log_progress_fn=log_progress_fn, decompress=decompress, cache_dir=cache_dir
+            )
+        linktarget_future = None
+        if use_linktarget:
+            linktarget_future = executor.submit(
+                load_linktarget_category_titles,
+                linktarget_path,
+                seed_titles=list(seeds),
+                log_progress_fn=log_progress_fn,
+                decompress=decompress,
+            )
+        with SqlDumpReader(categorylinks_path, decompress=decompress) as dump:
+            scan = scan_categorylinks(dump, log_progress_fn=log_progress_fn)
+        if log_progress_fn and page_future is not None and not page_future.done():
+            log_progress('page: 読込完了待ち')
+        if page_future is not None:
+            page_tables = page_future.result()
+        target_id_to_title = linktarget_future.result() if linktarget_future is not None else None
+
+    # カテゴリ名の正規化・逆引きは page の結果から 1 回だけ作った索引で行う
+    seed_page_ids = resolve_seed_page_ids(
+        scan, TitleIndex(page_tables[1]), target_id_to_title, seeds=seeds, log_progress_fn=log_progress_fn
+    )
+    if cache_dir is not None:
+        save_cached_seed_page_ids(
+            categorylinks_cache_file(cache_dir, categorylinks_path, linktarget_path, page_tables[1], seeds),
+            seed_page_ids,
+        )
+    return SqlTables(*page_tables, seed_page_ids)
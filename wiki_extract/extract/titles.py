@@ -0,0 +1,84 @@
+"""
+SQL 段（page / linktarget / categorylinks）で共有するタイトルの正規化とタイトル索引。
+
+- normalize_title: MediaWiki の表記にそろえる（NFKC 正規化、空白・全角スペースをアンダースコアに、前後の _ を除く）
+- canonical_title: 比較用（さらに書式・制御文字と空白・アンダースコアを除く）
+
+ダンプのタイトルはほとんどが ASCII か NFKC 正規化済みなので、その場合は NFKC も正規表現も通さない。
+TitleIndex は page_id → タイトルの各タイトルを 1 回だけ正規化し、完全一致と比較用の逆引き表を持つ。
+"""
+
+import re
+import unicodedata
+from collections.abc import Mapping
+from typing import Optional, Union
+
+_WHITESPACE = re.compile(r'[\s\u3000]+')
+_WHITESPACE_OR_UNDERSCORE = re.compile(r'[\s_\u3000]+')
+
+
+def normalize_title(s: Optional[str]) -> str:
+    """MediaWiki タイトル: NFKC 正規化し、空白・全角スペースをアンダースコアに、前後の _ を除く。None は空文字。"""
+    if not s:
+        return ""
+    s = str(s)
+    if not s.isascii() and not unicodedata.is_normalized('NFKC', s):
+        s = unicodedata.normalize('NFKC', s)
+    # NFKC 後に残る空白は ' ' か印字できない文字（タブ・改行・U+2028 など）だけ
+    if ' ' in s or not s.isprintable():
+        s = _WHITESPACE.sub('_', s)
+    return s.strip('_')
+
+
+def canonical_title(s: Optional[str]) -> str:
+    """
+    比較用: NFKC 正規化し、書式・制御文字（ゼロ幅スペース等）を除去し、
+    空白・アンダースコア・全角スペースを除去。
+    """
+    if not s:
+        return ""
+    s = str(s)
+    if not s.isascii() and not unicodedata.is_normalized('NFKC', s):
+        s = unicodedata.normalize('NFKC', s)
+    if s.isprintable():
+        # 書式・制御文字も ' ' 以外の空白も無い
+        return s.replace(' ', '').replace('_', '')
+    s = ''.join(c for c in s if unicodedata.category(c) not in ('Cf', 'Cc'))
+    return _WHITESPACE_OR_UNDERSCORE.sub('', s)
+
+
+class TitleIndex:
+    """
+    page_id → タイトルの索引。各タイトルは作るときに 1 回だけ正規化する。
+    - titles: page_id → 正規化タイトル
+    - exact: 正規化タイトル → page_id（同じタイトルが複数あれば最初のもの）
+    - canonical: 比較用タイトル → page_id（同上）
+    """
+
+    def __init__(self, id_to_title: Mapping[int, str]) -> None:
+        self.titles: dict[int, str] = {}
+        self.exact: dict[str, int] = {}
+        self.canonical: dict[str, int] = {}
+        for page_id, raw in id_to_title.items():
+            title = normalize_title(raw)
+            self.titles[page_id] = title
+            if title:
+                self.exact.setdefault(title, page_id)
+                # 正規化タイトルの比較用表記は元のタイトルのものと同じ
+                self.canonical.setdefault(canonical_title(title), page_id)
+
+    @classmethod
+    def of(cls, titles: Union['TitleIndex', Mapping[int, str]]) -> 'TitleIndex':
+        """TitleIndex はそのまま、page_id → タイトルの対応なら索引を作って返す。"""
+        return titles if isinstance(titles, TitleIndex) else cls(titles)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def page_id(self, title: str) -> Optional[int]:
+        """タイトルを正規化して完全一致する page_id。無ければ None。"""
+        return self.exact.get(normalize_title(title))
+
+    def canonical_page_id(self, title: str) -> Optional[int]:
+        """比較用タイトルが一致する page_id。無ければ None。"""
+        return self.canonical.get(canonical_title(title))
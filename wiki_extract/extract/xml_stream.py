@@ -1,12 +1,72 @@
 """
-MediaWiki の pages-articles.xml または .xml.bz2 からページをストリームし、(page_id, ns, text) を yield する。
-iterparse でメモリに全ダンプを載せない。
+MediaWiki の pages-articles.xml または .xml.bz2 からページをストリームし、Page(page_id, ns, text, revision_id, sha1) を
+yield する。iterparse でメモリに全ダンプを載せない。revision_id / sha1 は最終リビジョンの <id> と <sha1>（差分実行用）。
+
+pages-articles-multistream.xml.bz2 と -index.txt.bz2 がある場合は、独立した bz2 ストリーム（約100ページ単位）ごとに
+プロセスプールで展開・パースし、ファイル順（page_id 順）のまま yield する。
+
+target_ids を渡すとバイト列のまま <page> 境界と <ns>/<id> を探し、対象 ID か本文に「登場人物」の UTF-8 バイト列を含む
+ns=0 のページだけをデコード・パースする（それ以外のページは str にも要素木にもしない）。
+sections=False なら対象 ID のページだけを返し、multistream では対象 ID を含むブロックだけを展開する。
+逐次読みでも最大の対象 ID を過ぎたところで読むのをやめる（ダンプは page_id 昇順）。
+
+stream_pages_expat は expat のプルパーサで要素木を作らずに読み、ns != 0 のページは本文をバッファしないため、
+ダンプ全体を通してメモリ使用量が一定に保たれる。
+
+.bz2 の逐次読み（multistream 以外）は decompress.open_dump 経由で、展開をパースと別スレッド／外部プロセスで行う。
+
+非圧縮の .xml は page_offset_for で page_id を含む <page> のバイト位置を二分探索で求められ、start_offset から
+読み始められる（途中再開用。単一ストリームの .bz2 / .gz は途中から展開できないので先頭から読む）。
 """
 
 import bz2
+import io
+import os
+import re
+from bisect import bisect_right
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterator
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+from xml.parsers import expat
+
+from wiki_extract.extract.decompress import open_dump
+from wiki_extract.extract.titles import normalize_title
+
+# プロセスプールに先行投入するブロック数（ワーカー数に対する倍率）。結果待ちのメモリを抑える。
+_MULTISTREAM_PREFETCH_FACTOR = 4
+
+# バイト列スキャン時の読み込み単位
+_SCAN_READ_SIZE = 4 * 1024 * 1024
+# 本文がこのバイト列を含むページだけデコードする（登場人物セクション候補）
+TOUJO_MARKER_BYTES = '登場人物'.encode('utf-8')
+_PAGE_START = b'<page>'
+_PAGE_END = b'</page>'
+_NS_BYTES_RE = re.compile(rb'<ns>(-?\d+)</ns>')
+# <page> 内で最初の <id> がページ ID（<revision> の <id> より前に現れる）
+_ID_BYTES_RE = re.compile(rb'<id>(\d+)</id>')
+
+# expat に渡す読み込み単位
+_EXPAT_READ_SIZE = 1024 * 1024
+
+# page_offset_for の二分探索を打ち切って前から読む範囲
+_OFFSET_SEARCH_SPAN = 1024 * 1024
+# 途中から読むとき、<page> の並びの前に足すルート要素（ページの要素名はローカル名で見る）
+_RESUME_ROOT = b'<mediawiki>'
+
+_worker_scan_target_ids: set[int] | None = None
+_worker_scan_sections = True
+_worker_main_only = False
+
+
+class Page(NamedTuple):
+    """ストリームする 1 ページ。revision_id / sha1 はダンプに無ければ 0 / ''。"""
+    page_id: int
+    ns: int
+    text: str
+    revision_id: int
+    sha1: str
 
 
 def _local_tag(tag: str) -> str:
@@ -14,42 +74,568 @@ def _local_tag(tag: str) -> str:
     return tag.split('}')[-1] if tag and '}' in str(tag) else (tag or '')
 
 
-def stream_pages(xml_path: Path) -> Iterator[tuple[int, int, str]]:
+def _page_fields(elem: ET.Element) -> Page:
+    """<page> 要素から Page を取り出す。page_id が無ければ 0。"""
+    page_id = 0
+    ns = 0
+    text = ''
+    revision_id = 0
+    sha1 = ''
+    for child in elem:
+        tag = _local_tag(child.tag)
+        if tag == 'id' and page_id == 0:
+            page_id = int(child.text or 0)
+        elif tag == 'ns':
+            ns = int(child.text or 0)
+        elif tag == 'revision':
+            text = ''
+            revision_id = 0
+            sha1 = ''
+            for c in child:
+                c_tag = _local_tag(c.tag)
+                if c_tag == 'text':
+                    text = c.text or ''
+                elif c_tag == 'id' and revision_id == 0:
+                    revision_id = int(c.text or 0)
+                elif c_tag == 'sha1':
+                    sha1 = c.text or ''
+    return Page(page_id, ns, text, revision_id, sha1)
+
+
+def _parse_page_bytes(raw: bytes) -> Page:
+    """<page>…</page> のバイト列をデコードしてパースし、Page を返す。"""
+    return _page_fields(ET.fromstring(raw.decode('utf-8', errors='replace')))
+
+
+def is_seekable_dump(xml_path: Path) -> bool:
+    """非圧縮の .xml なら True（start_offset から読める）。"""
+    return Path(xml_path).suffix.lower() == '.xml'
+
+
+def _page_header_at(f, pos: int) -> tuple[int, int] | None:
+    """pos 以降で最初の <page> の (開始バイト位置, page_id)。無ければ None。"""
+    f.seek(pos)
+    buf = b''
+    base = pos
+    while True:
+        data = f.read(64 * 1024)
+        if not data:
+            return None
+        buf += data
+        start = buf.find(_PAGE_START)
+        if start == -1:
+            # <page> の途中で切れているかもしれない末尾だけ残す
+            keep = max(0, len(buf) - len(_PAGE_START))
+            base += keep
+            buf = buf[keep:]
+            continue
+        m = _ID_BYTES_RE.search(buf, start)
+        if m is not None:
+            return base + start, int(m.group(1))
+
+
+def page_offset_for(xml_path: Path, page_id: int) -> int | None:
     """
-    pages-articles.xml（または .xml.bz2）を開き、各ページの (page_id, namespace, text) を yield する。
-    本文は最終リビジョンのみ。UTF-8 でデコードする。
+    非圧縮の pages-articles.xml で、page_id 以下で最大の page_id を持つ <page> の開始バイト位置を返す
+    （ダンプは page_id 昇順なので二分探索で求める）。そのようなページが無ければ None。
     """
-    path_str = str(xml_path)
-    if path_str.endswith(".bz2"):
-        f = bz2.open(xml_path, "rt", encoding="utf-8", errors="replace")
-    else:
-        f = open(xml_path, "r", encoding="utf-8", errors="replace")
+    with open(xml_path, 'rb') as f:
+        lo, hi = 0, f.seek(0, os.SEEK_END)
+        while hi - lo > _OFFSET_SEARCH_SPAN:
+            mid = (lo + hi) // 2
+            header = _page_header_at(f, mid)
+            if header is None or header[1] > page_id:
+                hi = mid
+            else:
+                lo = mid
+        # [lo, hi) に始まる <page> を前から見て、page_id 以下の最後のもの
+        found = None
+        pos = lo
+        while True:
+            header = _page_header_at(f, pos)
+            if header is None or header[1] > page_id:
+                return found
+            found = header[0]
+            pos = header[0] + len(_PAGE_START)
+
+
+class _ResumedXml(io.RawIOBase):
+    """非圧縮の XML を start_offset から読み、先頭に _RESUME_ROOT を足して 1 つの文書に見せる。"""
+
+    def __init__(self, xml_path: Path, start_offset: int) -> None:
+        self._f = open(xml_path, 'rb')
+        self._f.seek(start_offset)
+        self._prefix = _RESUME_ROOT
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        return self._f.readinto(b)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def _open_xml(xml_path: Path, mode: str, start_offset: int = 0, decompress: Optional[str] = None):
+    """
+    ダンプを open_dump で開く。start_offset が正なら非圧縮の .xml をその位置から開く
+    （<page> の開始位置であること。圧縮ファイルなら ValueError）。
+    """
+    if not start_offset:
+        return open_dump(xml_path, mode, method=decompress)
+    if not is_seekable_dump(xml_path):
+        raise ValueError(f'start_offset から読めるのは非圧縮の .xml だけです: {xml_path}')
+    f = io.BufferedReader(_ResumedXml(xml_path, start_offset))
+    if mode == 'rt':
+        return io.TextIOWrapper(f, encoding='utf-8', errors='replace')
+    return f
+
+
+def _scan_page_span(
+    buf: bytes,
+    start: int,
+    end: int,
+    target_ids: set[int],
+    sections: bool = True,
+) -> Page | None:
+    """
+    buf[start:end]（1 ページ分）をバイト列のまま判定し、ns=0 かつ（対象 ID または「登場人物」を含む）なら
+    デコード・パースして返す。sections=False なら対象 ID だけ。それ以外は None（コピーもデコードもしない）。
+    """
+    m = _NS_BYTES_RE.search(buf, start, end)
+    if m is None or int(m.group(1)) != 0:
+        return None
+    m = _ID_BYTES_RE.search(buf, start, end)
+    if m is None:
+        return None
+    if int(m.group(1)) not in target_ids and (not sections or buf.find(TOUJO_MARKER_BYTES, start, end) == -1):
+        return None
+    page = _parse_page_bytes(buf[start:end])
+    return page if page[0] else None
+
+
+def _pages_in_buffer(buf: bytes, parse_span: Callable[[bytes, int, int], Page | None]) -> list[Page]:
+    """ページ全体を含むバッファの <page>…</page> ごとに parse_span(buf, start, end) を呼び、None 以外を返す。"""
+    result: list[Page] = []
+    pos = 0
+    while True:
+        start = buf.find(_PAGE_START, pos)
+        if start == -1:
+            break
+        end = buf.find(_PAGE_END, start)
+        if end == -1:
+            break
+        end += len(_PAGE_END)
+        page = parse_span(buf, start, end)
+        if page is not None:
+            result.append(page)
+        pos = end
+    return result
+
+
+def _scan_pages_in_buffer(buf: bytes, target_ids: set[int], sections: bool = True) -> list[Page]:
+    """ページ全体を含むバッファから _scan_page_span を通ったページを返す（multistream のブロック用）。"""
+    return _pages_in_buffer(buf, lambda b, start, end: _scan_page_span(b, start, end, target_ids, sections))
+
+
+def _main_page_span(buf: bytes, start: int, end: int) -> Page | None:
+    """buf[start:end]（1 ページ分）が ns=0 ならパースして返す。それ以外は None（デコードもしない）。"""
+    m = _NS_BYTES_RE.search(buf, start, end)
+    if m is None or int(m.group(1)) != 0:
+        return None
+    page = _parse_page_bytes(buf[start:end])
+    return page if page.page_id else None
+
+
+def scan_candidate_pages(
+    xml_path: Path,
+    target_ids: set[int],
+    *,
+    decompress: Optional[str] = None,
+    sections: bool = True,
+    start_offset: int = 0,
+) -> Iterator[Page]:
+    """
+    pages-articles.xml（または .xml.bz2）をバイト列のまま走査し、ns=0 で page_id が target_ids に含まれるか
+    本文に「登場人物」を含むページだけ Page で yield する。
+    sections=False なら対象 ID のページだけを返し、最大の対象 ID を過ぎたら残りは読まない。
+    start_offset は非圧縮の .xml を読み始める <page> のバイト位置（_open_xml）。
+    """
+    last_target = None if sections else max(target_ids, default=0)
+    f = _open_xml(xml_path, "rb", start_offset, decompress)
     try:
-        context = ET.iterparse(f, events=("end",))
-        for _event, elem in context:
-            if _local_tag(elem.tag) != 'page':
+        buf = b''
+        pos = 0
+        while True:
+            start = buf.find(_PAGE_START, pos)
+            end = buf.find(_PAGE_END, start) if start != -1 else -1
+            if end == -1:
+                data = f.read(_SCAN_READ_SIZE)
+                if not data:
+                    return
+                # 未完了のページ（または <page> の途中かもしれない末尾）だけ残して読み足す
+                keep = start if start != -1 else max(pos, len(buf) - len(_PAGE_START))
+                buf = buf[keep:] + data
+                pos = 0
                 continue
-            page_id = 0
-            ns = 0
-            text = ''
-            for child in elem:
-                tag = _local_tag(child.tag)
-                if tag == 'id' and page_id == 0:
-                    page_id = int(child.text or 0)
-                elif tag == 'ns':
-                    ns = int(child.text or 0)
-                elif tag == 'revision':
-                    text_elem = None
-                    for c in child:
-                        if _local_tag(c.tag) == 'text':
-                            text_elem = c
-                            break
-                    if text_elem is not None and text_elem.text is not None:
-                        text = text_elem.text
-                    else:
-                        text = ''
-            if page_id:
-                yield page_id, ns, text
-            elem.clear()
+            end += len(_PAGE_END)
+            if last_target is not None:
+                m = _ID_BYTES_RE.search(buf, start, end)
+                if m is not None and int(m.group(1)) > last_target:
+                    return
+            page = _scan_page_span(buf, start, end, target_ids, sections)
+            if page is not None:
+                yield page
+            pos = end
+    finally:
+        f.close()
+
+
+def stream_pages(
+    xml_path: Path,
+    *,
+    index_path: Path | None = None,
+    workers: int | None = None,
+    target_ids: set[int] | None = None,
+    decompress: Optional[str] = None,
+    start_offset: int = 0,
+    sections: bool = True,
+    main_only: bool = False,
+) -> Iterator[Page]:
+    """
+    pages-articles.xml（または .xml.bz2）を開き、各ページの Page を yield する。
+    本文・リビジョン ID・sha1 は最終リビジョンのみ。UTF-8 でデコードする。
+    index_path（multistream の -index.txt.bz2）を渡すと stream_pages_multistream で並列展開する
+    （start_offset 以降のブロックのみ）。multistream でなければ start_offset は非圧縮の .xml の
+    <page> の開始バイト位置（page_offset_for）で、そこから読む。
+    target_ids を渡すとバイト列の事前判定を通った ns=0 のページだけを yield する（scan_candidate_pages）。
+    sections=False（target_ids が必要）なら対象 ID のページだけを返し、最後の対象ページの後は読まない。
+    main_only なら ns=0 のページだけを yield する（どの読み方でも同じ。multistream ではワーカーが ns != 0 を送らない）。
+    decompress は decompress.open_dump の展開方法（None なら既定）。
+    """
+    if not sections and target_ids is None:
+        raise ValueError('sections=False には target_ids が必要です')
+    if index_path is not None:
+        yield from stream_pages_multistream(
+            xml_path,
+            index_path,
+            workers=workers,
+            target_ids=target_ids,
+            start_offset=start_offset,
+            sections=sections,
+            main_only=main_only,
+        )
+        return
+    if target_ids is not None:
+        yield from scan_candidate_pages(
+            xml_path, target_ids, decompress=decompress, sections=sections, start_offset=start_offset
+        )
+        return
+    f = _open_xml(xml_path, "rt", start_offset, decompress)
+    try:
+        context = ET.iterparse(f, events=("start", "end"))
+        root = None
+        for event, elem in context:
+            if root is None:
+                root = elem
+            if event != "end" or _local_tag(elem.tag) != 'page':
+                continue
+            page = _page_fields(elem)
+            if page.page_id and (page.ns == 0 or not main_only):
+                yield page
+            # clear 済みの <page> がルートの子として残り続けないよう、ルートから外す
+            root.clear()
+    finally:
+        f.close()
+
+
+class _ExpatPageCollector:
+    """
+    expat のハンドラ。<page> ごとに Page を pages に溜める。
+    <ns> が 0 以外と分かった時点で、そのページの <text> はバッファしない。
+    """
+
+    def __init__(self) -> None:
+        self.pages: list[Page] = []
+        self._depth = 0
+        self._page_depth = -1
+        self._in_revision = False
+        self._field: str | None = None
+        self._parts: list[str] = []
+        self._page_id = 0
+        self._ns = 0
+        self._text = ''
+        self._revision_id = 0
+        self._sha1 = ''
+
+    def start(self, name: str, _attrs: dict) -> None:
+        self._depth += 1
+        tag = _local_tag(name)
+        if tag == 'page':
+            self._page_depth = self._depth
+            self._in_revision = False
+            self._page_id = 0
+            self._ns = 0
+            self._text = ''
+            self._revision_id = 0
+            self._sha1 = ''
+            return
+        if self._page_depth < 0:
+            return
+        if self._depth == self._page_depth + 1:
+            if tag == 'ns' or (tag == 'id' and self._page_id == 0):
+                self._field = tag
+                self._parts = []
+            elif tag == 'revision':
+                self._in_revision = True
+        elif self._in_revision and self._depth == self._page_depth + 2:
+            if (tag == 'text' and self._ns == 0) or tag == 'sha1' or (tag == 'id' and self._revision_id == 0):
+                self._field = 'revision_id' if tag == 'id' else tag
+                self._parts = []
+
+    def data(self, s: str) -> None:
+        if self._field is not None:
+            self._parts.append(s)
+
+    def end(self, name: str) -> None:
+        depth = self._depth
+        self._depth -= 1
+        if self._page_depth < 0:
+            return
+        if depth == self._page_depth:
+            if self._page_id:
+                self.pages.append(Page(self._page_id, self._ns, self._text, self._revision_id, self._sha1))
+            self._page_depth = -1
+            return
+        field = self._field
+        if field is None:
+            if depth == self._page_depth + 1 and _local_tag(name) == 'revision':
+                self._in_revision = False
+            return
+        value = ''.join(self._parts)
+        self._field = None
+        self._parts = []
+        if field == 'ns':
+            self._ns = int(value or 0)
+        elif field == 'id':
+            self._page_id = int(value or 0)
+        elif field == 'revision_id':
+            self._revision_id = int(value or 0)
+        elif field == 'sha1':
+            self._sha1 = value
+        else:
+            self._text = value
+
+
+def stream_pages_expat(
+    xml_path: Path,
+    *,
+    decompress: Optional[str] = None,
+    start_offset: int = 0,
+    main_only: bool = False,
+) -> Iterator[Page]:
+    """
+    pages-articles.xml（または .xml.bz2）を expat で読み、各ページの Page を yield する。
+    要素木を作らず、ns != 0 のページは本文を空文字で返す（バッファしない。main_only なら yield もしない）。
+    保持するのは読み込み 1 回分のページのみ。
+    start_offset は非圧縮の .xml を読み始める <page> のバイト位置（_open_xml）。
+    """
+    f = _open_xml(xml_path, "rb", start_offset, decompress)
+    try:
+        collector = _ExpatPageCollector()
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = collector.start
+        parser.EndElementHandler = collector.end
+        parser.CharacterDataHandler = collector.data
+        while True:
+            data = f.read(_EXPAT_READ_SIZE)
+            parser.Parse(data, not data)
+            if collector.pages:
+                if main_only:
+                    yield from (page for page in collector.pages if page.ns == 0)
+                else:
+                    yield from collector.pages
+                collector.pages = []
+            if not data:
+                break
     finally:
         f.close()
+
+
+def read_multistream_index(index_path: Path) -> list[tuple[int, int]]:
+    """
+    multistream の索引（行形式 "offset:page_id:title"）から、ブロックごとの (先頭 page_id, 開始バイト位置) を
+    開始位置の昇順で返す。
+    """
+    first_page_id: dict[int, int] = {}
+    with bz2.open(index_path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.split(':', 2)
+            if len(parts) < 2 or not parts[0].isdigit() or not parts[1].isdigit():
+                continue
+            offset = int(parts[0])
+            if offset not in first_page_id:
+                first_page_id[offset] = int(parts[1])
+    return [(first_page_id[offset], offset) for offset in sorted(first_page_id)]
+
+
+def lookup_multistream_index(
+    index_path: Path,
+    *,
+    page_ids: Iterable[int] = (),
+    titles: Iterable[str] = (),
+) -> dict[int, str]:
+    """
+    multistream の索引を 1 回読み、page_ids のいずれか、または titles のいずれかに正規化一致するタイトルの行を
+    page_id → 正規化タイトルで返す（page テーブルを読まずに少数のページを引くため）。
+    """
+    wanted_ids = set(page_ids)
+    wanted_titles = {normalize_title(t) for t in titles}
+    found: dict[int, str] = {}
+    with bz2.open(index_path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.rstrip('\n').split(':', 2)
+            if len(parts) < 3 or not parts[1].isdigit():
+                continue
+            page_id = int(parts[1])
+            title = normalize_title(parts[2])
+            if page_id in wanted_ids or title in wanted_titles:
+                found[page_id] = title
+    return found
+
+
+def read_multistream_offsets(index_path: Path) -> list[int]:
+    """multistream の索引から、各 bz2 ストリームの開始バイト位置を昇順で返す。"""
+    return [offset for _page_id, offset in read_multistream_index(index_path)]
+
+
+def multistream_blocks(
+    xml_path: Path,
+    index_path: Path,
+    block_index: list[tuple[int, int]] | None = None,
+) -> list[tuple[int, int]]:
+    """
+    ページを含む bz2 ストリームの (開始, 終了) バイト範囲を返す。
+    先頭の siteinfo ストリームは索引に無いので含まれない。末尾ブロックはファイル終端まで（</mediawiki> を含む）。
+    block_index（read_multistream_index の結果）を渡すと索引を読み直さない。
+    """
+    if block_index is None:
+        block_index = read_multistream_index(index_path)
+    offsets = [offset for _page_id, offset in block_index]
+    if not offsets:
+        return []
+    size = Path(xml_path).stat().st_size
+    ends = offsets[1:] + [size]
+    return [(start, end) for start, end in zip(offsets, ends) if end > start]
+
+
+def target_blocks(
+    blocks: list[tuple[int, int]],
+    block_index: list[tuple[int, int]],
+    target_ids: Iterable[int],
+) -> list[tuple[int, int]]:
+    """
+    multistream_blocks の (開始, 終了) のうち、target_ids のいずれかを含むものだけを返す。
+    block_index は read_multistream_index の (先頭 page_id, 開始バイト位置)（page_id 昇順）。
+    """
+    first_ids = [page_id for page_id, _offset in block_index]
+    offsets = set()
+    for page_id in target_ids:
+        i = bisect_right(first_ids, page_id) - 1
+        if i >= 0:
+            offsets.add(block_index[i][1])
+    return [block for block in blocks if block[0] in offsets]
+
+
+def init_multistream_worker(target_ids: set[int] | None, sections: bool = True, main_only: bool = False) -> None:
+    """
+    ワーカープロセス用にバイト列スキャンの対象 ID を設定する（None なら全ページをパース）。
+    main_only なら対象 ID が無くても ns=0 のページだけを返す。
+    """
+    global _worker_scan_target_ids, _worker_scan_sections, _worker_main_only
+    _worker_scan_target_ids = target_ids
+    _worker_scan_sections = sections
+    _worker_main_only = main_only
+
+
+def parse_multistream_block(xml_path: str, start: int, end: int) -> list[Page]:
+    """
+    1 ブロック（独立した bz2 ストリーム）を展開し、含まれる <page> を Page のリストで返す。
+    init_multistream_worker で対象 ID が設定されていれば、事前判定を通ったページだけを返す。
+    設定されていなくても main_only なら ns=0 のページだけを返し、それ以外の本文を親プロセスに送らない。
+    ProcessPoolExecutor から呼ぶためモジュールレベルに置く。
+    """
+    with open(xml_path, "rb") as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    data = bz2.decompress(raw)
+    if _worker_scan_target_ids is not None:
+        return _scan_pages_in_buffer(data, _worker_scan_target_ids, _worker_scan_sections)
+    if _worker_main_only:
+        return _pages_in_buffer(data, _main_page_span)
+    first = data.find(b'<page>')
+    last = data.rfind(b'</page>')
+    if first == -1 or last == -1:
+        return []
+    fragment = data[first:last + len(b'</page>')]
+    root = ET.fromstring((b'<pages>' + fragment + b'</pages>').decode('utf-8', errors='replace'))
+    result: list[Page] = []
+    for elem in root:
+        if _local_tag(elem.tag) != 'page':
+            continue
+        page = _page_fields(elem)
+        if page.page_id:
+            result.append(page)
+    return result
+
+
+def stream_pages_multistream(
+    xml_path: Path,
+    index_path: Path,
+    *,
+    workers: int | None = None,
+    target_ids: set[int] | None = None,
+    start_offset: int = 0,
+    sections: bool = True,
+    main_only: bool = False,
+) -> Iterator[Page]:
+    """
+    multistream ダンプをブロック単位でプロセスプールに投げて展開・パースし、Page を yield する。
+    結果はブロック順（= ファイル内のページ順）で返す。先行投入数を抑えて未消費の結果がメモリに溜まらないようにする。
+    target_ids を渡すとワーカー側でバイト列の事前判定を行い、通ったページだけを送り返す。
+    sections=False なら索引から対象 ID を含むブロックだけを選んで展開し、対象 ID のページだけを返す
+    （最後の対象ブロックの後は読まない）。
+    start_offset を渡すとその位置より前のブロックは読まない（途中再開用）。
+    main_only ならワーカーは ns=0 のページだけを返す（それ以外の本文は親プロセスに送らない）。
+    """
+    block_index = read_multistream_index(index_path)
+    blocks = [b for b in multistream_blocks(xml_path, index_path, block_index) if b[0] >= start_offset]
+    if not sections and target_ids is not None:
+        blocks = target_blocks(blocks, block_index, target_ids)
+    n_workers = max(1, min(workers or os.cpu_count() or 1, len(blocks) or 1))
+    path_str = str(xml_path)
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=init_multistream_worker,
+        initargs=(target_ids, sections, main_only),
+    ) as executor:
+        pending: deque = deque()
+        block_iter = iter(blocks)
+        for start, end in block_iter:
+            pending.append(executor.submit(parse_multistream_block, path_str, start, end))
+            if len(pending) >= n_workers * _MULTISTREAM_PREFETCH_FACTOR:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            for start, end in block_iter:
+                pending.append(executor.submit(parse_multistream_block, path_str, start, end))
+                break
+            yield from pages
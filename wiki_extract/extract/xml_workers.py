@@ -3,9 +3,21 @@ XML ページ処理用のワーカープロセス補助（ProcessPoolExecutor 
 ワーカーが __main__ として実行されても _init_worker / process_page を解決できるよう、名前付きモジュールに置く必要がある。
 """
 
-from wiki_extract.extract.section_parser import extract_fictional_links_from_page
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Sequence
+
+from wiki_extract.extract.section_parser import extract_fictional_links_from_page, toujo_section_span
+
+# 登場人物セクションの有無を調べる前の軽量チェックに使う文字列
+TOUJO_MARKER = '登場人物'
+
+# 1 チャンクに詰めるページ本文の合計文字数とページ数の上限
+SELECT_CHUNK_CHARS = 4_000_000
+SELECT_CHUNK_PAGES = 512
 
 _worker_toujo_page_ids: set[int] = set()
+_worker_target_ids: set[int] = set()
 
 
 def init_worker(toujo_page_ids: set[int]) -> None:
@@ -14,9 +26,117 @@ def init_worker(toujo_page_ids: set[int]) -> None:
     _worker_toujo_page_ids = toujo_page_ids
 
 
-def process_page(item: tuple[int, int, str]) -> set[str]:
-    """1ページ (page_id, ns, text) を処理し、リンク先タイトルの集合を返す。"""
-    page_id, ns, text = item
+def process_page(item: Sequence) -> set[str]:
+    """1ページ (page_id, ns, text, ...) を処理し、リンク先タイトルの集合を返す。"""
+    page_id, ns, text = item[:3]
     return extract_fictional_links_from_page(
         page_id, ns, text, _worker_toujo_page_ids
     )
+
+
+def select_page(page_id: int, ns: int, text: str, target_ids: set[int]) -> str | None:
+    """
+    extract-pages で書き出すページか判定する。
+    対象 ID なら 'target'、登場人物セクションがある通常ページなら 'section'、書き出さないなら None。
+    """
+    selected = select_page_span(page_id, ns, text, target_ids)
+    return selected[0] if selected is not None else None
+
+
+def select_page_span(
+    page_id: int,
+    ns: int,
+    text: str,
+    target_ids: set[int],
+) -> tuple[str, tuple[int, int] | None] | None:
+    """select_page の種別と、'section' なら判定に使った登場人物セクションの本文内での位置（'target' は None）。"""
+    if ns != 0:
+        return None
+    if page_id in target_ids:
+        return 'target', None
+    if TOUJO_MARKER not in text:
+        return None
+    span = toujo_section_span(text)
+    if span is None:
+        return None
+    return 'section', span
+
+
+def init_select_worker(target_ids: set[int]) -> None:
+    """ワーカープロセス用にグローバル target_ids を設定する。"""
+    global _worker_target_ids
+    _worker_target_ids = target_ids
+
+
+def select_chunk(chunk: list[Sequence]) -> list[tuple[int, str, tuple[int, int] | None]]:
+    """
+    チャンク内の各ページ（先頭 3 要素が page_id, ns, text）を select_page_span で判定し、
+    書き出すものの (チャンク内の添字, 種別, セクション位置) を返す。本文は親プロセスが保持しているので送り返さない。
+    """
+    result: list[tuple[int, str, tuple[int, int] | None]] = []
+    for i, page in enumerate(chunk):
+        selected = select_page_span(page[0], page[1], page[2], _worker_target_ids)
+        if selected is not None:
+            result.append((i, *selected))
+    return result
+
+
+def _may_select(page_id: int, ns: int, text: str, target_ids: set[int]) -> bool:
+    """select_page が None 以外を返しうるか（プロセス間で本文を送る前の軽量な足切り）。"""
+    return ns == 0 and (page_id in target_ids or TOUJO_MARKER in text)
+
+
+def _iter_chunks(
+    pages: Iterable[Sequence],
+    target_ids: set[int],
+) -> Iterator[list[Sequence]]:
+    """_may_select を通ったページを、本文の合計文字数・件数の上限でチャンクにまとめる。"""
+    chunk: list[Sequence] = []
+    chars = 0
+    for page in pages:
+        if not _may_select(page[0], page[1], page[2], target_ids):
+            continue
+        chunk.append(page)
+        chars += len(page[2])
+        if chars >= SELECT_CHUNK_CHARS or len(chunk) >= SELECT_CHUNK_PAGES:
+            yield chunk
+            chunk = []
+            chars = 0
+    if chunk:
+        yield chunk
+
+
+def iter_selected_pages(
+    pages: Iterable[Sequence],
+    target_ids: set[int],
+    *,
+    workers: int = 1,
+) -> Iterator[tuple[Sequence, str, tuple[int, int] | None]]:
+    """
+    pages（stream_pages の出力。先頭 3 要素が page_id, ns, text）のうち書き出すものを
+    (ページ, 種別, 登場人物セクションの位置) で yield する（位置は 'section' のときだけ。判定時に求めたものを使い回す）。
+    workers > 1 ならチャンク単位でワーカープロセスに判定させる。結果は入力順のまま返すので出力は決定的。
+    """
+    if workers <= 1:
+        for page in pages:
+            selected = select_page_span(page[0], page[1], page[2], target_ids)
+            if selected is not None:
+                yield page, *selected
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_select_worker,
+        initargs=(target_ids,),
+    ) as executor:
+        pending: deque = deque()
+        for chunk in _iter_chunks(pages, target_ids):
+            pending.append((chunk, executor.submit(select_chunk, chunk)))
+            # 先行投入はワーカー数の 2 倍まで（未処理チャンクの本文でメモリが膨らまないように）
+            while len(pending) > workers * 2:
+                done_chunk, future = pending.popleft()
+                for i, kind, span in future.result():
+                    yield done_chunk[i], kind, span
+        while pending:
+            done_chunk, future = pending.popleft()
+            for i, kind, span in future.result():
+                yield done_chunk[i], kind, span
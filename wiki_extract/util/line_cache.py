@@ -0,0 +1,126 @@
+"""
+行単位の処理結果を覚えておく上限付きの LRU キャッシュ（LineCache）。
+同じ ; 行や名前は登場人物ページ・版違いのページに何度も現れるので、入力の文字列をキーに結果を使い回す。
+ヒット数・ミス数を数え、除去ルールを調整するときは enabled=False で毎回計算させる。
+表はプロセスの中だけのもの。再実行でも使い回すときは save_line_caches / load_line_caches で JSON ファイルに残す。
+ファイルには結果を作ったルールの版（version）を入れ、版が違えば読まない。
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Generic, Hashable, Iterable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+# 既定の上限件数（1 件は 1 行分の文字列と結果）
+DEFAULT_MAXSIZE = 1 << 16
+
+
+class LineCache(Generic[K, V]):
+    """
+    key → 値の LRU。get_or_compute で引き、無ければ compute(key) を覚える。
+    maxsize を超えたら最も古く使われたものから捨てる。enabled が False のときは覚えず毎回計算する（数えもしない）。
+    LLM のバッチを並列に回すスレッドからも引けるよう、表の更新はロックの中で行う（compute はロックの外）。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, enabled: bool = True) -> None:
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: K, compute: Callable[[K], V]) -> V:
+        if not self.enabled:
+            return compute(key)
+        data = self._data
+        with self._lock:
+            if key in data:
+                data.move_to_end(key)
+                self.hits += 1
+                return data[key]
+            self.misses += 1
+        value = compute(key)
+        with self._lock:
+            data[key] = value
+            if len(data) > self.maxsize:
+                data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """覚えた値と統計を捨てる。"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def items(self) -> list[tuple[K, V]]:
+        """覚えている (key, 値) を古く使われた順に返す。"""
+        with self._lock:
+            return list(self._data.items())
+
+    def update(self, items: Iterable[tuple[K, V]]) -> None:
+        """(key, 値) を順に覚える（後のものほど新しく使われた扱い。統計は変えない）。"""
+        with self._lock:
+            data = self._data
+            for key, value in items:
+                data[key] = value
+                data.move_to_end(key)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        """ヒット数 / 引いた回数。まだ引いていなければ 0.0。"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        """ログ用の統計（例: ヒット率 87.5% (7/8), 保持 1件）。"""
+        lookups = self.hits + self.misses
+        return f'ヒット率 {self.hit_rate:.1%} ({self.hits}/{lookups}), 保持 {len(self._data)}件'
+
+
+def save_line_caches(path: Path, version: str, caches: dict[str, LineCache]) -> None:
+    """
+    caches（名前 → LineCache）の中身を version とともに JSON で一時ファイル経由で保存する。
+    キーは文字列、値は文字列・真偽値・文字列のタプル（JSON では配列）に限る。
+    """
+    data = {'version': version, 'caches': {name: cache.items() for name, cache in caches.items()}}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load_line_caches(path: Path, version: str, caches: dict[str, LineCache]) -> int:
+    """
+    save_line_caches のファイルを caches に読み込み、読んだ件数を返す。
+    無い・壊れている・version が違うときは何も読まず 0。配列の値はタプルに戻す。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if not isinstance(data, dict) or data.get('version') != version or not isinstance(data.get('caches'), dict):
+        return 0
+    loaded = 0
+    for name, cache in caches.items():
+        items = data['caches'].get(name) or []
+        try:
+            cache.update((key, tuple(value) if isinstance(value, list) else value) for key, value in items)
+        except (TypeError, ValueError):
+            continue
+        loaded += len(items)
+    return loaded
@@ -0,0 +1,311 @@
+"""
+extract-pages が書き出すページ本文の置き場所（ページストア）の読み書き。
+
+レイアウト（page_meta.json の page_store）:
+- 'files': pages/{page_id}.txt を 1 ページ 1 ファイルで置く（従来どおり）
+- 'packed': pages.dat（UTF-8 本文を追記で連結）と pages.idx（(page_id, 開始位置, バイト長) の固定長レコードの追記）
+  の 2 ファイル。同じ page_id の後のレコードが前のものを上書きし、長さ -1 は削除を表す。
+  読み手は pages.dat を mmap し、ページごとにファイルを開かずに任意のページを読む。
+
+pages.idx のレコードは pages.dat より後に書くが、落ちた場合に備えて読み手は pages.dat の範囲外を指すレコードを無視する。
+
+上書き・削除されたページの本文は pages.dat に残り続けるので、PackedPageWriter.compact が使われていない部分の割合が
+COMPACT_DEAD_RATIO 以上のときに生きているページだけを書き直す。新しい 2 ファイルを一時ファイルに書いてから
+pages.idx.new を置き（ここで確定）、pages.dat、pages.idx の順に置き換える。途中で落ちても、次に開いたときに
+pages.idx.new が残っていれば置き換えを終わらせる（_finish_compaction）。
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator
+
+PAGE_STORE_LAYOUTS = ('files', 'packed')
+DEFAULT_PAGE_STORE = 'files'
+
+PACKED_DATA_NAME = 'pages.dat'
+PACKED_INDEX_NAME = 'pages.idx'
+PAGES_DIR_NAME = 'pages'
+
+# pages.idx の 1 レコード: page_id, 開始位置, バイト長（int64 リトルエンディアン）
+_RECORD = struct.Struct('<qqq')
+_DELETED = -1
+
+# pages.dat のうち使われていないバイトがこの割合以上なら compact で書き直す
+COMPACT_DEAD_RATIO = 0.25
+_COMPACT_SUFFIX = '.tmp'
+_COMMITTED_INDEX_SUFFIX = '.new'
+
+
+def _finish_compaction(data_path: Path, index_path: Path) -> None:
+    """
+    compact の途中で落ちていれば後始末をする。pages.idx.new があれば確定済みなので置き換えを終わらせ、
+    無ければ書きかけの一時ファイルを捨てる。
+    """
+    committed_index = index_path.with_name(index_path.name + _COMMITTED_INDEX_SUFFIX)
+    data_tmp = data_path.with_name(data_path.name + _COMPACT_SUFFIX)
+    index_tmp = index_path.with_name(index_path.name + _COMPACT_SUFFIX)
+    if committed_index.is_file():
+        if data_tmp.is_file():
+            os.replace(data_tmp, data_path)
+        os.replace(committed_index, index_path)
+    for path in (data_tmp, index_tmp):
+        if path.is_file():
+            path.unlink()
+
+
+def _read_index(index_path: Path, data_size: int) -> dict[int, tuple[int, int]]:
+    """pages.idx を {page_id: (開始位置, バイト長)} で読む。末尾の不完全なレコードと範囲外のレコードは無視する。"""
+    entries: dict[int, tuple[int, int]] = {}
+    try:
+        raw = index_path.read_bytes()
+    except OSError:
+        return entries
+    for page_id, offset, length in _RECORD.iter_unpack(raw[:len(raw) - len(raw) % _RECORD.size]):
+        if length == _DELETED:
+            entries.pop(page_id, None)
+        elif 0 <= offset and offset + length <= data_size:
+            entries[page_id] = (offset, length)
+    return entries
+
+
+class PackedPageWriter:
+    """
+    packed レイアウトへの書き込み。既存の pages.dat / pages.idx に追記する（fresh=True なら空にしてから）。
+    変更のないページは書かずに済むよう、既存の索引を保持して `page_id in writer` で判定できる。
+    """
+
+    def __init__(self, directory: Path, *, fresh: bool = False) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.data_path = directory / PACKED_DATA_NAME
+        self.index_path = directory / PACKED_INDEX_NAME
+        _finish_compaction(self.data_path, self.index_path)
+        if fresh:
+            for path in (self.data_path, self.index_path):
+                if path.exists():
+                    path.unlink()
+        data_size = self.data_path.stat().st_size if self.data_path.is_file() else 0
+        self._entries = _read_index(self.index_path, data_size)
+        if self.index_path.is_file():
+            # 書き込み途中で落ちた不完全なレコードを切り詰め、以降の追記がレコード境界に揃うようにする
+            size = self.index_path.stat().st_size
+            if size % _RECORD.size:
+                os.truncate(self.index_path, size - size % _RECORD.size)
+        self._open()
+
+    def _open(self) -> None:
+        self._data = open(self.data_path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._offset = self._data.tell()
+
+    def __contains__(self, page_id: int) -> bool:
+        return page_id in self._entries
+
+    def put(self, page_id: int, text: str) -> None:
+        raw = text.encode('utf-8')
+        self._data.write(raw)
+        self._index.write(_RECORD.pack(page_id, self._offset, len(raw)))
+        self._entries[page_id] = (self._offset, len(raw))
+        self._offset += len(raw)
+
+    def delete(self, page_id: int) -> None:
+        if self._entries.pop(page_id, None) is not None:
+            self._index.write(_RECORD.pack(page_id, 0, _DELETED))
+
+    def flush(self) -> None:
+        """pages.dat を先に書き切ってから pages.idx を書く（チェックポイント保存前に呼ぶ）。"""
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        self._index.flush()
+        os.fsync(self._index.fileno())
+
+    def compact(self, min_dead_ratio: float | None = None) -> int:
+        """
+        pages.dat の使われていないバイトの割合が min_dead_ratio（None なら COMPACT_DEAD_RATIO）以上なら、
+        生きているページだけを page_id 順に書き直して pages.dat と pages.idx を置き換える。
+        減ったバイト数を返す（書き直さなければ 0）。続けて put もできる。
+        """
+        if min_dead_ratio is None:
+            min_dead_ratio = COMPACT_DEAD_RATIO
+        self.flush()
+        size = self._offset
+        dead = size - sum(length for _offset, length in self._entries.values())
+        if not size or dead / size < min_dead_ratio:
+            return 0
+        self.close()
+        data_tmp = self.data_path.with_name(self.data_path.name + _COMPACT_SUFFIX)
+        index_tmp = self.index_path.with_name(self.index_path.name + _COMPACT_SUFFIX)
+        entries: dict[int, tuple[int, int]] = {}
+        offset = 0
+        with open(self.data_path, 'rb') as src, open(data_tmp, 'wb') as data, open(index_tmp, 'wb') as index:
+            for page_id in sorted(self._entries):
+                old_offset, length = self._entries[page_id]
+                src.seek(old_offset)
+                data.write(src.read(length))
+                index.write(_RECORD.pack(page_id, offset, length))
+                entries[page_id] = (offset, length)
+                offset += length
+            for f in (data, index):
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(index_tmp, self.index_path.with_name(self.index_path.name + _COMMITTED_INDEX_SUFFIX))
+        _finish_compaction(self.data_path, self.index_path)
+        self._entries = entries
+        self._open()
+        return size - offset
+
+    def close(self) -> None:
+        if not self._index.closed:
+            self._data.close()
+            self._index.close()
+
+
+class PageFilesWriter:
+    """files レイアウト（pages/{page_id}.txt）への書き込み。PackedPageWriter と同じ操作を持つ。"""
+
+    def __init__(self, directory: Path) -> None:
+        self.pages_dir = Path(directory) / PAGES_DIR_NAME
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+
+    def __contains__(self, page_id: int) -> bool:
+        return (self.pages_dir / f'{page_id}.txt').is_file()
+
+    def put(self, page_id: int, text: str) -> None:
+        (self.pages_dir / f'{page_id}.txt').write_text(text, encoding='utf-8')
+
+    def delete(self, page_id: int) -> None:
+        path = self.pages_dir / f'{page_id}.txt'
+        if path.is_file():
+            path.unlink()
+
+    def flush(self) -> None:
+        pass
+
+    def compact(self, min_dead_ratio: float | None = None) -> int:
+        """ページごとのファイルなので詰めるものは無い（PackedPageWriter と同じ操作を持つため）。"""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def open_page_writer(directory: Path, layout: str, *, fresh: bool = False) -> PackedPageWriter | PageFilesWriter:
+    """layout（'files' / 'packed'）のページストアを書き込み用に開く。fresh は packed のみ有効（既存を捨てる）。"""
+    if layout == 'packed':
+        return PackedPageWriter(directory, fresh=fresh)
+    if layout == 'files':
+        return PageFilesWriter(directory)
+    raise ValueError(f"ページストアは {', '.join(PAGE_STORE_LAYOUTS)} のいずれかです: {layout}")
+
+
+class PackedPageStore:
+    """packed レイアウトの読み取り。pages.dat を mmap し、ページ本文をファイルを開かずに取り出す。"""
+
+    def __init__(self, directory: Path) -> None:
+        directory = Path(directory)
+        self.data_path = directory / PACKED_DATA_NAME
+        index_path = directory / PACKED_INDEX_NAME
+        _finish_compaction(self.data_path, index_path)
+        if not index_path.is_file() or not self.data_path.is_file():
+            raise FileNotFoundError(f'packed ページストアが見つかりません: {index_path}')
+        self._file = open(self.data_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # 空ファイルは mmap できないので、ページが無いストアとして扱う
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mm) if self._mm is not None else memoryview(b'')
+        self._entries = _read_index(index_path, size)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, page_id: int) -> bool:
+        return page_id in self._entries
+
+    def ids(self) -> list[int]:
+        """格納されている page_id を昇順で返す。"""
+        return sorted(self._entries)
+
+    def get_bytes(self, page_id: int) -> memoryview:
+        """本文の UTF-8 バイト列を mmap 上のビューで返す（コピーしない）。close 前に release すること。"""
+        offset, length = self._entries[page_id]
+        return self._view[offset:offset + length]
+
+    def get(self, page_id: int) -> str:
+        """本文を str で返す。無い page_id は KeyError。"""
+        with self.get_bytes(page_id) as view:
+            return str(view, 'utf-8', 'replace')
+
+    def location(self, page_id: int) -> str:
+        """表示用の格納場所（pages.dat のパスとバイト範囲）。"""
+        offset, length = self._entries[page_id]
+        return f'{self.data_path}@{offset}+{length}'
+
+    def close(self) -> None:
+        self._view.release()
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> 'PackedPageStore':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class PageFilesStore:
+    """files レイアウト（pages/{page_id}.txt）の読み取り。PackedPageStore と同じ操作を持つ。"""
+
+    def __init__(self, directory: Path) -> None:
+        self.pages_dir = Path(directory) / PAGES_DIR_NAME
+        if not self.pages_dir.is_dir():
+            raise FileNotFoundError(f'ページ用ディレクトリが見つかりません: {self.pages_dir}')
+        self._ids = sorted(int(p.stem) for p in self.pages_dir.glob('*.txt') if p.stem.isdigit())
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, page_id: int) -> bool:
+        return (self.pages_dir / f'{page_id}.txt').is_file()
+
+    def ids(self) -> list[int]:
+        return list(self._ids)
+
+    def get(self, page_id: int) -> str:
+        try:
+            return (self.pages_dir / f'{page_id}.txt').read_text(encoding='utf-8')
+        except FileNotFoundError:
+            raise KeyError(page_id) from None
+
+    def location(self, page_id: int) -> str:
+        return str(self.pages_dir / f'{page_id}.txt')
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'PageFilesStore':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_page_store(directory: Path, layout: str | None = None) -> PackedPageStore | PageFilesStore:
+    """
+    extract-pages の出力ディレクトリのページストアを読み取り用に開く。
+    layout は page_meta.json の page_store（None なら 'files'）。見つからなければ FileNotFoundError。
+    """
+    layout = layout or DEFAULT_PAGE_STORE
+    if layout == 'packed':
+        return PackedPageStore(directory)
+    if layout == 'files':
+        return PageFilesStore(directory)
+    raise ValueError(f"ページストアは {', '.join(PAGE_STORE_LAYOUTS)} のいずれかです: {layout}")
+
+
+def iter_pages(store: PackedPageStore | PageFilesStore) -> Iterator[tuple[int, str]]:
+    """ストアの全ページを page_id 昇順で (page_id, 本文) として返す。"""
+    for page_id in store.ids():
+        yield page_id, store.get(page_id)
@@ -0,0 +1,199 @@
+"""
+page_id → タイトルの読み取り専用の対応表（TitleMap）。数百万件を Python の dict で持つ代わりに、
+昇順の page_id（int64 配列）・タイトルを連結した UTF-8・各タイトルの開始位置（int64 配列）の 3 つで持ち、
+二分探索で引く。ファイルに保存したものは mmap でそのまま開く（読み込み時にコピーしない）。
+
+バイト列の形式（リトルエンディアン、ファイルでも SQL キャッシュ内でも同じ）:
+- マジック b'WXTMAP' + バージョン（uint16）+ 件数 n（uint64）+ UTF-8 の長さ（uint64）
+- page_id の int64 配列（n 個、昇順）
+- 開始位置の int64 配列（n + 1 個。i 番目のタイトルは [offsets[i], offsets[i + 1])）
+- タイトルを連結した UTF-8
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import ItemsView, Mapping
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+
+TITLE_MAP_VERSION = 1
+# extract-pages が出力ディレクトリに置く、メイン名前空間の page_id → タイトル
+PAGE_TITLES_NAME = 'page_titles.bin'
+
+_MAGIC = b'WXTMAP'
+_HEADER = struct.Struct('<6sHQQ')
+_LITTLE = sys.byteorder == 'little'
+
+
+def _int64_view(buf: memoryview) -> Sequence[int]:
+    """int64 リトルエンディアンのバイト列を整数列として見る（リトルエンディアン環境ではコピーしない）。"""
+    if _LITTLE:
+        return buf.cast('q')
+    arr = array('q', bytes(buf))
+    arr.byteswap()
+    return arr
+
+
+def _int64_bytes(values: Iterable[int]) -> bytes:
+    """整数列を int64 リトルエンディアンのバイト列にする（SQL キャッシュの集合もこれで書く）。"""
+    arr = array('q', values)
+    if not _LITTLE:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+class TitleMap(Mapping):
+    """page_id → タイトルの読み取り専用 Mapping。反復は page_id の昇順。"""
+
+    def __init__(self, ids: Sequence[int], offsets: Sequence[int], blob: bytes | memoryview) -> None:
+        if len(offsets) != len(ids) + 1:
+            raise ValueError('offsets は ids より 1 つ多い必要があります')
+        self._ids = ids
+        self._offsets = offsets
+        self._blob = blob
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[int, str]]) -> 'TitleMap':
+        """(page_id, タイトル) の列から作る。順不同でよく、同じ page_id は後のものを採る。"""
+        builder = TitleMapBuilder()
+        for page_id, title in items:
+            builder.add(page_id, title)
+        return builder.build()
+
+    @classmethod
+    def from_buffer(cls, buf: bytes | memoryview) -> 'TitleMap':
+        """encode() の出力（または mmap 上のその範囲）から作る。壊れていれば ValueError。"""
+        view = memoryview(buf)
+        if len(view) < _HEADER.size:
+            raise ValueError('TitleMap のヘッダが途中で切れています')
+        magic, version, count, blob_len = _HEADER.unpack_from(view, 0)
+        if magic != _MAGIC or version != TITLE_MAP_VERSION:
+            raise ValueError('TitleMap の形式が違います')
+        pos = _HEADER.size
+        end = pos + 8 * count + 8 * (count + 1) + blob_len
+        if len(view) != end:
+            raise ValueError('TitleMap の長さが合いません')
+        ids = _int64_view(view[pos:pos + 8 * count])
+        pos += 8 * count
+        offsets = _int64_view(view[pos:pos + 8 * (count + 1)])
+        pos += 8 * (count + 1)
+        if offsets[0] != 0 or offsets[-1] != blob_len:
+            raise ValueError('TitleMap の位置配列が壊れています')
+        return cls(ids, offsets, view[pos:end])
+
+    def __reduce__(self) -> tuple:
+        # mmap 上の TitleMap もプロセス間で受け渡せるよう、encode したバイト列で pickle する
+        return TitleMap.from_buffer, (self.encode(),)
+
+    def encode(self) -> bytes:
+        """ファイル・キャッシュに書き出すバイト列。"""
+        return b''.join([
+            _HEADER.pack(_MAGIC, TITLE_MAP_VERSION, len(self._ids), len(self._blob)),
+            _int64_bytes(self._ids),
+            _int64_bytes(self._offsets),
+            bytes(self._blob),
+        ])
+
+    def _index(self, page_id: object) -> int:
+        ids = self._ids
+        if not isinstance(page_id, int):
+            return -1
+        i = bisect_left(ids, page_id)
+        if i < len(ids) and ids[i] == page_id:
+            return i
+        return -1
+
+    def _title_at(self, i: int) -> str:
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __getitem__(self, page_id: int) -> str:
+        i = self._index(page_id)
+        if i < 0:
+            raise KeyError(page_id)
+        return self._title_at(i)
+
+    def get(self, page_id: int, default: Optional[str] = None) -> Optional[str]:
+        i = self._index(page_id)
+        return self._title_at(i) if i >= 0 else default
+
+    def __contains__(self, page_id: object) -> bool:
+        return self._index(page_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def items(self) -> '_TitleMapItems':
+        """(page_id, タイトル) を page_id の昇順で返す（1 件ずつ二分探索しない）。"""
+        return _TitleMapItems(self)
+
+    def _iter_items(self) -> Iterator[tuple[int, str]]:
+        blob = self._blob
+        offsets = self._offsets
+        for i, page_id in enumerate(self._ids):
+            yield page_id, str(blob[offsets[i]:offsets[i + 1]], 'utf-8')
+
+
+class _TitleMapItems(ItemsView):
+    def __iter__(self) -> Iterator[tuple[int, str]]:
+        return self._mapping._iter_items()
+
+
+class TitleMapBuilder:
+    """TitleMap を 1 件ずつ追加して作る。page_id の昇順で追加すると並べ替えなしで build できる。"""
+
+    def __init__(self) -> None:
+        self._ids = array('q')
+        self._offsets = array('q', [0])
+        self._blob = bytearray()
+        self._ordered = True
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, page_id: int, title: str) -> None:
+        if self._ids and page_id <= self._ids[-1]:
+            self._ordered = False
+        self._ids.append(page_id)
+        self._blob += title.encode('utf-8')
+        self._offsets.append(len(self._blob))
+
+    def build(self) -> TitleMap:
+        if self._ordered:
+            return TitleMap(self._ids, self._offsets, bytes(self._blob))
+        # 順不同・重複あり: 同じ page_id は後のものを採って並べ直す
+        unordered = TitleMap(array('q', range(len(self._ids))), self._offsets, bytes(self._blob))
+        latest = {page_id: i for i, page_id in enumerate(self._ids)}
+        builder = TitleMapBuilder()
+        for page_id in sorted(latest):
+            builder.add(page_id, unordered[latest[page_id]])
+        return builder.build()
+
+
+def save_title_map(path: Path, mapping: Mapping) -> None:
+    """page_id → タイトルを TitleMap 形式で一時ファイル経由で保存する（dict も可）。"""
+    if not isinstance(mapping, TitleMap):
+        mapping = TitleMap.from_items(mapping.items())
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(mapping.encode())
+    os.replace(tmp, path)
+
+
+def load_title_map(path: Path) -> TitleMap:
+    """save_title_map で保存したファイルを mmap で開く。無ければ FileNotFoundError、壊れていれば ValueError。"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise ValueError(f'TitleMap が空です: {path}')
+        # mmap はファイルを閉じても有効。TitleMap が参照を持つ間だけ残る
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return TitleMap.from_buffer(mm)
+